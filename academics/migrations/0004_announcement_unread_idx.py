@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_remove_announcement_academics_a_is_acti_18c429_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['audience', 'is_active', 'id'], name='announcement_unread_idx'),
+        ),
+    ]
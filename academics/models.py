@@ -133,6 +133,8 @@ class Announcement(models.Model):
         indexes = [
             models.Index(fields=['audience', 'is_active', '-created_at']),
             models.Index(fields=['priority', '-created_at']),
+            # Unread announcements per audience: id above a user's watermark (core.announcements)
+            models.Index(fields=['audience', 'is_active', 'id'], name='announcement_unread_idx'),
         ]
 
     def __str__(self):
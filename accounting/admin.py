@@ -1,10 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import HttpResponse
 from django.utils.html import format_html
 from django.db.models import Q
 from django import forms
 from import_export.admin import ImportExportModelAdmin
+from core import fanout
 from core.resources import TuitionFeeResource, PayrollResource, PaymentResource, ExpenseResource
-from .models import TuitionFee, Payment, Payroll, Expense
+from . import documents
+from .models import TuitionFee, Payment, Payroll, Expense, JournalEntry, JournalLine, AccountBalance, AgingSnapshot
 
 
 class PaymentAdminForm(forms.ModelForm):
@@ -43,6 +46,26 @@ class PaymentAdminForm(forms.ModelForm):
         return cleaned_data
 
 
+def too_many_documents(modeladmin, request, queryset):
+    """Refuse batches too large to render in the request, pointing at the command"""
+    if queryset.count() <= documents.ADMIN_DOCUMENT_LIMIT:
+        return False
+    modeladmin.message_user(
+        request,
+        f"Select at most {documents.ADMIN_DOCUMENT_LIMIT} rows, or run "
+        f"'manage.py generate_fee_documents' for larger batches.",
+        level=messages.WARNING,
+    )
+    return True
+
+
+def document_response(content, filename):
+    content_type = 'application/zip' if filename.endswith('.zip') else 'application/pdf'
+    response = HttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @admin.register(TuitionFee)
 class TuitionFeeAdmin(ImportExportModelAdmin):
     resource_class = TuitionFeeResource
@@ -56,6 +79,7 @@ class TuitionFeeAdmin(ImportExportModelAdmin):
     )
     list_filter = ('status', 'session', 'term', 'due_date')
     readonly_fields = ('amount_paid', 'paid_date')
+    actions = ['download_statements_zip', 'download_statements_pdf', 'send_fee_reminders']
 
     def remaining_balance(self, obj):
         balance = obj.amount_due - obj.amount_paid
@@ -64,6 +88,29 @@ class TuitionFeeAdmin(ImportExportModelAdmin):
         return format_html('<span style="color: red;">₦{}</span>', f'{balance:,.2f}')
     remaining_balance.short_description = 'Remaining Balance'
 
+    @admin.action(description="Download statements of account (ZIP)")
+    def download_statements_zip(self, request, queryset):
+        if too_many_documents(self, request, queryset):
+            return None
+        return document_response(documents.statements_for(queryset, output='zip'), 'statements.zip')
+
+    @admin.action(description="Download statements of account (single PDF)")
+    def download_statements_pdf(self, request, queryset):
+        if too_many_documents(self, request, queryset):
+            return None
+        return document_response(documents.statements_for(queryset, output='pdf'), 'statements.pdf')
+
+    @admin.action(description="Send fee reminders to students owing in the selected sessions")
+    def send_fee_reminders(self, request, queryset):
+        sessions = sorted(set(queryset.values_list('session', flat=True)))
+        for session in sessions:
+            fanout.queue(
+                f"Fee reminder: {session}",
+                f"You have outstanding school fees for the {session} session. Please complete payment.",
+                'debtors', session, created_by=request.user,
+            )
+        self.message_user(request, f"Queued fee reminders for {len(sessions)} session(s).")
+
 
 @admin.register(Payment)
 class PaymentAdmin(ImportExportModelAdmin):
@@ -81,6 +128,7 @@ class PaymentAdmin(ImportExportModelAdmin):
     )
     list_filter = ('payment_date', 'method', 'tuition_fee__status')
     readonly_fields = ('created_at', 'created_by')
+    actions = ['download_receipts_zip', 'download_receipts_pdf']
 
     def student_name(self, obj):
         return obj.tuition_fee.student.user.get_full_name()
@@ -93,6 +141,18 @@ class PaymentAdmin(ImportExportModelAdmin):
         return format_html('<span style="color: orange;">₦{}</span>', f'{remaining:,.2f}')
     remaining_after_payment.short_description = 'Balance After Payment'
 
+    @admin.action(description="Download receipts (ZIP)")
+    def download_receipts_zip(self, request, queryset):
+        if too_many_documents(self, request, queryset):
+            return None
+        return document_response(documents.receipts_for(queryset, output='zip'), 'receipts.zip')
+
+    @admin.action(description="Download receipts (single PDF)")
+    def download_receipts_pdf(self, request, queryset):
+        if too_many_documents(self, request, queryset):
+            return None
+        return document_response(documents.receipts_for(queryset, output='pdf'), 'receipts.pdf')
+
     def save_model(self, request, obj, form, change):
         if not change:  # Only set created_by for new payments
             obj.created_by = request.user
@@ -131,3 +191,52 @@ class ExpenseAdmin(ImportExportModelAdmin):
         if not change:  # Only set created_by for new expenses
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
+
+
+class JournalLineInline(admin.TabularInline):
+    model = JournalLine
+    fields = ('account', 'debit', 'credit')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(JournalEntry)
+class JournalEntryAdmin(admin.ModelAdmin):
+    """Journal entries are posted from payments, expenses and payroll; read-only here"""
+    list_display = ('date', 'description', 'source_type', 'source_id')
+    list_filter = ('source_type', 'date')
+    search_fields = ('description',)
+    inlines = [JournalLineInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AccountBalance)
+class AccountBalanceAdmin(admin.ModelAdmin):
+    list_display = ('account', 'month', 'debit_total', 'credit_total', 'balance', 'computed_at')
+    list_filter = ('account',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AgingSnapshot)
+class AgingSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'dimension', 'label', 'current', 'days_0_30', 'days_31_60', 'days_61_90',
+                    'days_over_90', 'total')
+    list_filter = ('dimension', 'date')
+    search_fields = ('label', 'key')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,171 @@
+"""
+Accounts receivable aging.
+
+Open fees are bucketed by days past due (not yet due, 0-30, 31-60, 61-90
+and over 90). Each dimension (whole school, class, session, student) is a
+single GROUP BY with one conditional SUM per bucket, and nightly snapshots
+of the results are kept in AgingSnapshot for trend comparison.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, F, Q
+from django.utils import timezone
+
+from .models import TuitionFee, AgingSnapshot
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('unpaid', 'partial')
+
+BUCKETS = [
+    ('current', 'Not Yet Due'),
+    ('days_0_30', '0-30 Days'),
+    ('days_31_60', '31-60 Days'),
+    ('days_61_90', '61-90 Days'),
+    ('days_over_90', '90+ Days'),
+]
+
+# Grouping fields for each dimension: (key, label parts)
+DIMENSIONS = {
+    'class': ('student__current_class__name', ()),
+    'session': ('session', ()),
+    'student': ('student_id', ('student__admission_number', 'student__user__first_name', 'student__user__last_name')),
+}
+
+
+def open_fees():
+    """Fees with a balance; filtered on (status, due_date, student) index columns"""
+    return TuitionFee.objects.filter(status__in=OPEN_STATUSES)
+
+
+def bucket_filters(as_of):
+    """Q filter per bucket on due_date, so each bucket is an index range"""
+    return {
+        'current': Q(due_date__gt=as_of),
+        'days_0_30': Q(due_date__lte=as_of, due_date__gte=as_of - timedelta(days=30)),
+        'days_31_60': Q(due_date__lt=as_of - timedelta(days=30), due_date__gte=as_of - timedelta(days=60)),
+        'days_61_90': Q(due_date__lt=as_of - timedelta(days=60), due_date__gte=as_of - timedelta(days=90)),
+        'days_over_90': Q(due_date__lt=as_of - timedelta(days=90)),
+    }
+
+
+def bucket_aggregates(as_of):
+    outstanding = F('amount_due') - F('amount_paid')
+    aggregates = {
+        name: Sum(outstanding, filter=condition)
+        for name, condition in bucket_filters(as_of).items()
+    }
+    aggregates['total'] = Sum(outstanding)
+    aggregates['fee_count'] = Count('pk')
+    return aggregates
+
+
+def _clean(row):
+    for name, _ in BUCKETS:
+        row[name] = row.get(name) or Decimal('0.00')
+    row['total'] = row.get('total') or Decimal('0.00')
+    return row
+
+
+def aging_summary(as_of=None, queryset=None):
+    """Buckets for all open fees (or ``queryset``) in one aggregate query"""
+    as_of = as_of or timezone.now().date()
+    queryset = queryset if queryset is not None else open_fees()
+    return _clean(queryset.aggregate(**bucket_aggregates(as_of)))
+
+
+def aging_by(dimension, as_of=None, queryset=None, limit=None):
+    """
+    Buckets per class, session or student: one GROUP BY query.
+
+    Rows carry ``key`` and ``label`` and are ordered by total outstanding,
+    largest first.
+    """
+    as_of = as_of or timezone.now().date()
+    queryset = queryset if queryset is not None else open_fees()
+    key_field, label_fields = DIMENSIONS[dimension]
+
+    rows = queryset.values(key_field, *label_fields).annotate(
+        **bucket_aggregates(as_of)
+    ).order_by('-total', key_field)
+    if limit:
+        rows = rows[:limit]
+
+    results = []
+    for row in rows:
+        row = _clean(dict(row))
+        key = row.pop(key_field)
+        if label_fields:
+            admission_number, first_name, last_name = (row.pop(field) for field in label_fields)
+            label = f"{first_name} {last_name} ({admission_number})".strip()
+        else:
+            label = key or 'Unassigned'
+        row['key'] = '' if key is None else str(key)
+        row['label'] = label
+        results.append(row)
+    return results
+
+
+def student_fees(student, as_of=None):
+    """Per-fee drill-down for one student with the bucket each fee falls in"""
+    as_of = as_of or timezone.now().date()
+    fees = list(
+        TuitionFee.objects.filter(status__in=OPEN_STATUSES, student=student).order_by('due_date')
+    )
+    for fee in fees:
+        fee.days_overdue = max((as_of - fee.due_date).days, 0)
+        fee.aging_bucket = bucket_for(fee.due_date, as_of)
+    return fees
+
+
+def bucket_for(due_date, as_of):
+    days = (as_of - due_date).days
+    if days < 0:
+        return 'current'
+    if days <= 30:
+        return 'days_0_30'
+    if days <= 60:
+        return 'days_31_60'
+    if days <= 90:
+        return 'days_61_90'
+    return 'days_over_90'
+
+
+def take_snapshot(as_of=None):
+    """
+    Store today's aging for every dimension, replacing any snapshot of
+    the same day. Returns the number of snapshot rows written.
+    """
+    as_of = as_of or timezone.now().date()
+    snapshots = [AgingSnapshot(date=as_of, dimension='total', key='', label='All Students', **aging_summary(as_of))]
+    for dimension in DIMENSIONS:
+        snapshots.extend(
+            AgingSnapshot(date=as_of, dimension=dimension, **row)
+            for row in aging_by(dimension, as_of)
+        )
+
+    with transaction.atomic():
+        AgingSnapshot.objects.filter(date=as_of).delete()
+        AgingSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    logger.info(f"Aging snapshot for {as_of}: {len(snapshots)} rows")
+    return len(snapshots)
+
+
+def snapshot_on_or_before(day, dimension='total'):
+    """Snapshot rows for the latest snapshot date on or before ``day``, keyed by key"""
+    latest = AgingSnapshot.objects.filter(dimension=dimension, date__lte=day).order_by('-date').values('date')[:1]
+    return {
+        snapshot.key: snapshot
+        for snapshot in AgingSnapshot.objects.filter(dimension=dimension, date=latest)
+    }
+
+
+def aging_trend(days=90, dimension='total', key=''):
+    """Snapshot series for one class/session/student (or the whole school)"""
+    since = timezone.now().date() - timedelta(days=days)
+    return list(
+        AgingSnapshot.objects.filter(dimension=dimension, key=key, date__gte=since).order_by('date')
+    )
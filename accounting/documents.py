@@ -0,0 +1,316 @@
+"""
+Batch generation of payment receipts and statements of account.
+
+Data for a whole batch is loaded up front (statements: one query for the
+fees with their students, one for the payments) into plain dicts, so the
+rendering step never touches the database. Documents are then rendered in
+chunks, reusing one set of ReportLab styles per process, and packed into a
+ZIP or a single merged PDF.
+
+Admin actions render in-process and are limited to ADMIN_DOCUMENT_LIMIT
+documents: forking a pool from a threaded web worker can copy held locks
+and open connections into the children. Larger batches go through
+``manage.py generate_fee_documents``, which spreads chunks over a process
+pool.
+"""
+import logging
+import multiprocessing
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Payment
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+try:
+    from pypdf import PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SCHOOL_NAME = "GLAD TIDINGS SCHOOL"
+
+# Documents per worker task; batches smaller than this render in-process
+CHUNK_SIZE = 50
+# Most documents an admin action renders in the request
+ADMIN_DOCUMENT_LIMIT = 200
+
+
+def _money(value):
+    # The base-14 PDF fonts have no naira glyph
+    return f"NGN {Decimal(value):,.2f}"
+
+
+def _student_dict(student):
+    return {
+        'id': student.pk,
+        'name': student.user.get_full_name() or student.user.username,
+        'admission_number': student.admission_number,
+        'class_name': student.current_class.name if student.current_class_id else '',
+    }
+
+
+def _fee_dict(fee):
+    return {
+        'id': fee.pk,
+        'session': fee.session,
+        'term': fee.term,
+        'amount_due': fee.amount_due,
+        'amount_paid': fee.amount_paid,
+        'due_date': fee.due_date,
+        'status': fee.get_status_display(),
+    }
+
+
+def load_receipts(payments):
+    """Receipt data for a payment queryset, in one query"""
+    receipts = []
+    for payment in payments.select_related(
+        'tuition_fee__student__user', 'tuition_fee__student__current_class', 'created_by'
+    ).order_by('tuition_fee__student__admission_number', 'payment_date', 'pk'):
+        receipts.append({
+            'id': payment.pk,
+            'receipt_number': payment.receipt_number or f"RCT-{payment.pk:06d}",
+            'amount': payment.amount,
+            'payment_date': payment.payment_date,
+            'method': payment.get_method_display(),
+            'reference': payment.reference,
+            'received_by': payment.created_by.get_full_name() if payment.created_by else '',
+            'student': _student_dict(payment.tuition_fee.student),
+            'fee': _fee_dict(payment.tuition_fee),
+        })
+    return receipts
+
+
+def load_statements(fees):
+    """
+    Statement data per student for a fee queryset: one query for the fees
+    (with students) and one for all their payments.
+    """
+    fees = list(fees.select_related('student__user', 'student__current_class').order_by(
+        'student__admission_number', 'session', 'term', 'due_date'
+    ))
+    payments = defaultdict(list)
+    for payment in Payment.objects.filter(tuition_fee__in=[fee.pk for fee in fees]).order_by('payment_date', 'pk'):
+        payments[payment.tuition_fee_id].append({
+            'payment_date': payment.payment_date,
+            'amount': payment.amount,
+            'method': payment.get_method_display(),
+            'reference': payment.receipt_number or payment.reference,
+        })
+
+    statements = {}
+    for fee in fees:
+        statement = statements.setdefault(fee.student_id, {
+            'student': _student_dict(fee.student),
+            'fees': [],
+            'generated_on': timezone.now().date(),
+        })
+        statement['fees'].append({**_fee_dict(fee), 'payments': payments[fee.pk]})
+    return list(statements.values())
+
+
+@lru_cache(maxsize=None)
+def document_styles():
+    """ReportLab styles shared by every document rendered in this process"""
+    sample = getSampleStyleSheet()
+    grid = [
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+    return {
+        'title': ParagraphStyle('DocTitle', parent=sample['Heading1'], fontSize=16, alignment=1, spaceAfter=4),
+        'subtitle': ParagraphStyle('DocSubtitle', parent=sample['Heading2'], fontSize=12, alignment=1, spaceAfter=14),
+        'heading': sample['Heading3'],
+        'normal': sample['Normal'],
+        'small': ParagraphStyle('DocSmall', parent=sample['Normal'], fontSize=8, textColor=colors.grey),
+        'details': TableStyle(grid + [('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke)]),
+        'ledger': TableStyle(grid + [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+        ]),
+    }
+
+
+def receipt_story(receipt, styles):
+    student, fee = receipt['student'], receipt['fee']
+    balance = fee['amount_due'] - fee['amount_paid']
+    details = Table([
+        ['Receipt No.', receipt['receipt_number']],
+        ['Date', receipt['payment_date'].strftime('%d %b %Y')],
+        ['Student', f"{student['name']} ({student['admission_number']})"],
+        ['Class', student['class_name'] or '-'],
+        ['Fee', f"{fee['session']} {fee['term']} Term"],
+        ['Amount Paid', _money(receipt['amount'])],
+        ['Payment Method', receipt['method']],
+        ['Reference', receipt['reference'] or '-'],
+        ['Balance Outstanding', _money(balance)],
+    ], colWidths=[1.8 * inch, 4.2 * inch])
+    details.setStyle(styles['details'])
+    story = [
+        Paragraph(SCHOOL_NAME, styles['title']),
+        Paragraph("PAYMENT RECEIPT", styles['subtitle']),
+        details,
+        Spacer(1, 18),
+    ]
+    if receipt['received_by']:
+        story.append(Paragraph(f"Received by: {escape(receipt['received_by'])}", styles['normal']))
+    story.append(Paragraph("This receipt was generated electronically.", styles['small']))
+    return story
+
+
+def statement_story(statement, styles):
+    student = statement['student']
+    rows = [['Date', 'Description', 'Charges', 'Payments', 'Balance']]
+    balance = Decimal('0.00')
+    for fee in statement['fees']:
+        balance += fee['amount_due']
+        rows.append([
+            fee['due_date'].strftime('%d %b %Y'), f"{fee['session']} {fee['term']} Term tuition",
+            _money(fee['amount_due']), '', _money(balance),
+        ])
+        for payment in fee['payments']:
+            balance -= payment['amount']
+            description = f"Payment ({payment['method']})"
+            if payment['reference']:
+                description += f" {payment['reference']}"
+            rows.append([
+                payment['payment_date'].strftime('%d %b %Y'), description[:60],
+                '', _money(payment['amount']), _money(balance),
+            ])
+    ledger = Table(rows, colWidths=[0.9 * inch, 2.6 * inch, 1.1 * inch, 1.1 * inch, 1.1 * inch], repeatRows=1)
+    ledger.setStyle(styles['ledger'])
+
+    details = Table([
+        ['Student', student['name']],
+        ['Admission No.', student['admission_number']],
+        ['Class', student['class_name'] or '-'],
+        ['Statement Date', statement['generated_on'].strftime('%d %b %Y')],
+    ], colWidths=[1.8 * inch, 4.2 * inch])
+    details.setStyle(styles['details'])
+
+    return [
+        Paragraph(SCHOOL_NAME, styles['title']),
+        Paragraph("STATEMENT OF ACCOUNT", styles['subtitle']),
+        details,
+        Spacer(1, 14),
+        ledger,
+        Spacer(1, 10),
+        Paragraph(f"<b>Balance due: {_money(balance)}</b>", styles['normal']),
+    ]
+
+
+STORIES = {
+    'receipt': (receipt_story, lambda item: f"receipt_{item['receipt_number']}_{item['id']}"),
+    'statement': (statement_story, lambda item: f"statement_{item['student']['admission_number']}"),
+}
+
+
+def _safe_name(name):
+    return ''.join(char if char.isalnum() or char in '-_' else '_' for char in name) + '.pdf'
+
+
+def _build(story):
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.6 * inch, bottomMargin=0.6 * inch).build(story)
+    return buffer.getvalue()
+
+
+def render_chunk(kind, items, merged=False):
+    """
+    Render a chunk of documents: a list of ``(filename, pdf_bytes)``, or a
+    single combined PDF when ``merged``. Runs in pool workers.
+    """
+    build_story, name_for = STORIES[kind]
+    styles = document_styles()
+    if merged:
+        story = []
+        for position, item in enumerate(items):
+            if position:
+                story.append(PageBreak())
+            story.extend(build_story(item, styles))
+        return _build(story)
+    return [(_safe_name(name_for(item)), _build(build_story(item, styles))) for item in items]
+
+
+def _pool_context():
+    # Workers get the prefetched data by fork; platforms without fork
+    # render in-process instead of re-importing Django in each worker
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def render_documents(kind, items, output='zip', workers=1, chunk_size=None):
+    """
+    Render receipts or statements and return the ZIP or PDF bytes.
+
+    ``output`` is 'zip' (one PDF per document) or 'pdf' (all documents in
+    one file). With more than one of ``workers``, batches larger than
+    ``chunk_size`` are spread over a process pool; only pass that outside
+    web workers (management commands, background jobs).
+    """
+    if not REPORTLAB_AVAILABLE:
+        raise ImportError("ReportLab is required for PDF generation. Install with: pip install reportlab")
+    if output not in ('zip', 'pdf'):
+        raise ValueError(f"Unsupported output: {output}")
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)] or [[]]
+    merged = output == 'pdf'
+    if merged and len(chunks) > 1 and not PYPDF_AVAILABLE:
+        # Without pypdf the parts cannot be stitched together afterwards
+        chunks = [items]
+
+    context = _pool_context()
+    if len(chunks) > 1 and workers and workers > 1 and context is not None:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            parts = list(pool.map(render_chunk, [kind] * len(chunks), chunks, [merged] * len(chunks)))
+    else:
+        parts = [render_chunk(kind, chunk, merged) for chunk in chunks]
+
+    logger.info(f"Rendered {len(items)} {kind} document(s) in {len(chunks)} chunk(s) as {output}")
+    if merged:
+        if len(parts) == 1:
+            return parts[0]
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(BytesIO(part))
+        buffer = BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for part in parts:
+            for filename, content in part:
+                archive.writestr(filename, content)
+    return buffer.getvalue()
+
+
+def receipts_for(payments, output='zip', workers=1):
+    return render_documents('receipt', load_receipts(payments), output=output, workers=workers)
+
+
+def statements_for(fees, output='zip', workers=1):
+    return render_documents('statement', load_statements(fees), output=output, workers=workers)
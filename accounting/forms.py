@@ -170,6 +170,32 @@ class ExpenseForm(forms.ModelForm):
         return description
 
 
+class BankStatementUploadForm(forms.Form):
+    """Form for uploading a bank statement to reconcile against open fees"""
+
+    statement = forms.FileField(
+        help_text='CSV or Excel (.xlsx) export with at least date and amount columns',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    method = forms.ChoiceField(
+        choices=Payment.PAYMENT_METHODS,
+        initial='bank',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        help_text='Preview matches without recording any payments'
+    )
+
+    def clean_statement(self):
+        statement = self.cleaned_data['statement']
+        if not statement.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Only CSV and .xlsx statements are supported")
+        if statement.size > 20 * 1024 * 1024:  # 20 MB cap
+            raise forms.ValidationError("Statement file is too large")
+        return statement
+
+
 class StudentSearchForm(forms.Form):
     """Form for searching students"""
     
@@ -0,0 +1,255 @@
+"""
+Double-entry general ledger.
+
+Payments, expenses and paid payroll each own one journal entry, kept in
+step by the signals in ``accounting.signals``. Cumulative per-account
+totals are checkpointed for every closed month, so the balance on any
+date is the nearest checkpoint plus the lines posted since it.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum, Min, Max, Subquery
+from django.utils import timezone
+
+from core.periods import month_start, next_month, month_end  # noqa: F401 (re-exported)
+from .models import JournalEntry, JournalLine, AccountBalance
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+
+def payment_journal(payment):
+    """Cash received against a tuition fee"""
+    return (
+        payment.payment_date,
+        f"Tuition payment {payment.receipt_number or payment.reference or payment.pk}"[:200],
+        [('cash', payment.amount, ZERO), ('tuition_revenue', ZERO, payment.amount)],
+    )
+
+
+EXPENSE_ACCOUNTS = {code for code, _ in JournalLine.ACCOUNTS if code.startswith('expense_')}
+
+
+def expense_account(category):
+    account = f'expense_{category}'
+    return account if account in EXPENSE_ACCOUNTS else 'expense_other'
+
+
+def expense_journal(expense):
+    return (
+        expense.date,
+        f"Expense: {expense.description}"[:200],
+        [(expense_account(expense.category), expense.amount, ZERO), ('cash', ZERO, expense.amount)],
+    )
+
+
+def payroll_journal(payroll):
+    """Salary paid out; unpaid payroll has no cash effect yet"""
+    if not payroll.paid:
+        return None
+    return (
+        payroll.paid_date or timezone.now().date(),
+        f"Payroll: {payroll.staff} {payroll.month} {payroll.year}"[:200],
+        [('payroll_expense', payroll.amount, ZERO), ('cash', ZERO, payroll.amount)],
+    )
+
+
+JOURNAL_BUILDERS = {
+    'payment': payment_journal,
+    'expense': expense_journal,
+    'payroll': payroll_journal,
+}
+
+
+def invalidate_checkpoints(from_date):
+    """Drop checkpoints that a posting on ``from_date`` makes stale"""
+    AccountBalance.objects.filter(month__gte=month_start(from_date)).delete()
+
+
+def _build_lines(entry, lines):
+    return [
+        JournalLine(entry=entry, account=account, date=entry.date, debit=debit, credit=credit)
+        for account, debit, credit in lines
+    ]
+
+
+def post(source_type, instance):
+    """Create, rebuild or remove the journal entry for a source record"""
+    journal = JOURNAL_BUILDERS[source_type](instance)
+    with transaction.atomic():
+        entry = JournalEntry.objects.select_for_update().filter(
+            source_type=source_type, source_id=instance.pk
+        ).first()
+        stale_from = entry.date if entry else None
+
+        if journal is None:
+            if entry is not None:
+                entry.delete()
+                invalidate_checkpoints(stale_from)
+            return None
+
+        date, description, lines = journal
+        if entry is None:
+            entry = JournalEntry.objects.create(
+                date=date, description=description, source_type=source_type, source_id=instance.pk
+            )
+        else:
+            entry.date = date
+            entry.description = description
+            entry.save(update_fields=['date', 'description', 'updated_at'])
+            entry.lines.all().delete()
+        JournalLine.objects.bulk_create(_build_lines(entry, lines))
+        invalidate_checkpoints(min(date, stale_from) if stale_from else date)
+    return entry
+
+
+def _fetch_ids(source_type, entries, chunk_size=1000):
+    """Fetch ids back for backends that do not return them from bulk_create"""
+    for start in range(0, len(entries), chunk_size):
+        chunk = entries[start:start + chunk_size]
+        ids = dict(JournalEntry.objects.filter(
+            source_type=source_type, source_id__in=[entry.source_id for entry in chunk],
+        ).values_list('source_id', 'id'))
+        for entry in chunk:
+            entry.pk = ids[entry.source_id]
+
+
+def post_many(source_type, instances):
+    """Journal a batch of freshly created source records in bulk; they must have their ids"""
+    journals = [(instance, JOURNAL_BUILDERS[source_type](instance)) for instance in instances]
+    journals = [(instance, journal) for instance, journal in journals if journal is not None]
+    if not journals:
+        return []
+
+    with transaction.atomic():
+        entries = JournalEntry.objects.bulk_create([
+            JournalEntry(date=date, description=description, source_type=source_type, source_id=instance.pk)
+            for instance, (date, description, _) in journals
+        ])
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _fetch_ids(source_type, entries)
+        JournalLine.objects.bulk_create([
+            line
+            for entry, (_, (_, _, lines)) in zip(entries, journals)
+            for line in _build_lines(entry, lines)
+        ])
+        invalidate_checkpoints(min(entry.date for entry in entries))
+    return entries
+
+
+def unpost(source_type, source_id):
+    entry = JournalEntry.objects.filter(source_type=source_type, source_id=source_id).first()
+    if entry is not None:
+        entry.delete()
+        invalidate_checkpoints(entry.date)
+
+
+def _line_totals(**filters):
+    """Debit and credit totals per account for the matching lines"""
+    rows = JournalLine.objects.filter(**filters).values('account').annotate(
+        debits=Sum('debit'), credits=Sum('credit')
+    ).order_by()
+    return {row['account']: (row['debits'] or ZERO, row['credits'] or ZERO) for row in rows}
+
+
+def last_closed_month(today=None):
+    today = today or timezone.now().date()
+    return month_start(month_start(today) - timedelta(days=1))
+
+
+def ensure_checkpoints(through_month=None):
+    """
+    Checkpoint every closed month up to ``through_month`` that lacks one.
+
+    Each month is built from the previous checkpoint plus one grouped
+    query over that month's lines. Returns the number of months written.
+    """
+    through_month = min(month_start(through_month or last_closed_month()), last_closed_month())
+    latest = AccountBalance.objects.aggregate(latest=Max('month'))['latest']
+    if latest is not None and latest >= through_month:
+        return 0
+
+    if latest is None:
+        first_line = JournalLine.objects.aggregate(first=Min('date'))['first']
+        if first_line is None:
+            return 0
+        month = month_start(first_line)
+        running = defaultdict(lambda: [ZERO, ZERO])
+    else:
+        month = next_month(latest)
+        running = defaultdict(lambda: [ZERO, ZERO])
+        for checkpoint in AccountBalance.objects.filter(month=latest):
+            running[checkpoint.account] = [checkpoint.debit_total, checkpoint.credit_total]
+
+    written = 0
+    while month <= through_month:
+        for account, (debits, credits) in _line_totals(date__gte=month, date__lt=next_month(month)).items():
+            running[account][0] += debits
+            running[account][1] += credits
+        AccountBalance.objects.bulk_create([
+            AccountBalance(account=account, month=month, debit_total=debits, credit_total=credits)
+            for account, (debits, credits) in running.items()
+        ], ignore_conflicts=True)
+        written += 1
+        month = next_month(month)
+
+    if written:
+        logger.info(f"Ledger checkpoints written for {written} month(s) through {through_month:%B %Y}")
+    return written
+
+
+def balances_as_of(as_of):
+    """
+    Balance (debit minus credit) of every account at the end of ``as_of``.
+
+    Reads the latest checkpoint at or before the month preceding ``as_of``
+    (or ``as_of``'s own month when it is that month's last day) and adds
+    the lines posted after it.
+    """
+    anchor = month_start(as_of) if as_of == month_end(as_of) else month_start(month_start(as_of) - timedelta(days=1))
+    ensure_checkpoints(anchor)
+
+    balances = defaultdict(lambda: ZERO)
+    latest = AccountBalance.objects.filter(month__lte=anchor).order_by('-month').values('month')[:1]
+    delta_filters = {'date__lte': as_of}
+    for checkpoint in AccountBalance.objects.filter(month=Subquery(latest)):
+        balances[checkpoint.account] = checkpoint.balance
+        delta_filters['date__gt'] = month_end(checkpoint.month)
+
+    for account, (debits, credits) in _line_totals(**delta_filters).items():
+        balances[account] += debits - credits
+    return balances
+
+
+def account_movements(start_date, end_date):
+    """Net change per account over an inclusive date range"""
+    closing = balances_as_of(end_date)
+    opening = balances_as_of(start_date - timedelta(days=1))
+    return {
+        account: closing[account] - opening[account]
+        for account in set(closing) | set(opening)
+    }
+
+
+def rebuild():
+    """Re-journal every source record and recompute all checkpoints"""
+    from .models import Payment, Expense, Payroll
+
+    with transaction.atomic():
+        JournalEntry.objects.all().delete()
+        AccountBalance.objects.all().delete()
+        counts = {}
+        for source_type, queryset in (
+            ('payment', Payment.objects.all()),
+            ('expense', Expense.objects.all()),
+            ('payroll', Payroll.objects.filter(paid=True).select_related('staff__user')),
+        ):
+            instances = list(queryset.iterator(chunk_size=2000))
+            counts[source_type] = len(post_many(source_type, instances))
+    ensure_checkpoints()
+    return counts
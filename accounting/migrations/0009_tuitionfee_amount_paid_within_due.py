@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def check_amount_paid(apps, schema_editor):
+    """
+    Fees paid beyond their amount due (or below zero) before the constraint
+    existed would make AddConstraint fail. List them and stop; which
+    amount is right has to be settled against their Payment rows by hand.
+    """
+    TuitionFee = apps.get_model('accounting', 'TuitionFee')
+    out_of_range = TuitionFee.objects.filter(
+        models.Q(amount_paid__gt=models.F('amount_due')) | models.Q(amount_paid__lt=0)
+    ).order_by('pk').values_list('pk', 'amount_paid', 'amount_due')
+    fees = [f"TuitionFee {pk}: amount_paid {paid} outside 0..{due}" for pk, paid, due in out_of_range]
+    if fees:
+        raise RuntimeError(
+            "Correct these fees before adding tuitionfee_amount_paid_within_due:\n" + "\n".join(fees)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0008_payment_verified_payment_verified_at_and_more'),
+        ('students', '0011_merge_students'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_amount_paid, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tuitionfee',
+            constraint=models.CheckConstraint(condition=models.Q(('amount_paid__gte', 0), ('amount_paid__lte', models.F('amount_due'))), name='tuitionfee_amount_paid_within_due'),
+        ),
+    ]
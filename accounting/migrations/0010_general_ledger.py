@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0009_tuitionfee_amount_paid_within_due'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('cash', 'Cash and Bank'), ('tuition_revenue', 'Tuition Revenue'), ('expense_supplies', 'Supplies Expense'), ('expense_maintenance', 'Maintenance Expense'), ('expense_salary', 'Salary Expense'), ('expense_utility', 'Utility Expense'), ('expense_other', 'Other Expense'), ('payroll_expense', 'Payroll Expense')], max_length=30)),
+                ('month', models.DateField(help_text='First day of the month the checkpoint closes')),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month', 'account'],
+                'constraints': [models.UniqueConstraint(fields=('account', 'month'), name='accountbalance_unique_month')],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('description', models.CharField(max_length=200)),
+                ('source_type', models.CharField(choices=[('payment', 'Payment'), ('expense', 'Expense'), ('payroll', 'Payroll')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Journal entries',
+                'ordering': ['-date', '-id'],
+                'constraints': [models.UniqueConstraint(fields=('source_type', 'source_id'), name='journalentry_unique_source')],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('cash', 'Cash and Bank'), ('tuition_revenue', 'Tuition Revenue'), ('expense_supplies', 'Supplies Expense'), ('expense_maintenance', 'Maintenance Expense'), ('expense_salary', 'Salary Expense'), ('expense_utility', 'Utility Expense'), ('expense_other', 'Other Expense'), ('payroll_expense', 'Payroll Expense')], max_length=30)),
+                ('date', models.DateField()),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.journalentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'date'], name='accounting__account_abf5d7_idx'), models.Index(fields=['date'], name='accounting__date_f6424c_idx')],
+            },
+        ),
+    ]
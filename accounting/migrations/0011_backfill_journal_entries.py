@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_journal_entries(apps, schema_editor):
+    """Journal the payments, expenses and paid payroll recorded before the ledger existed"""
+    Payment = apps.get_model('accounting', 'Payment')
+    Expense = apps.get_model('accounting', 'Expense')
+    Payroll = apps.get_model('accounting', 'Payroll')
+    JournalEntry = apps.get_model('accounting', 'JournalEntry')
+    JournalLine = apps.get_model('accounting', 'JournalLine')
+
+    def journal(source_type, rows):
+        rows = list(rows)
+        JournalEntry.objects.bulk_create([
+            JournalEntry(date=date, description=description[:200], source_type=source_type, source_id=pk)
+            for pk, date, description, _, _ in rows
+        ], batch_size=1000)
+        # Fetch ids back for backends that do not return them from bulk_create
+        ids = dict(JournalEntry.objects.filter(source_type=source_type).values_list('source_id', 'id'))
+        lines = []
+        for pk, date, _, amount, debit_account in rows:
+            entry_id = ids[pk]
+            lines.append(JournalLine(entry_id=entry_id, account=debit_account, date=date, debit=amount, credit=0))
+            credit_account = 'tuition_revenue' if source_type == 'payment' else 'cash'
+            lines.append(JournalLine(entry_id=entry_id, account=credit_account, date=date, debit=0, credit=amount))
+        JournalLine.objects.bulk_create(lines, batch_size=1000)
+
+    journal('payment', (
+        (pk, payment_date, f"Tuition payment {receipt_number or reference or pk}", amount, 'cash')
+        for pk, payment_date, receipt_number, reference, amount in Payment.objects.values_list(
+            'pk', 'payment_date', 'receipt_number', 'reference', 'amount'
+        )
+    ))
+    expense_accounts = {'supplies', 'maintenance', 'salary', 'utility', 'other'}
+    journal('expense', (
+        (pk, date, f"Expense: {description}", amount,
+         f'expense_{category}' if category in expense_accounts else 'expense_other')
+        for pk, date, description, amount, category in Expense.objects.values_list(
+            'pk', 'date', 'description', 'amount', 'category'
+        )
+    ))
+    journal('payroll', (
+        (pk, paid_date or (updated_at or timezone.now()).date(), f"Payroll: {month} {year}", amount, 'payroll_expense')
+        for pk, paid_date, updated_at, month, year, amount in Payroll.objects.filter(paid=True).values_list(
+            'pk', 'paid_date', 'updated_at', 'month', 'year', 'amount'
+        )
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0010_general_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_journal_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0011_backfill_journal_entries'),
+        ('students', '0011_merge_students'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'All Students'), ('class', 'Class'), ('session', 'Session'), ('student', 'Student')], max_length=10)),
+                ('key', models.CharField(blank=True, help_text='Class/session name or student id', max_length=100)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('current', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_0_30', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_61_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_over_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fee_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-date', 'dimension', 'key'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='tuitionfee',
+            name='accounting__status_3bd624_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tuitionfee',
+            index=models.Index(fields=['status', 'due_date', 'student'], name='accounting__status_6d2ae3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agingsnapshot',
+            index=models.Index(fields=['dimension', 'key', 'date'], name='accounting__dimensi_4f4281_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='agingsnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'dimension', 'key'), name='agingsnapshot_unique_day'),
+        ),
+    ]
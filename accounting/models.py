@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models, transaction
+from django.db.models import Case, When, Value, F, Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 import uuid
@@ -49,7 +50,16 @@ class TuitionFee(models.Model):
         # Composite index for commonly queried combinations
         indexes = [
             models.Index(fields=['student', 'session', 'term']),
-            models.Index(fields=['status', 'due_date']),
+            # Open-fee scans by due date (aging buckets, overdue counts)
+            # and the per-student aging drill-down
+            models.Index(fields=['status', 'due_date', 'student']),
+        ]
+        constraints = [
+            # Last line of defence against overpayment races
+            models.CheckConstraint(
+                condition=Q(amount_paid__gte=0) & Q(amount_paid__lte=F('amount_due')),
+                name='tuitionfee_amount_paid_within_due',
+            ),
         ]
 
     def clean(self):
@@ -104,6 +114,67 @@ class TuitionFee(models.Model):
             return (self.amount_paid / self.amount_due) * 100
         return 0
 
+    @staticmethod
+    def _balance_updates(new_paid):
+        """
+        UPDATE assignments for a fee whose amount_paid becomes ``new_paid``.
+
+        Status and paid date are computed in SQL from the incremented value,
+        never from a possibly stale in-memory instance.
+        """
+        fully_paid = Q(amount_due__lte=new_paid)
+        return {
+            'amount_paid': new_paid,
+            'status': Case(
+                When(fully_paid, then=Value('paid')),
+                default=Value('partial'),
+                output_field=models.CharField(),
+            ),
+            'paid_date': Case(
+                When(fully_paid, then=Value(timezone.now().date())),
+                default=Value(None),
+                output_field=models.DateField(),
+            ),
+            'updated_at': timezone.now(),
+        }
+
+    @classmethod
+    def record_payment(cls, fee_id, amount):
+        """
+        Atomically add ``amount`` to a fee's balance.
+
+        Issues a single ``UPDATE ... SET amount_paid = amount_paid + %s``
+        guarded by ``amount_paid + %s <= amount_due``, so concurrent
+        cashiers can neither lose an update nor overpay. Returns False when
+        the payment would exceed the outstanding balance.
+        """
+        new_paid = F('amount_paid') + amount
+        updated = cls.objects.filter(
+            pk=fee_id,
+            amount_due__gte=new_paid,
+        ).update(**cls._balance_updates(new_paid))
+        return updated == 1
+
+    @classmethod
+    def apply_payment_totals(cls, totals):
+        """
+        Add ``{fee_id: amount}`` to many fees with one aggregated UPDATE.
+
+        Callers are expected to have validated the totals against balances
+        read under ``select_for_update``; the check constraint still rejects
+        any overpayment that slips through.
+        """
+        if not totals:
+            return 0
+        increment = Case(
+            *[When(pk=fee_id, then=Value(amount)) for fee_id, amount in totals.items()],
+            default=Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        return cls.objects.filter(pk__in=list(totals)).update(
+            **cls._balance_updates(F('amount_paid') + increment)
+        )
+
     @classmethod
     def get_fee_statistics(cls):
         """Get overall fee statistics"""
@@ -168,6 +239,8 @@ class Payment(models.Model):
         ordering = ['-payment_date', '-created_at']
         indexes = [
             models.Index(fields=['payment_date', 'method']),
+            # Covers date-range SUM(amount) scans
+            models.Index(fields=['payment_date', 'amount']),
             models.Index(fields=['created_at', 'created_by']),
         ]
 
@@ -181,17 +254,23 @@ class Payment(models.Model):
         if self.amount and self.amount <= 0:
             raise ValidationError("Payment amount must be greater than zero")
 
-        if self.tuition_fee and self.amount:
+        if self.tuition_fee_id and self.amount:
             # Check for overpayment only for new payments
             if not self.pk:  # New payment
-                total_paid = self.tuition_fee.amount_paid + self.amount
-                remaining_due = self.tuition_fee.amount_due - self.tuition_fee.amount_paid
+                self._check_overpayment()
 
-                if total_paid > self.tuition_fee.amount_due:
-                    raise ValidationError(
-                        f"Payment of ₦{self.amount:,.2f} exceeds remaining balance of ₦{remaining_due:,.2f}. "
-                        f"Maximum payment allowed is ₦{remaining_due:,.2f}."
-                    )
+    def _check_overpayment(self):
+        """Compare against the current balance in the database, not the cached instance"""
+        amount_due, amount_paid = TuitionFee.objects.filter(
+            pk=self.tuition_fee_id
+        ).values_list('amount_due', 'amount_paid').get()
+        remaining_due = amount_due - amount_paid
+
+        if self.amount > remaining_due:
+            raise ValidationError(
+                f"Payment of ₦{self.amount:,.2f} exceeds remaining balance of ₦{remaining_due:,.2f}. "
+                f"Maximum payment allowed is ₦{remaining_due:,.2f}."
+            )
 
     def save(self, *args, **kwargs):
         # Run validation
@@ -201,21 +280,17 @@ class Payment(models.Model):
             # Check if this is a new payment
             is_new = self.pk is None
 
+            # Only update tuition fee for new payments. The guarded UPDATE
+            # runs first so a payment that lost a race is never stored.
+            if is_new and not TuitionFee.record_payment(self.tuition_fee_id, self.amount):
+                self._check_overpayment()
+                raise ValidationError("Payment could not be applied to the tuition fee")
+
             super().save(*args, **kwargs)
 
-            # Only update tuition fee for new payments
-            if is_new:
-                # Update the tuition fee
-                tuition = self.tuition_fee
-                tuition.amount_paid += self.amount
-                # Update status manually before saving to avoid recursion
-                if tuition.amount_paid >= tuition.amount_due:
-                    tuition.status = 'paid'
-                    tuition.paid_date = timezone.now().date()
-                elif tuition.amount_paid > 0:
-                    tuition.status = 'partial'
-                # Save with specific fields to avoid triggering unnecessary updates
-                tuition.save(update_fields=['amount_paid', 'status', 'paid_date'])
+        if is_new:
+            # Keep the cached fee in step with the row we just updated
+            self.tuition_fee.refresh_from_db(fields=['amount_paid', 'status', 'paid_date', 'updated_at'])
 
 
 class Payroll(models.Model):
@@ -273,7 +348,8 @@ class Expense(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['date', 'category']),
+            # Covers date-range totals, optionally per category
+            models.Index(fields=['date', 'category', 'amount']),
             models.Index(fields=['created_at']),
         ]
 
@@ -342,3 +418,117 @@ class FinancialReport(models.Model):
         """Increment download counter"""
         self.download_count += 1
         self.save(update_fields=['download_count'])
+
+
+class JournalEntry(models.Model):
+    """A balanced set of ledger lines posted from a payment, expense or payroll"""
+    SOURCE_TYPES = [
+        ('payment', 'Payment'),
+        ('expense', 'Expense'),
+        ('payroll', 'Payroll'),
+    ]
+    date = models.DateField(db_index=True)
+    description = models.CharField(max_length=200)
+    source_type = models.CharField(max_length=20, choices=SOURCE_TYPES)
+    source_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date', '-id']
+        verbose_name_plural = 'Journal entries'
+        constraints = [
+            models.UniqueConstraint(fields=['source_type', 'source_id'], name='journalentry_unique_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.description}"
+
+
+class JournalLine(models.Model):
+    """One side of a journal entry; balances are debit minus credit"""
+    ACCOUNTS = [
+        ('cash', 'Cash and Bank'),
+        ('tuition_revenue', 'Tuition Revenue'),
+        ('expense_supplies', 'Supplies Expense'),
+        ('expense_maintenance', 'Maintenance Expense'),
+        ('expense_salary', 'Salary Expense'),
+        ('expense_utility', 'Utility Expense'),
+        ('expense_other', 'Other Expense'),
+        ('payroll_expense', 'Payroll Expense'),
+    ]
+    entry = models.ForeignKey(JournalEntry, on_delete=models.CASCADE, related_name='lines')
+    account = models.CharField(max_length=30, choices=ACCOUNTS)
+    # Copied from the entry so period deltas are a single index range scan
+    date = models.DateField()
+    debit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'date']),
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_account_display()} Dr {self.debit} Cr {self.credit}"
+
+
+class AccountBalance(models.Model):
+    """Cumulative account totals up to the end of a closed month"""
+    account = models.CharField(max_length=30, choices=JournalLine.ACCOUNTS)
+    month = models.DateField(help_text="First day of the month the checkpoint closes")
+    debit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-month', 'account']
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'month'], name='accountbalance_unique_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_account_display()} at {self.month:%B %Y}: {self.balance}"
+
+    @property
+    def balance(self):
+        return self.debit_total - self.credit_total
+
+
+class AgingSnapshot(models.Model):
+    """Receivables aging buckets for one class, session or student on a given day"""
+    DIMENSIONS = [
+        ('total', 'All Students'),
+        ('class', 'Class'),
+        ('session', 'Session'),
+        ('student', 'Student'),
+    ]
+    date = models.DateField()
+    dimension = models.CharField(max_length=10, choices=DIMENSIONS)
+    key = models.CharField(max_length=100, blank=True, help_text="Class/session name or student id")
+    label = models.CharField(max_length=200, blank=True)
+    current = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_0_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_61_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_over_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fee_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', 'dimension', 'key']
+        indexes = [
+            models.Index(fields=['dimension', 'key', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'dimension', 'key'], name='agingsnapshot_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"Aging {self.get_dimension_display()} {self.label or self.key} on {self.date}"
+
+    @property
+    def overdue(self):
+        return self.total - self.current
@@ -0,0 +1,357 @@
+"""
+Bank statement reconciliation for tuition fee payments.
+
+Statements (CSV or XLSX) are streamed line by line, matched to open
+tuition fees through hash indexes built once per import, and posted in
+batches: one bulk INSERT of payments plus one aggregated UPDATE of the
+affected fees per batch, under row locks. Each batch is journalled in
+bulk as well, since bulk_create bypasses the ledger signals, and the
+cached dashboard and fee lists are invalidated the way the signals would.
+Backends that return no ids from bulk_create (MySQL) save payments one
+at a time instead, so each is journalled by its signal.
+"""
+import codecs
+import csv
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import dashboard
+from core.listing import bump_table_version
+
+from . import ledger
+from .models import TuitionFee, Payment
+
+logger = logging.getLogger(__name__)
+
+# Header aliases seen on the statements exported by the banks we deal with
+COLUMN_ALIASES = {
+    'date': ('date', 'transaction date', 'trans date', 'value date', 'payment date', 'payment_date'),
+    'amount': ('amount', 'credit', 'credit amount', 'deposit', 'deposits', 'lodgement'),
+    'reference': ('reference', 'ref', 'reference number', 'reference_number', 'transaction reference'),
+    'receipt_number': ('receipt', 'receipt number', 'receipt_number', 'receipt no', 'teller', 'teller number'),
+    'admission_number': ('admission number', 'admission_number', 'admission no', 'student id', 'student number'),
+    'description': ('description', 'narration', 'remarks', 'details', 'memo'),
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y', '%d %b %Y', '%m/%d/%Y')
+
+# Tokens in a narration that could be an admission number, e.g. "GTS/2024/015"
+TOKEN_SPLIT = re.compile(r'[\s,;:|]+')
+
+OPEN_STATUSES = ('unpaid', 'partial')
+
+
+@dataclass
+class StatementLine:
+    """A single credit line read from a bank statement"""
+    line_number: int
+    date: date
+    amount: Decimal
+    reference: str = ''
+    receipt_number: str = ''
+    admission_number: str = ''
+    description: str = ''
+
+
+@dataclass
+class ReconciliationResult:
+    """Outcome of a reconciliation run, grouped for display"""
+    posted: list = field(default_factory=list)
+    unmatched: list = field(default_factory=list)
+    duplicates: list = field(default_factory=list)
+    rejected: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    total_posted: Decimal = Decimal('0.00')
+    lines_read: int = 0
+
+    @property
+    def posted_count(self):
+        return len(self.posted)
+
+
+def _normalize(value):
+    """Normalize an identifier for hash lookups"""
+    if value is None:
+        return ''
+    return str(value).strip().upper()
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    text = str(value or '').replace(',', '').replace('₦', '').replace('NGN', '').strip()
+    if not text:
+        return None
+    try:
+        return Decimal(text).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def _map_columns(header):
+    """Map statement headers to StatementLine fields by position"""
+    positions = {}
+    for position, title in enumerate(header):
+        title = str(title or '').strip().lower()
+        for field_name, aliases in COLUMN_ALIASES.items():
+            if title in aliases and field_name not in positions:
+                positions[field_name] = position
+    missing = {'date', 'amount'} - set(positions)
+    if missing:
+        raise ValueError(f"Statement is missing required column(s): {', '.join(sorted(missing))}")
+    return positions
+
+
+def _iter_rows(statement_file, filename):
+    """Yield raw rows from a CSV or XLSX file without loading it whole"""
+    name = (filename or getattr(statement_file, 'name', '') or '').lower()
+    if name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(statement_file, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+    else:
+        # Iterating a Django File yields lines chunk by chunk
+        yield from csv.reader(codecs.iterdecode(statement_file, 'utf-8-sig'))
+
+
+def iter_statement_lines(statement_file, filename=None, errors=None):
+    """
+    Stream credit lines from a bank statement.
+
+    Rows that cannot be parsed are appended to ``errors`` (when given) as
+    ``(line_number, message)`` and skipped; debit and zero rows are ignored.
+    """
+    rows = _iter_rows(statement_file, filename)
+    positions = None
+    for line_number, row in enumerate(rows, start=1):
+        if not row or not any(cell not in (None, '') for cell in row):
+            continue
+        if positions is None:
+            positions = _map_columns(row)
+            continue
+
+        def cell(name):
+            position = positions.get(name)
+            if position is None or position >= len(row):
+                return ''
+            value = row[position]
+            return value if value is not None else ''
+
+        try:
+            amount = _parse_amount(cell('amount'))
+            if amount is None or amount <= 0:
+                continue
+            yield StatementLine(
+                line_number=line_number,
+                date=_parse_date(cell('date')),
+                amount=amount,
+                reference=str(cell('reference')).strip(),
+                receipt_number=str(cell('receipt_number')).strip(),
+                admission_number=str(cell('admission_number')).strip(),
+                description=str(cell('description')).strip(),
+            )
+        except ValueError as e:
+            if errors is not None:
+                errors.append((line_number, str(e)))
+
+
+class FeeIndex:
+    """
+    Hash indexes over open tuition fees, built with two queries.
+
+    ``balances`` tracks the outstanding amount per fee and is reduced as
+    lines are matched, so one import never allocates more than a fee owes.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.by_admission = defaultdict(list)
+        self.by_reference = {}
+        self.by_receipt = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        open_fees = TuitionFee.objects.filter(
+            status__in=OPEN_STATUSES
+        ).order_by('due_date', 'pk').values_list(
+            'pk', 'student__admission_number', 'amount_due', 'amount_paid'
+        )
+        for pk, admission_number, amount_due, amount_paid in open_fees.iterator(chunk_size=2000):
+            index.balances[pk] = amount_due - amount_paid
+            index.by_admission[_normalize(admission_number)].append(pk)
+
+        # References and receipts already used against open fees identify
+        # instalments paid into the same fee
+        prior_payments = Payment.objects.filter(
+            tuition_fee__status__in=OPEN_STATUSES
+        ).filter(~Q(reference='') | ~Q(receipt_number='')).values_list(
+            'tuition_fee_id', 'reference', 'receipt_number'
+        )
+        for fee_id, reference, receipt_number in prior_payments.iterator(chunk_size=2000):
+            if reference:
+                index.by_reference.setdefault(_normalize(reference), fee_id)
+            if receipt_number:
+                index.by_receipt.setdefault(_normalize(receipt_number), fee_id)
+        return index
+
+    def _first_open(self, admission_number):
+        for fee_id in self.by_admission.get(_normalize(admission_number), ()):
+            if self.balances.get(fee_id, 0) > 0:
+                return fee_id
+        return None
+
+    def match(self, line):
+        """Return ``(fee_id, None)`` or ``(None, reason)`` for a statement line"""
+        fee_id = None
+        if line.receipt_number:
+            fee_id = self.by_receipt.get(_normalize(line.receipt_number))
+        if fee_id is None and line.reference:
+            fee_id = self.by_reference.get(_normalize(line.reference))
+        if fee_id is None and line.admission_number:
+            fee_id = self._first_open(line.admission_number)
+        if fee_id is None:
+            for token in TOKEN_SPLIT.split(f"{line.reference} {line.description}"):
+                if token:
+                    fee_id = self._first_open(token)
+                    if fee_id is not None:
+                        break
+
+        if fee_id is None or fee_id not in self.balances:
+            return None, 'No open fee matches this line'
+        if line.amount > self.balances[fee_id]:
+            return None, f"Amount exceeds outstanding balance of ₦{self.balances[fee_id]:,.2f}"
+        return fee_id, None
+
+    def reserve(self, fee_id, amount):
+        self.balances[fee_id] -= amount
+
+
+class StatementReconciler:
+    """Match a bank statement to open fees and post the payments in bulk"""
+
+    def __init__(self, user=None, batch_size=500, method='bank', dry_run=False):
+        self.user = user
+        self.batch_size = batch_size
+        self.method = method
+        self.dry_run = dry_run
+
+    def run(self, statement_file, filename=None):
+        result = ReconciliationResult()
+        index = FeeIndex.build()
+        batch = []
+        # Same key the database duplicate check uses in _post_batch
+        seen = set()
+
+        for line in iter_statement_lines(statement_file, filename, errors=result.errors):
+            result.lines_read += 1
+            if line.reference:
+                key = (line.reference[:100], line.date, line.amount)
+                if key in seen:
+                    result.duplicates.append((line, 'Repeated in this statement'))
+                    continue
+                seen.add(key)
+            fee_id, reason = index.match(line)
+            if fee_id is None:
+                result.unmatched.append((line, reason))
+                continue
+            index.reserve(fee_id, line.amount)
+            batch.append((fee_id, line))
+            if len(batch) >= self.batch_size:
+                self._post_batch(batch, result)
+                batch = []
+
+        if batch:
+            self._post_batch(batch, result)
+
+        logger.info(
+            f"Statement reconciliation: {result.lines_read} lines, {result.posted_count} posted, "
+            f"{len(result.unmatched)} unmatched, {len(result.duplicates)} duplicates"
+        )
+        return result
+
+    def _post_batch(self, batch, result):
+        with transaction.atomic():
+            # References are stored cut to the column length
+            references = {line.reference[:100] for _, line in batch if line.reference}
+            already_posted = set(
+                Payment.objects.filter(reference__in=references).values_list(
+                    'reference', 'payment_date', 'amount'
+                )
+            ) if references else set()
+
+            # Lock the fees and re-read balances; another cashier may have
+            # posted against them since the index was built
+            outstanding = {
+                pk: amount_due - amount_paid
+                for pk, amount_due, amount_paid in TuitionFee.objects.select_for_update().filter(
+                    pk__in={fee_id for fee_id, _ in batch}
+                ).values_list('pk', 'amount_due', 'amount_paid')
+            }
+
+            payments = []
+            totals = defaultdict(Decimal)
+            for fee_id, line in batch:
+                if line.reference and (line.reference[:100], line.date, line.amount) in already_posted:
+                    result.duplicates.append((line, 'Already recorded'))
+                    continue
+                if line.amount > outstanding.get(fee_id, 0) - totals[fee_id]:
+                    result.rejected.append((line, 'Balance changed during import'))
+                    continue
+                totals[fee_id] += line.amount
+                payments.append(Payment(
+                    tuition_fee_id=fee_id,
+                    amount=line.amount,
+                    payment_date=line.date,
+                    method=self.method,
+                    reference=line.reference[:100],
+                    receipt_number=line.receipt_number[:50],
+                    notes=f"Bank statement line {line.line_number}: {line.description}"[:1000],
+                    created_by=self.user,
+                ))
+                result.posted.append((line, fee_id))
+                result.total_posted += line.amount
+
+            if self.dry_run or not payments:
+                return
+            if connection.features.can_return_rows_from_bulk_insert:
+                Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+                TuitionFee.apply_payment_totals(totals)
+                # bulk_create skips post_save, so journal the batch here
+                ledger.post_many('payment', payments)
+            else:
+                # Payments without ids cannot be journalled in bulk; save()
+                # applies each to its fee and post_save journals it
+                for payment in payments:
+                    payment.save()
+            # bulk_create skips post_save, so cached pages and month buckets are invalidated here
+            bump_table_version(Payment)
+            bump_table_version(TuitionFee)
+            for day in {payment.payment_date for payment in payments}:
+                dashboard.day_changed(day)
@@ -1,12 +1,97 @@
 """
 Financial report generation utilities
 """
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Max, Q
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import timedelta
+from collections import defaultdict
 import json
 from .models import TuitionFee, Payment, Expense, Payroll
+from core.periods import next_month
+from . import ledger
+
+
+# Most recent expenses listed line by line in an expense report
+EXPENSE_DETAIL_LIMIT = 500
+
+
+class ExpenseAnalytics:
+    """
+    Single accumulator for expense report breakdowns.
+
+    Rows are ``(month, category, total, count, largest)`` groups;
+    ``from_queryset`` fills it from one ``GROUP BY`` query on month and
+    category, and every breakdown is read from the same structures.
+    """
+
+    CATEGORIES = [code for code, _ in Expense.EXPENSE_CATEGORIES]
+
+    def __init__(self, start_date, end_date, top_n=10):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.top_n = top_n
+        self.total = Decimal('0.00')
+        self.count = 0
+        self.largest = Decimal('0.00')
+        self.categories = defaultdict(lambda: Decimal('0.00'))
+        self.months = defaultdict(lambda: [Decimal('0.00'), 0])
+
+    @classmethod
+    def from_queryset(cls, queryset, start_date, end_date, top_n=10):
+        analytics = cls(start_date, end_date, top_n)
+        rows = queryset.annotate(month=TruncMonth('date')).values('month', 'category').annotate(
+            total=Sum('amount'), count=Count('id'), largest=Max('amount')
+        ).order_by()
+        for row in rows:
+            analytics.add(row['month'], row['category'], row['total'], row['count'], row['largest'])
+        return analytics
+
+    def add(self, month, category, total, count=1, largest=None):
+        total = total or Decimal('0.00')
+        if hasattr(month, 'date'):
+            month = month.date()
+        category = category if category in self.CATEGORIES else 'other'
+        self.total += total
+        self.count += count
+        self.largest = max(self.largest, largest if largest is not None else total)
+        self.categories[category] += total
+        self.months[month.replace(day=1)][0] += total
+        self.months[month.replace(day=1)][1] += count
+
+    def _share(self, amount):
+        return (amount / self.total * 100) if self.total > 0 else 0
+
+    def category_breakdown(self, fmt):
+        return [
+            {
+                'name': category.title(),
+                'amount': fmt(self.categories[category]),
+                'percentage': fmt(self._share(self.categories[category])),
+            }
+            for category in self.CATEGORIES
+        ]
+
+    def monthly_trend(self, fmt):
+        """Every month in the range, including empty ones, with month-on-month change"""
+        trend = []
+        previous_total = None
+        month = self.start_date.replace(day=1)
+        while month <= self.end_date:
+            month_total, month_count = self.months.get(month, (Decimal('0.00'), 0))
+            change = 0
+            if previous_total is not None and previous_total > 0:
+                change = (month_total - previous_total) / previous_total * 100
+            trend.append({
+                'month_name': month.strftime('%B %Y'),
+                'total': fmt(month_total),
+                'count': month_count,
+                'average': fmt(month_total / month_count if month_count else 0),
+                'change': fmt(change),
+            })
+            previous_total = month_total
+            month = next_month(month)
+        return trend
 
 
 class ReportGenerator:
@@ -91,10 +176,9 @@ class ReportGenerator:
     
     def generate_balance_sheet(self):
         """Generate balance sheet data"""
-        # Assets
-        cash_on_hand = Payment.objects.filter(
-            payment_date__lte=self.end_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Assets: cash is read from the ledger (nearest monthly checkpoint
+        # plus the lines since), so expenses and payroll outflows count
+        cash_on_hand = ledger.balances_as_of(self.end_date)['cash']
         
         accounts_receivable = TuitionFee.objects.filter(
             status__in=['unpaid', 'partial']
@@ -140,22 +224,13 @@ class ReportGenerator:
     
     def generate_cash_flow(self):
         """Generate cash flow statement data"""
-        # Operating Activities
-        cash_from_operations = Payment.objects.filter(
-            payment_date__gte=self.start_date,
-            payment_date__lte=self.end_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        cash_for_expenses = Expense.objects.filter(
-            date__gte=self.start_date,
-            date__lte=self.end_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        cash_for_payroll = Payroll.objects.filter(
-            paid=True,
-            paid_date__gte=self.start_date,
-            paid_date__lte=self.end_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Operating Activities, as movements on the ledger accounts
+        movements = ledger.account_movements(self.start_date, self.end_date)
+        cash_from_operations = -movements.get('tuition_revenue', 0)
+        cash_for_expenses = sum(
+            change for account, change in movements.items() if account.startswith('expense_')
+        )
+        cash_for_payroll = movements.get('payroll_expense', 0)
         
         net_operating_cash = (
             self._format_decimal(cash_from_operations) - 
@@ -289,137 +364,66 @@ class ReportGenerator:
     
     def generate_expense_report(self):
         """Generate comprehensive expense report"""
-        # Get expenses within the date range
         expenses = Expense.objects.filter(
             date__gte=self.start_date,
             date__lte=self.end_date
-        ).order_by('-date')
+        )
+        analytics = ExpenseAnalytics.from_queryset(expenses, self.start_date, self.end_date)
         
-        # Build detailed expense list
+        # Detail rows are capped so multi-year reports stay small; every
+        # figure below comes from the grouped totals, not from this list
         expense_list = []
-        for expense in expenses:
+        for row in expenses.order_by('-date', '-id').values(
+            'date', 'category', 'description', 'amount'
+        )[:EXPENSE_DETAIL_LIMIT]:
             expense_list.append({
-                'date': expense.date,
-                'category': expense.category.title() if expense.category else 'Other',
-                'description': expense.description,
-                'vendor': getattr(expense, 'vendor', None),
-                'amount': float(expense.amount),  # Convert to float
-                'payment_method': getattr(expense, 'payment_method', 'Cash'),
-                'reference': getattr(expense, 'reference', None),
-                'approved_by': getattr(expense, 'approved_by', None)
-            })
-        
-        # Calculate total expenses
-        total_expenses = sum(exp['amount'] for exp in expense_list)
-        
-        # Expenses by category with percentages
-        expenses_by_category = []
-        categories = ['supplies', 'maintenance', 'salary', 'utility', 'other']
-        for category in categories:
-            category_total = sum(
-                exp['amount'] for exp in expense_list 
-                if exp['category'].lower() == category
-            )
-            percentage = (category_total / total_expenses * 100) if total_expenses > 0 else 0
-            
-            expenses_by_category.append({
-                'name': category.title(),
-                'amount': self._format_decimal(category_total),
-                'percentage': self._format_decimal(percentage)
-            })
-        
-        # Payment methods breakdown
-        payment_methods = {}
-        for expense in expense_list:
-            method = expense['payment_method']
-            if method not in payment_methods:
-                payment_methods[method] = 0.0  # Changed from Decimal to float
-            payment_methods[method] += expense['amount']
-        
-        payment_method_list = []
-        for method, amount in payment_methods.items():
-            percentage = (amount / total_expenses * 100) if total_expenses > 0 else 0
-            payment_method_list.append({
-                'method': method,
-                'amount': self._format_decimal(amount),
-                'percentage': self._format_decimal(percentage)
+                'date': row['date'],
+                'category': row['category'].title() if row['category'] else 'Other',
+                'description': row['description'],
+                'vendor': None,
+                'amount': float(row['amount']),  # Convert to float
+                'payment_method': 'Cash',
+                'reference': None,
+                'approved_by': None
             })
         
-        # Monthly trend
-        monthly_trend = []
-        current_date = self.start_date.replace(day=1)
-        previous_total = None
-        
-        while current_date <= self.end_date:
-            next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            month_end = next_month - timedelta(days=1)
-            
-            if month_end > self.end_date:
-                month_end = self.end_date
-            
-            month_expenses = [
-                exp for exp in expense_list
-                if current_date <= exp['date'] <= month_end
-            ]
-            
-            month_total = sum(exp['amount'] for exp in month_expenses)
-            month_count = len(month_expenses)
-            month_average = (month_total / month_count) if month_count > 0 else 0
-            
-            # Calculate percentage change
-            change = 0
-            if previous_total is not None and previous_total > 0:
-                change = ((month_total - previous_total) / previous_total * 100)
-            
-            monthly_trend.append({
-                'month_name': current_date.strftime('%B %Y'),
-                'total': self._format_decimal(month_total),
-                'count': month_count,
-                'average': self._format_decimal(month_average),
-                'change': self._format_decimal(change)
-            })
-            
-            previous_total = month_total
-            current_date = next_month
-        
-        # Top vendors
-        vendor_totals = {}
-        for expense in expense_list:
-            vendor = expense['vendor'] or 'Unknown'
-            if vendor not in vendor_totals:
-                vendor_totals[vendor] = {'total': 0.0, 'count': 0}  # Changed from Decimal to float
-            vendor_totals[vendor]['total'] += expense['amount']
-            vendor_totals[vendor]['count'] += 1
-        
-        top_vendors = []
-        for vendor, data in sorted(vendor_totals.items(), key=lambda x: x[1]['total'], reverse=True)[:10]:
-            average = (data['total'] / data['count']) if data['count'] > 0 else 0
-            top_vendors.append({
-                'name': vendor,
-                'total': self._format_decimal(data['total']),
-                'count': data['count'],
-                'average': self._format_decimal(average)
-            })
-        
-        # Summary statistics
-        largest_expense = max((exp['amount'] for exp in expense_list), default=0.0)  # Changed from Decimal to float
-        unique_vendors = len(set(exp['vendor'] for exp in expense_list if exp['vendor']))
-        total_transactions = len(expense_list)
+        total_expenses = analytics.total
+        total_transactions = analytics.count
+        expenses_by_category = analytics.category_breakdown(self._format_decimal)
         average_transaction = (total_expenses / total_transactions) if total_transactions > 0 else 0
+        # Expenses do not record a vendor or payment method, so every
+        # expense is one 'Unknown' vendor paid in 'Cash'
+        payment_methods = [
+            {'method': 'Cash', 'amount': self._format_decimal(total_expenses), 'percentage': self._format_decimal(100)}
+        ] if total_transactions else []
+        top_vendors = [{
+            'name': 'Unknown',
+            'total': self._format_decimal(total_expenses),
+            'count': total_transactions,
+            'average': self._format_decimal(average_transaction),
+        }] if total_transactions else []
         
         return {
             'report_type': 'expense_report',
             'period_name': self.period_name,
             'expenses': expense_list,
+            'expenses_shown': len(expense_list),
             'total_expenses': self._format_decimal(total_expenses),
+            'expense_categories': {item['name'].lower(): item['amount'] for item in expenses_by_category},
             'expenses_by_category': expenses_by_category,
-            'payment_methods': payment_method_list,
-            'monthly_trend': monthly_trend,
+            'payment_methods': payment_methods,
+            'monthly_trend': analytics.monthly_trend(self._format_decimal),
             'top_vendors': top_vendors,
+            'top_expenses': [
+                {**item, 'amount': float(item['amount'])}
+                for item in expenses.order_by('-amount', '-date').values(
+                    'date', 'category', 'description', 'amount'
+                )[:analytics.top_n]
+            ],
             'total_transactions': total_transactions,
             'average_transaction': self._format_decimal(average_transaction),
-            'largest_expense': self._format_decimal(largest_expense),
-            'unique_vendors': unique_vendors,
+            'largest_expense': self._format_decimal(analytics.largest),
+            'unique_vendors': 0,
             'generated_at': timezone.now().isoformat()
         }
 
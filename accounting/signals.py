@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.listing import track_table_version
+from . import ledger
+from .models import TuitionFee, Payment, Expense, Payroll
+
+SOURCE_TYPES = {Payment: 'payment', Expense: 'expense', Payroll: 'payroll'}
+
+# Saves that only touch these fields leave the journal entry unchanged
+NON_FINANCIAL_FIELDS = {'verified', 'verified_at', 'verified_by', 'notes', 'updated_by', 'updated_at'}
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Payroll)
+def post_journal_entry(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the ledger entry of a payment, expense or payroll in step with it"""
+    if raw:
+        return
+    if update_fields and set(update_fields) <= NON_FINANCIAL_FIELDS:
+        return
+    ledger.post(SOURCE_TYPES[sender], instance)
+
+
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Payroll)
+def remove_journal_entry(sender, instance, **kwargs):
+    ledger.unpost(SOURCE_TYPES[sender], instance.pk)
+
+
+# Filter dropdowns on the fee and payroll lists are cached per table version
+track_table_version(TuitionFee, Payroll)
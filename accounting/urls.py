@@ -14,12 +14,15 @@ urlpatterns = [
     path('fees/create/', views.fee_create, name='fee_create'),
     path('fees/<int:pk>/', views.fee_detail, name='fee_detail'),
     path('fees/<int:pk>/edit/', views.fee_edit, name='fee_edit'),
+    path('fees/aging/', views.aging_report, name='aging_report'),
+    path('fees/aging/student/<int:student_id>/', views.student_aging, name='student_aging'),
 
     # Payment Management
     path('payments/', views.payment_list, name='payment_list'),
     path('payments/create/', views.payment_create, name='payment_create'),
     path('payments/create/<int:fee_pk>/', views.payment_create, name='payment_create_for_fee'),
     path('payments/<int:pk>/verify/', views.verify_payment, name='verify_payment'),
+    path('payments/reconcile/', views.reconcile_statement, name='reconcile_statement'),
 
     # Expense Management
     path('expenses/', views.expense_list, name='expense_list'),
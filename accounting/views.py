@@ -4,11 +4,14 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from decimal import Decimal
 from .models import TuitionFee, Payment, Expense, Payroll, FinancialReport
-from .forms import TuitionFeeForm, PaymentForm, ExpenseForm
+from .forms import TuitionFeeForm, PaymentForm, ExpenseForm, BankStatementUploadForm
 from core.decorators import staff_required, accountant_required
+from core.listing import filtered_summary, distinct_options, keyset_page, query_string
+from core import periods
 import json
 
 
@@ -32,25 +35,22 @@ def accounting_home(request):
     
     try:
         # Current financial statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
+        today = timezone.now().date()
+        this_month = periods.month(today)
         
         # Total fees for current month
         monthly_fees = TuitionFee.objects.filter(
-            created_at__month=current_month,
-            created_at__year=current_year
+            this_month.filter('created_at', aware=True)
         ).aggregate(total=Sum('amount_due'))['total'] or 0
         
         # Total payments for current month  
         monthly_payments = Payment.objects.filter(
-            payment_date__month=current_month,
-            payment_date__year=current_year
+            this_month.filter('payment_date')
         ).aggregate(total=Sum('amount'))['total'] or 0
         
         # Total expenses for current month
         monthly_expenses = Expense.objects.filter(
-            date__month=current_month,
-            date__year=current_year
+            this_month.filter('date')
         ).aggregate(total=Sum('amount'))['total'] or 0
         
         # Outstanding fees
@@ -68,30 +68,29 @@ def accounting_home(request):
             total=Sum('amount_due')
         )
         
-        # Monthly trends (last 6 months)
+        # Monthly trends (last 6 calendar months), one grouped query per table
+        months = periods.last_months(today, 6)
+        span = periods.Period(months[0].start, months[-1].end, '')
+        payments_by_month = dict(
+            Payment.objects.filter(span.filter('payment_date')).annotate(month=TruncMonth('payment_date'))
+            .values('month').annotate(total=Sum('amount')).order_by().values_list('month', 'total')
+        )
+        expenses_by_month = dict(
+            Expense.objects.filter(span.filter('date')).annotate(month=TruncMonth('date'))
+            .values('month').annotate(total=Sum('amount')).order_by().values_list('month', 'total')
+        )
         monthly_trends = []
-        for i in range(6):
-            month_date = timezone.now().replace(day=1) - timezone.timedelta(days=30*i)
-            month_payments = Payment.objects.filter(
-                payment_date__month=month_date.month,
-                payment_date__year=month_date.year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            month_expenses = Expense.objects.filter(
-                date__month=month_date.month,
-                date__year=month_date.year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
+        for period in months:
+            month_payments = payments_by_month.get(period.start) or 0
+            month_expenses = expenses_by_month.get(period.start) or 0
             # Use keys expected by the frontend JS: 'revenue' and 'expenses'
             monthly_trends.append({
-                'month': month_date.strftime('%B %Y'),
+                'month': period.label,
                 'revenue': float(month_payments),
                 'expenses': float(month_expenses),
                 'net': float(month_payments - month_expenses)
             })
         
-        monthly_trends.reverse()  # Show oldest to newest
-        
         # Top fee categories (using session and term as categories)
         fee_categories = TuitionFee.objects.values('session', 'term').annotate(
             count=Count('id'),
@@ -460,9 +459,8 @@ def reports(request):
         ).count()
         
         reports_this_month = FinancialReport.objects.filter(
+            periods.month(timezone.now().date()).filter('generated_at', aware=True),
             generated_by=request.user,
-            generated_at__month=timezone.now().month,
-            generated_at__year=timezone.now().year
         ).count()
         
         context.update({
@@ -488,16 +486,15 @@ def reports(request):
 @staff_required
 def fee_list(request):
     """List all tuition fees with search and filtering"""
-    fees = TuitionFee.objects.select_related('student').order_by('-created_at')
+    fees = TuitionFee.objects.select_related('student__user')
     
     # Search functionality
-    search_query = request.GET.get('q')
+    search_query = request.GET.get('search') or request.GET.get('q')
     if search_query:
         fees = fees.filter(
-            Q(student__first_name__icontains=search_query) |
-            Q(student__last_name__icontains=search_query) |
-            Q(student__admission_number__icontains=search_query) |
-            Q(description__icontains=search_query)
+            Q(student__user__first_name__icontains=search_query) |
+            Q(student__user__last_name__icontains=search_query) |
+            Q(student__admission_number__icontains=search_query)
         )
     
     # Filter by status
@@ -505,10 +502,13 @@ def fee_list(request):
     if status_filter:
         fees = fees.filter(status=status_filter)
     
-    # Filter by session
+    # Filter by session and term
     session_filter = request.GET.get('session')
     if session_filter:
         fees = fees.filter(session=session_filter)
+    term_filter = request.GET.get('term')
+    if term_filter:
+        fees = fees.filter(term=term_filter)
     
     # Date range filtering
     date_from = request.GET.get('date_from')
@@ -518,45 +518,54 @@ def fee_list(request):
     if date_to:
         fees = fees.filter(created_at__date__lte=date_to)
     
-    # Pagination
-    paginator = Paginator(fees, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Summary statistics
-    total_fees = fees.aggregate(total=Sum('amount_due'))['total'] or 0
-    pending_fees = fees.filter(status='pending').aggregate(total=Sum('amount_due'))['total'] or 0
-    paid_fees = fees.filter(status='paid').aggregate(total=Sum('amount_due'))['total'] or 0
-    unpaid_fees = fees.filter(status='unpaid').aggregate(total=Sum('amount_due'))['total'] or 0
-    
-    # Calculate collection stats
-    total_paid_amount = Payment.objects.filter(tuition_fee__in=fees).aggregate(total=Sum('amount'))['total'] or 0
-    outstanding_amount = total_fees - total_paid_amount
+    # Every summary card plus the row count in one query. amount_paid is
+    # kept in step with the payments, so no join to Payment is needed.
+    summary = filtered_summary(
+        fees,
+        total_due=Sum('amount_due'),
+        total_paid=Sum('amount_paid'),
+        paid_due=Sum('amount_due', filter=Q(status='paid')),
+        unpaid_due=Sum('amount_due', filter=Q(status='unpaid')),
+    )
+    total_fees = summary['total_due']
+    total_paid_amount = summary['total_paid']
     collection_percentage = (total_paid_amount / total_fees * 100) if total_fees > 0 else 0
     
-    # Get available sessions for filtering
-    available_sessions = TuitionFee.objects.values_list('session', flat=True).distinct().order_by('session')
-    available_terms = TuitionFee.objects.values_list('term', flat=True).distinct().order_by('term')
+    # Newest first; keyset cursors keep deep pages as cheap as the first
+    page_obj = keyset_page(request, fees, ('-pk',), summary['count'], per_page=25)
+    
+    # Filter options, cached until the fee table changes
+    available_sessions = distinct_options(TuitionFee, 'session')
+    available_terms = distinct_options(TuitionFee, 'term')
     
     # Create fee_stats object for template compatibility
     fee_stats = {
         'total_due': total_fees,
         'total_paid': total_paid_amount,
-        'outstanding': outstanding_amount,
-        'collection_percentage': collection_percentage
+        'outstanding': total_fees - total_paid_amount,
+        'collection_percentage': collection_percentage,
+        'paid_due': summary['paid_due'],
+        'unpaid_due': summary['unpaid_due'],
     }
     
     # Prepare context and render the fee list template
     context = {
-        'fees': fees,
         'page_obj': page_obj,
-        'paginator': paginator,
+        'paginator': page_obj.paginator,
         'fee_stats': fee_stats,
         'available_sessions': available_sessions,
         'available_terms': available_terms,
+        'sessions': available_sessions,
+        'terms': available_terms,
+        'search': search_query or '',
+        'status_filter': status_filter,
+        'session_filter': session_filter,
+        'term_filter': term_filter,
+        'filter_query': query_string(request.GET),
         'filters': {
             'status': status_filter,
             'session': session_filter,
+            'term': term_filter,
             'q': search_query,
             'date_from': date_from,
             'date_to': date_to,
@@ -758,6 +767,103 @@ def verify_payment(request, pk):
     return JsonResponse({'success': True, 'payment_id': payment.pk})
 
 
+@login_required
+@accountant_required
+def reconcile_statement(request):
+    """Upload a bank statement and post matched lines as payments in bulk"""
+    from .reconciliation import StatementReconciler
+
+    result = None
+    if request.method == 'POST':
+        form = BankStatementUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            statement = form.cleaned_data['statement']
+            reconciler = StatementReconciler(
+                user=request.user,
+                method=form.cleaned_data['method'],
+                dry_run=form.cleaned_data['dry_run'],
+            )
+            try:
+                result = reconciler.run(statement, filename=statement.name)
+            except ValueError as e:
+                messages.error(request, f'Could not read statement: {str(e)}')
+            else:
+                if reconciler.dry_run:
+                    messages.info(
+                        request,
+                        f'Preview: {result.posted_count} line(s) would be posted (₦{result.total_posted:,.2f})'
+                    )
+                else:
+                    messages.success(
+                        request,
+                        f'{result.posted_count} payment(s) totalling ₦{result.total_posted:,.2f} recorded'
+                    )
+    else:
+        form = BankStatementUploadForm()
+
+    return render(request, 'accounting/reconcile_statement.html', {
+        'form': form,
+        'result': result,
+        'title': 'Reconcile Bank Statement'
+    })
+
+
+@login_required
+@accountant_required
+def aging_report(request):
+    """Receivables aging by class, session and student, with snapshot comparison"""
+    from datetime import timedelta
+    from . import aging
+
+    today = timezone.now().date()
+    try:
+        compare_days = min(max(int(request.GET.get('compare', 30)), 1), 3650)
+    except (ValueError, OverflowError):
+        compare_days = 30
+
+    summary = aging.aging_summary(today)
+    by_class = aging.aging_by('class', today)
+    by_session = aging.aging_by('session', today)
+    top_students = aging.aging_by('student', today, limit=50)
+
+    # Compare against the nearest stored snapshot
+    previous = aging.snapshot_on_or_before(today - timedelta(days=compare_days)).get('')
+
+    context = {
+        'title': 'Receivables Aging',
+        'as_of': today,
+        'buckets': aging.BUCKETS,
+        'summary': summary,
+        'previous': previous,
+        'by_class': by_class,
+        'by_session': by_session,
+        'top_students': top_students,
+        'compare_days': compare_days,
+    }
+    return render(request, 'accounting/aging_report.html', context)
+
+
+@login_required
+@accountant_required
+def student_aging(request, student_id):
+    """Open fees of one student with their aging bucket"""
+    from students.models import StudentProfile
+    from . import aging
+
+    student = get_object_or_404(StudentProfile.objects.select_related('user', 'current_class'), pk=student_id)
+    today = timezone.now().date()
+    fees = aging.student_fees(student, today)
+
+    return render(request, 'accounting/student_aging.html', {
+        'title': f'Aging - {student.user.get_full_name() or student.admission_number}',
+        'student': student,
+        'fees': fees,
+        'bucket_labels': dict(aging.BUCKETS),
+        'total_outstanding': sum((fee.amount_outstanding for fee in fees), Decimal('0.00')),
+        'as_of': today,
+    })
+
+
 # Expense Management Views  
 @login_required
 @staff_required
@@ -854,7 +960,7 @@ def expense_create(request):
 @staff_required
 def payroll_list(request):
     """List all payroll records"""
-    payroll_records = Payroll.objects.select_related('staff', 'created_by').order_by('-year', '-month')
+    payroll_records = Payroll.objects.select_related('staff__user', 'created_by')
     
     # Filter by staff
     staff_filter = request.GET.get('staff')
@@ -871,28 +977,29 @@ def payroll_list(request):
     
     # Filter by payment status
     paid_filter = request.GET.get('paid')
-    if paid_filter is not None:
+    if paid_filter:
         payroll_records = payroll_records.filter(paid=paid_filter == 'true')
     
-    # Pagination
-    paginator = Paginator(payroll_records, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Summary cards and row count in one query
+    summary = filtered_summary(
+        payroll_records,
+        total_amount=Sum('amount'),
+        paid_amount=Sum('amount', filter=Q(paid=True)),
+        pending_payments=Sum('amount', filter=Q(paid=False)),
+    )
     
-    # Summary statistics
-    total_amount = payroll_records.aggregate(total=Sum('amount'))['total'] or 0
-    pending_payments = payroll_records.filter(paid=False).aggregate(total=Sum('amount'))['total'] or 0
-    paid_amount = payroll_records.filter(paid=True).aggregate(total=Sum('amount'))['total'] or 0
+    page_obj = keyset_page(request, payroll_records, ('-year', '-month', '-pk'), summary['count'], per_page=25)
     
     context = {
         'page_obj': page_obj,
-        'total_amount': total_amount,
-        'paid_amount': paid_amount,
-        'pending_payments': pending_payments,
+        'total_amount': summary['total_amount'],
+        'paid_amount': summary['paid_amount'],
+        'pending_payments': summary['pending_payments'],
         'staff_filter': staff_filter,
         'month_filter': month_filter,
         'year_filter': year_filter,
         'paid_filter': paid_filter,
+        'filter_query': query_string(request.GET),
         'current_year': timezone.now().year,
         'years_range': range(timezone.now().year - 2, timezone.now().year + 1),
         'months_range': range(1, 13)
@@ -1009,7 +1116,7 @@ def generate_report_ajax(request):
     from .models import FinancialReport
     from .report_utils import get_report_data
     from .file_generators import generate_report_file
-    from datetime import datetime, timedelta
+    from datetime import datetime
     from django.http import JsonResponse
     from decimal import Decimal
     import uuid
@@ -1042,31 +1149,15 @@ def generate_report_ajax(request):
             report_type = 'income_statement'
 
         # Calculate date range based on period
-        now = timezone.now()
-        if period == 'current_month':
-            start_date = now.replace(day=1).date()
-            end_date = now.date()
-            period_name = now.strftime('%B %Y')
-        elif period == 'last_month':
-            last_month = now.replace(day=1) - timedelta(days=1)
-            start_date = last_month.replace(day=1).date()
-            end_date = last_month.date()
-            period_name = last_month.strftime('%B %Y')
-        elif period == 'current_quarter':
-            quarter = ((now.month - 1) // 3) + 1
-            start_date = now.replace(month=((quarter-1)*3)+1, day=1).date()
-            end_date = now.date()
-            period_name = f'Q{quarter} {now.year}'
-        elif period == 'current_year':
-            start_date = now.replace(month=1, day=1).date()
-            end_date = now.date()
-            period_name = str(now.year)
-        elif period == 'custom' and start_date_str and end_date_str:
+        if period == 'custom' and start_date_str and end_date_str:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             period_name = f'{start_date.strftime("%b %d, %Y")} - {end_date.strftime("%b %d, %Y")}'
         else:
-            return JsonResponse({'error': 'Invalid date period'}, status=400)
+            selected = periods.named_period(period)
+            if selected is None:
+                return JsonResponse({'error': 'Invalid date period'}, status=400)
+            start_date, end_date, period_name = selected.start, selected.last_day, selected.label
 
         # Generate report data
         report_data = get_report_data(report_type, start_date, end_date, period_name)
@@ -1328,11 +1419,10 @@ def dashboard_stats_ajax(request):
     """AJAX endpoint for dashboard statistics"""
     try:
         from django.db.models import Sum
-        from datetime import datetime, timedelta
         
         # Get current month stats
         now = timezone.now()
-        current_month_start = now.replace(day=1)
+        this_month = periods.month(now.date())
         
         # Calculate statistics
         total_fees = TuitionFee.objects.aggregate(
@@ -1349,11 +1439,11 @@ def dashboard_stats_ajax(request):
         
         # Current month stats
         monthly_payments = Payment.objects.filter(
-            payment_date__gte=current_month_start
+            this_month.filter('payment_date')
         ).aggregate(total=Sum('amount'))['total'] or 0
         
         monthly_expenses = Expense.objects.filter(
-            date__gte=current_month_start
+            this_month.filter('date')
         ).aggregate(total=Sum('amount'))['total'] or 0
         
         # Outstanding fees
@@ -1367,8 +1457,8 @@ def dashboard_stats_ajax(request):
         ).count()
         
         reports_this_month = FinancialReport.objects.filter(
+            this_month.filter('generated_at', aware=True),
             generated_by=request.user,
-            generated_at__gte=current_month_start
         ).count()
 
         stats = {
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Sum
 from django.utils import timezone
 
 
@@ -75,9 +76,8 @@ class CBTSession(models.Model):
         if not self.is_submitted:
             return None
 
-        correct_answers = self.answers.filter(is_correct=True)
-        total_marks = sum(answer.question.marks for answer in correct_answers)
-        total_possible = sum(q.marks for q in self.exam.questions.all())
+        total_marks = self.answers.filter(is_correct=True).aggregate(total=Sum('question__marks'))['total'] or 0
+        total_possible = self.exam.questions.aggregate(total=Sum('marks'))['total'] or 0
 
         if total_possible > 0:
             self.score = total_marks
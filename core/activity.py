@@ -0,0 +1,130 @@
+"""
+Throttled last-seen tracking for signed-in users.
+
+UserActivityMiddleware calls touch() on every authenticated request. A
+per-process map skips users already recorded in the last
+ACTIVITY_INTERVAL seconds without any I/O; otherwise ``cache.add`` on a
+per-user key (holding the timestamp, expiring after the interval) lets
+exactly one worker claim the user for the interval. Claimed timestamps
+wait in the worker's pending map and are written by a single
+``bulk_update`` of ``last_seen`` at most once per ACTIVITY_FLUSH_INTERVAL
+from the metrics flusher thread (core.metrics), never from a request, and
+once more when the process exits.
+
+So each user costs at most one cache write and one row in a batched
+UPDATE per minute, and the "online now" count is one indexed query on
+``last_seen``.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SEEN_KEY = 'activity:seen:{}'
+ONLINE_KEY = 'activity:online'
+ONLINE_CACHE_SECONDS = 30
+ONLINE_WINDOW = timedelta(minutes=5)
+
+_recent = {}
+_pending = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _interval():
+    return getattr(settings, 'ACTIVITY_INTERVAL', 60)
+
+
+def touch(user_id, now=None):
+    """Note that ``user_id`` was active; cheap enough to call on every request"""
+    clock = time.monotonic()
+    if clock - _recent.get(user_id, float('-inf')) < _interval():
+        return False
+    _recent[user_id] = clock
+    if len(_recent) > 50000:
+        _recent.clear()
+
+    now = now or timezone.now()
+    try:
+        claimed = cache.add(SEEN_KEY.format(user_id), now, _interval())
+    except Exception as e:
+        logger.warning(f"Activity cache unavailable: {e}")
+        claimed = True
+    if claimed:
+        with _lock:
+            _pending[user_id] = now
+    return claimed
+
+
+def flush():
+    """Write pending last-seen times in one bulk_update. Returns the number of users written."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+    User = get_user_model()
+    users = [User(pk=user_id, last_seen=seen) for user_id, seen in pending.items()]
+    try:
+        User.objects.bulk_update(users, ['last_seen'], batch_size=500)
+    except Exception as e:
+        logger.error(f"Failed to write last-seen times for {len(users)} users: {e}")
+        return 0
+    return len(users)
+
+
+def flush_if_due():
+    """Flusher hook: write pending times once ACTIVITY_FLUSH_INTERVAL has passed"""
+    global _last_flush
+    clock = time.monotonic()
+    if clock - _last_flush < getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 60):
+        return 0
+    _last_flush = clock
+    try:
+        return flush()
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def last_seen(user):
+    """Most recent activity of ``user``, including a timestamp not yet flushed"""
+    try:
+        cached = cache.get(SEEN_KEY.format(user.pk))
+    except Exception:
+        cached = None
+    return max(filter(None, [cached, user.last_seen]), default=None)
+
+
+def online_now():
+    """Users seen in the last ONLINE_WINDOW, total and by role (cached briefly)"""
+    counts = cache.get(ONLINE_KEY)
+    if counts is None:
+        since = timezone.now() - ONLINE_WINDOW
+        by_role = dict(
+            get_user_model().objects.filter(last_seen__gte=since)
+            .values_list('role').annotate(count=Count('pk')).order_by()
+        )
+        counts = {'total': sum(by_role.values()), 'by_role': by_role}
+        cache.set(ONLINE_KEY, counts, ONLINE_CACHE_SECONDS)
+    return counts
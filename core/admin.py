@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import UserNotification, InboxMessage, NewsPost, UpcomingEvent
+from .listing import bump_table_version
+from . import fanout
+from .models import UserNotification, InboxMessage, NewsPost, UpcomingEvent, PerformanceRollup, NotificationFanout
 
 @admin.register(UserNotification)
 class UserNotificationAdmin(admin.ModelAdmin):
@@ -13,6 +15,28 @@ class UserNotificationAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user')
 
 
+@admin.register(NotificationFanout)
+class NotificationFanoutAdmin(admin.ModelAdmin):
+    list_display = ('title', 'audience', 'target', 'status', 'sent', 'total', 'created_by', 'created_at')
+    list_filter = ('status', 'audience', 'created_at')
+    search_fields = ('title', 'message')
+    date_hierarchy = 'created_at'
+    readonly_fields = (
+        'status', 'total', 'sent', 'last_recipient', 'error', 'created_by', 'created_at', 'started_at', 'updated_at',
+        'finished_at',
+    )
+
+    def has_change_permission(self, request, obj=None):
+        # Notifications already sent cannot be edited
+        return obj is None and super().has_change_permission(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        obj.created_by = request.user
+        obj.total = fanout.recipients(obj).count()
+        super().save_model(request, obj, form, change)
+        fanout.start(obj)
+
+
 @admin.register(InboxMessage)
 class InboxMessageAdmin(admin.ModelAdmin):
     list_display = (
@@ -58,6 +82,7 @@ class NewsPostAdmin(admin.ModelAdmin):
 
     def publish_posts(self, request, queryset):
         updated = queryset.update(is_published=True)
+        bump_table_version(NewsPost)  # update() sends no post_save; moves cached public pages on
         self.message_user(request, f"Published {updated} post(s)")
 
 
@@ -72,3 +97,12 @@ class UpcomingEventAdmin(admin.ModelAdmin):
             'https://cdn.jsdelivr.net/npm/tinymce@6.8.3/tinymce.min.js',
             'admin/js/tinymce_init.js',
         )
+
+
+@admin.register(PerformanceRollup)
+class PerformanceRollupAdmin(admin.ModelAdmin):
+    list_display = ('route', 'resolution', 'period_start', 'requests', 'p95', 'server_errors', 'queries')
+    list_filter = ('resolution',)
+    search_fields = ('route',)
+    date_hierarchy = 'period_start'
+    readonly_fields = [field.name for field in PerformanceRollup._meta.fields]
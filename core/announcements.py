@@ -0,0 +1,124 @@
+"""
+Announcements read where they are stored.
+
+An announcement is a single row; nothing is copied per user when it is
+posted. Who sees it is decided at query time from the user's role
+(ROLE_AUDIENCES) against ``Announcement.audience``, through the
+(audience, is_active, id) index.
+
+What a user has read is one AnnouncementReadState row: every
+announcement with an id up to ``watermark`` counts as read, plus a
+sparse set of ids above it read one at a time. Unread announcements are
+then ``id > watermark`` minus that set. Marking one read moves the
+watermark up to just below the oldest announcement still waiting for the
+user, so the set stays as small as the number of announcements read out
+of order.
+
+Users get their state on first use, with the watermark at the last
+announcement posted before they joined. UserNotification stays for
+items addressed to one user.
+"""
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from academics.models import Announcement
+
+from .caching import cached_fragment
+from .models import AnnouncementReadState
+
+# Announcement audiences each role reads
+ROLE_AUDIENCES = {
+    'student': ('all', 'students'),
+    'staff': ('all', 'staff'),
+    'admin': ('all', 'admin', 'staff'),
+    'it_support': ('all', 'staff'),
+    'accountant': ('all', 'staff'),
+}
+LIST_SIZE = 15
+
+
+def audiences(user):
+    return ROLE_AUDIENCES.get(getattr(user, 'role', None), ('all',))
+
+
+def _live(queryset):
+    now = timezone.now()
+    return queryset.filter(
+        Q(publish_date__isnull=True) | Q(publish_date__lte=now),
+        Q(expiry_date__isnull=True) | Q(expiry_date__gt=now),
+    )
+
+
+def visible(user):
+    """Active, published, unexpired announcements addressed to ``user``"""
+    return _live(Announcement.objects.filter(is_active=True, audience__in=audiences(user)))
+
+
+def recent(user):
+    """Latest announcements for ``user``'s role, cached per role until one is saved"""
+    return cached_fragment(
+        'announcements', getattr(user, 'role', 'anonymous'), [Announcement],
+        lambda: list(visible(user).select_related('created_by').order_by('-priority', '-created_at')[:LIST_SIZE]),
+    )
+
+
+def state(user):
+    """``user``'s read state, created on first use"""
+    try:
+        return user.announcement_state
+    except AnnouncementReadState.DoesNotExist:
+        before = Announcement.objects.filter(created_at__lt=user.date_joined).aggregate(last=Max('id'))['last']
+        user.announcement_state, _ = AnnouncementReadState.objects.get_or_create(
+            user=user, defaults={'watermark': before or 0},
+        )
+        return user.announcement_state
+
+
+def unread(user):
+    read = state(user)
+    return visible(user).filter(id__gt=read.watermark).exclude(id__in=read.read_ids)
+
+
+def unread_count(user):
+    return unread(user).count()
+
+
+def unread_ids(user):
+    return set(unread(user).values_list('id', flat=True))
+
+
+def _compact(user, read):
+    """
+    Raise the watermark to just below the oldest announcement ``user``
+    could still be shown unread, dropping the ids it now covers. Scheduled
+    and inactive announcements count as waiting, since they may be shown
+    later.
+    """
+    waiting = Announcement.objects.filter(audience__in=audiences(user), id__gt=read.watermark).exclude(
+        id__in=read.read_ids,
+    ).exclude(expiry_date__lte=timezone.now()).order_by('id').values_list('id', flat=True).first()
+    if waiting is None:
+        waiting = (Announcement.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    read.watermark = max(read.watermark, waiting - 1)
+    read.read_ids = sorted(i for i in set(read.read_ids) if i > read.watermark)
+    read.save(update_fields=['watermark', 'read_ids', 'updated_at'])
+
+
+def mark_read(user, announcement_id):
+    """Mark one announcement read. Returns False if it already was or ``user`` cannot see it."""
+    read = state(user)
+    if read.is_read(announcement_id) or not visible(user).filter(id=announcement_id).exists():
+        return False
+    read.read_ids = read.read_ids + [announcement_id]
+    _compact(user, read)
+    return True
+
+
+def mark_all_read(user):
+    """Mark every announcement ``user`` can see read. Returns how many were unread."""
+    read = state(user)
+    ids = unread_ids(user)
+    if ids:
+        read.read_ids = read.read_ids + sorted(ids)
+        _compact(user, read)
+    return len(ids)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from . import announcements
 from .models import UserNotification
 from .serializers import UserNotificationSerializer
 
@@ -43,6 +44,7 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
             user=request.user, 
             is_read=False
         ).update(is_read=True)
+        updated_count += announcements.mark_all_read(request.user)
         
         return Response({
             'status': 'all notifications marked as read',
@@ -51,10 +53,11 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        """Get the count of unread notifications"""
+        """Get the count of unread notifications, school announcements included"""
         count = UserNotification.objects.filter(
             user=request.user, 
             is_read=False
         ).count()
+        count += announcements.unread_count(request.user)
         
         return Response({'unread_count': count})
@@ -0,0 +1,217 @@
+"""
+Bulk attendance marking and attendance statistics.
+
+Submitted ids are validated with a single ``IN`` query and every record for
+the date is written with one upsert (core.bulk), relying on the
+(student, date) and (staff, date) unique constraints. Bulk writes send
+no post_save signals, so the term attendance bitmaps, the class daily
+summaries and the dashboard snapshot are updated here.
+
+Statistics pages get every count for a table from one conditional
+aggregate, a briefly cached "present today" snapshot, and keyset-paginated
+record lists.
+"""
+import logging
+from datetime import datetime
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from staff.models import StaffAttendance, StaffProfile
+from students import attendance_bits, class_attendance
+from students.models import AttendanceRecord, StudentProfile
+
+from . import dashboard
+from .bulk import upsert
+from .listing import bump_table_version, filtered_summary, keyset_page, query_string
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+TODAY_KEY = 'attendance:today:{}'
+TODAY_CACHE_SECONDS = 60
+RECORDS_PER_PAGE = 50
+RECORD_ORDERING = ('-date', '-pk')
+
+
+def _ids(values):
+    """Submitted ids as integers; junk values are dropped"""
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _valid_ids(model, values):
+    """The subset of submitted ids that exist, in one IN query"""
+    wanted = _ids(values)
+    if not wanted:
+        return []
+    return list(model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+
+
+def upsert_student_attendance(day, statuses):
+    """
+    Write ``{student_id: present}`` for ``day`` in one upsert. Ids must
+    already be validated. Returns the number of records written.
+    """
+    records = [
+        AttendanceRecord(student_id=student_id, date=day, present=present)
+        for student_id, present in statuses.items()
+    ]
+    if not records:
+        return 0
+    with transaction.atomic():
+        upsert(AttendanceRecord, records, ['student', 'date'], ['present'], batch_size=BATCH_SIZE)
+        attendance_bits.apply_marks(day, statuses)
+        class_attendance.students_changed(day, statuses)
+    # bulk_create sends no post_save, so cached student pages are moved on here
+    bump_table_version(AttendanceRecord)
+    dashboard.day_changed(day)
+    forget_today(day)
+    return len(records)
+
+
+def mark_students(student_ids, day, present):
+    """Mark the given students present or absent on ``day``"""
+    valid = _valid_ids(StudentProfile, student_ids)
+    return upsert_student_attendance(day, dict.fromkeys(valid, present))
+
+
+def mark_staff(staff_ids, day, present, marked_by=None):
+    """Mark the given staff present or absent on ``day``"""
+    valid = _valid_ids(StaffProfile, staff_ids)
+    records = [
+        StaffAttendance(staff_id=staff_id, date=day, present=present, created_by=marked_by)
+        for staff_id in valid
+    ]
+    if not records:
+        return 0
+    with transaction.atomic():
+        # created_by is kept from the first marking on conflict
+        upsert(StaffAttendance, records, ['staff', 'date'], ['present'], batch_size=BATCH_SIZE)
+    dashboard.day_changed(day)
+    forget_today(day)
+    return len(records)
+
+
+def class_register(student_class, day):
+    """
+    Students of a class with their attendance on ``day``: one query for the
+    students and one for the day's records. ``present`` is None when the
+    student has not been marked yet.
+    """
+    students = list(
+        StudentProfile.objects.filter(current_class=student_class).select_related('user')
+        .order_by('user__last_name', 'user__first_name')
+    )
+    marked = dict(
+        AttendanceRecord.objects.filter(student__in=students, date=day).values_list('student_id', 'present')
+    )
+    for student in students:
+        student.present = marked.get(student.pk)
+    return students
+
+
+def mark_register(student_class, day, present_ids):
+    """
+    Mark a whole class register: students in ``present_ids`` are present,
+    everyone else in the class absent. Returns (present, absent) counts.
+    """
+    class_ids = list(StudentProfile.objects.filter(current_class=student_class).values_list('pk', flat=True))
+    present = _ids(present_ids) & set(class_ids)
+    absent = len(class_ids) - len(present)
+    upsert_student_attendance(day, {student_id: student_id in present for student_id in class_ids})
+    logger.info(f"Register for {student_class} on {day}: {len(present)} present, {absent} absent")
+    return len(present), absent
+
+
+def date_range(request):
+    """
+    ``start_date``/``end_date`` GET filters as dates. Malformed values are
+    dropped with a warning message instead of failing the query later.
+    """
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = (request.GET.get(name) or '').strip()
+        if not value:
+            dates[name] = None
+            continue
+        try:
+            dates[name] = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            messages.warning(request, f"Invalid {name.replace('_', ' ')} filter ignored.")
+            dates[name] = None
+    return dates['start_date'], dates['end_date']
+
+
+def in_range(queryset, start_date=None, end_date=None):
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    return queryset
+
+
+def attendance_summary(queryset):
+    """Total, present, absent and percentage for an attendance queryset in one aggregate query"""
+    summary = filtered_summary(queryset, present=Count('pk', filter=Q(present=True)))
+    total, present = summary['count'], summary['present']
+    return {
+        'total': total,
+        'present': present,
+        'absent': total - present,
+        'percent': round(present / total * 100, 1) if total else 0.0,
+    }
+
+
+def today_snapshot(today=None):
+    """Students and staff present today, cached for TODAY_CACHE_SECONDS"""
+    today = today or timezone.now().date()
+    key = TODAY_KEY.format(today.isoformat())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = {
+            'students_present': AttendanceRecord.objects.filter(date=today, present=True).count(),
+            'staff_present': StaffAttendance.objects.filter(date=today, present=True).count(),
+        }
+        cache.set(key, snapshot, TODAY_CACHE_SECONDS)
+    return snapshot
+
+
+def forget_today(day):
+    if day == timezone.now().date():
+        cache.delete(TODAY_KEY.format(day.isoformat()))
+
+
+def records_page(request, queryset, count, prefix=''):
+    """A keyset page of attendance records, newest first"""
+    return keyset_page(request, queryset, RECORD_ORDERING, count, per_page=RECORDS_PER_PAGE, prefix=prefix)
+
+
+def filter_query(start_date, end_date):
+    """The date filters encoded for pagination links"""
+    return query_string({'start_date': start_date, 'end_date': end_date})
+
+
+def student_statistics(request, student):
+    """Context for a student's own attendance page"""
+    start_date, end_date = date_range(request)
+    records = in_range(student.attendance_records.all(), start_date, end_date)
+    summary = attendance_summary(records)
+    return {
+        'records': records_page(request, records, summary['total']),
+        'total_days': summary['total'],
+        'days_present': summary['present'],
+        'days_absent': summary['absent'],
+        'attendance_percent': summary['percent'],
+        'start_date': start_date.isoformat() if start_date else '',
+        'end_date': end_date.isoformat() if end_date else '',
+        'filter_query': filter_query(start_date, end_date),
+    }
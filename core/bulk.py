@@ -0,0 +1,50 @@
+"""
+Bulk upserts that run on every database backend we deploy to.
+
+bulk_create(update_conflicts=True) needs ``unique_fields`` on PostgreSQL
+and SQLite, but MySQL's ``ON DUPLICATE KEY UPDATE`` cannot name a
+conflict target and Django refuses ``unique_fields`` there, relying on
+the table's unique keys instead. Backends without any upsert fall back
+to updating the rows that exist and inserting the rest.
+"""
+from django.db import connections
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    Insert ``objs``, updating ``update_fields`` of rows that already exist
+    with the same ``unique_fields``. Call inside a transaction.
+    """
+    features = connections[model.objects.db].features
+    if not features.supports_update_conflicts:
+        return _update_then_insert(model, objs, unique_fields, update_fields, batch_size)
+    options = {'update_conflicts': True, 'update_fields': update_fields, 'batch_size': batch_size}
+    if features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return model.objects.bulk_create(objs, **options)
+
+
+def _update_then_insert(model, objs, unique_fields, update_fields, batch_size):
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+
+    def key(obj):
+        return tuple(getattr(obj, attname) for attname in attnames)
+
+    existing = model.objects.select_for_update().filter(**{
+        f'{attname}__in': {getattr(obj, attname) for obj in objs} for attname in attnames
+    })
+    pks = {tuple(row[1:]): row[0] for row in existing.values_list('pk', *attnames)}
+    found, missing = [], []
+    for obj in objs:
+        if key(obj) in pks:
+            obj.pk = pks[key(obj)]
+            found.append(obj)
+        else:
+            missing.append(obj)
+    if found:
+        fields = [model._meta.get_field(name) for name in update_fields]
+        for obj in found:
+            for field in fields:
+                field.pre_save(obj, False)  # bulk_update does not fill auto_now fields
+        model.objects.bulk_update(found, update_fields, batch_size=batch_size)
+    return found + model.objects.bulk_create(missing, batch_size=batch_size)
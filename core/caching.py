@@ -0,0 +1,130 @@
+"""
+Per-view and per-fragment caching.
+
+The sitewide cache middleware did little here: nearly every page is
+behind login and varies on the session cookie. Views opt in instead:
+
+- ``public_page`` caches a whole page for anonymous visitors, keyed by
+  path and query string;
+- ``per_user_page`` caches a page per signed-in user and session, for
+  student pages that show only the user's own rows;
+- ``cached_fragment`` caches a piece of view data under a name and a
+  scope (a role, a user id).
+
+Nothing is deleted on writes. Every key embeds the table versions of the
+models the page reads (core.listing.table_version), so a save or delete
+on one of them moves readers to a new key and the old entry expires.
+Pages that also filter on the current time pass a short ``timeout``.
+Models are given as ``'app_label.modelname'`` labels and must be
+registered with track_table_version().
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+
+from . import metrics
+from .listing import TABLE_VERSION_KEY
+
+PAGE_TIMEOUT = getattr(settings, 'PAGE_CACHE_SECONDS', 60 * 15)
+FRAGMENT_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_SECONDS', 60 * 5)
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def versions(*models):
+    """Current table versions of ``models`` as one key part, read in a single get_many"""
+    keys = [TABLE_VERSION_KEY.format(_label(model).lower()) for model in models]
+    if not keys:
+        return '0'
+    found = cache.get_many(keys)
+    return '.'.join(str(found.get(key, 0)) for key in keys)
+
+
+def _digest(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _pending_messages(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _cached_view(view, prefix, scope, models, timeout):
+    name = f'{view.__module__}.{view.__name__}'
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        part = scope(request) if request.method in ('GET', 'HEAD') else None
+        if part is None or _pending_messages(request):
+            return view(request, *args, **kwargs)
+
+        key = f'{prefix}:{name}:{_digest(part, request.get_full_path(), versions(*models))}'
+        response = cache.get(key)
+        if response is not None:
+            metrics.registry.increment(metrics.PAGE_CACHE, (name, 'hit'))
+            return response
+
+        metrics.registry.increment(metrics.PAGE_CACHE, (name, 'miss'))
+        response = view(request, *args, **kwargs)
+        if _cacheable(response) and not (prefix == 'page' and request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+            cache.set(key, response, timeout)
+        return response
+
+    return wrapper
+
+
+def _anonymous(request):
+    return '' if not request.user.is_authenticated else None
+
+
+def _session_user(request):
+    if not request.user.is_authenticated or not request.session.session_key:
+        return None
+    # The session is part of the key so cached CSRF tokens stay valid; it rotates on login
+    return f'{request.user.pk}:{request.session.session_key}'
+
+
+def public_page(*models, timeout=PAGE_TIMEOUT):
+    """
+    Cache a page for anonymous GET requests. Signed-in users, requests with
+    pending messages and responses that use a CSRF token are not cached.
+    """
+    def decorator(view):
+        return _cached_view(view, 'page', _anonymous, models, timeout)
+    return decorator
+
+
+def per_user_page(*models, timeout=PAGE_TIMEOUT):
+    """Cache a page separately for each signed-in user and session; apply inside @login_required"""
+    def decorator(view):
+        cached = _cached_view(view, 'user_page', _session_user, models, timeout)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = cached(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_fragment(name, scope, models, build, timeout=FRAGMENT_TIMEOUT):
+    """
+    ``build()`` cached under ``name`` for one ``scope`` (a role, a user id)
+    until one of ``models`` changes. The result must be picklable.
+    """
+    key = f'fragment:{name}:{scope}:{versions(*models)}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,335 @@
+"""
+Cached snapshot of the admin dashboard.
+
+The dashboard context is built with a handful of aggregate queries and
+kept in the cache. A snapshot is fresh for DASHBOARD_CACHE_TTL seconds or
+until a payment, expense, fee, payroll, attendance or student row changes;
+after that the stale copy is still served while one request rebuilds it in
+a background thread (stale-while-revalidate).
+
+Chart buckets for months that have closed are stored without a timeout,
+so each rebuild only aggregates the current month. A change dated in a
+closed month drops that month's bucket.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .periods import Period, month_start, add_months, next_month
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'dashboard:admin'
+GENERATION_KEY = 'dashboard:admin:generation'
+REFRESH_LOCK_KEY = 'dashboard:admin:refreshing'
+MONTH_KEY = 'dashboard:month:{:%Y-%m}'
+
+# Seconds a snapshot is served without a rebuild
+FRESH_FOR = getattr(settings, 'DASHBOARD_CACHE_TTL', 60)
+# Stale snapshots are kept this long for stale-while-revalidate
+KEEP_FOR = 60 * 60
+REFRESH_LOCK_TIMEOUT = 60
+CHART_MONTHS = 6
+
+# Date field used to find the chart month a changed row belongs to
+DATE_FIELDS = {
+    'accounting.payment': 'payment_date',
+    'accounting.expense': 'date',
+    'students.attendancerecord': 'date',
+    'staff.staffattendance': 'date',
+}
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+
+def _time_ago(day, today):
+    days_ago = (today - day).days
+    return f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
+
+
+def generation():
+    return cache.get(GENERATION_KEY) or 0
+
+
+def invalidate():
+    """Mark the current snapshot stale; the next request triggers a rebuild"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def forget_month(day):
+    """Drop the frozen chart bucket for the month containing ``day``"""
+    cache.delete(MONTH_KEY.format(day))
+
+
+def day_changed(day):
+    """Invalidate the snapshot after rows dated ``day`` changed, including a closed month's bucket"""
+    invalidate()
+    if day and month_start(day) < month_start(timezone.now().date()):
+        forget_month(day)
+
+
+def remember_date(model, instance, update_fields=None):
+    """
+    Signal hook before a save: note the stored date of an existing row, so
+    a row moved to another month also drops the bucket of the month it left
+    """
+    field = DATE_FIELDS.get(model._meta.label_lower)
+    if not field or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and field not in update_fields:
+        return
+    instance._dashboard_saved_date = model._default_manager.filter(pk=instance.pk).values_list(
+        field, flat=True
+    ).first()
+
+
+def data_changed(model, instance):
+    """Signal hook: invalidate the snapshot and any closed month the row touches"""
+    field = DATE_FIELDS.get(model._meta.label_lower)
+    day = getattr(instance, field, None) if field else None
+    day_changed(day)
+    saved = instance.__dict__.pop('_dashboard_saved_date', None)
+    if saved and saved != day:
+        day_changed(saved)
+
+
+def _grouped_by_month(queryset, date_field, **aggregates):
+    rows = queryset.annotate(month=TruncMonth(date_field)).values('month').annotate(**aggregates).order_by()
+    return {row['month']: row for row in rows}
+
+
+def compute_month_buckets(first, last, until):
+    """
+    Revenue, expenses and attendance percentages for each month from
+    ``first`` to ``last`` (month starts), counting rows dated up to
+    ``until``: one GROUP BY query per table.
+    """
+    from accounting.models import Payment, Expense
+    from students.models import AttendanceRecord as StudentAttendance
+    from staff.models import StaffAttendance
+
+    span = Period(first, next_month(last), '').until(until)
+    attendance = {'total': Count('date'), 'present': Count('date', filter=Q(present=True))}
+    revenue = _grouped_by_month(
+        Payment.objects.filter(span.filter('payment_date')), 'payment_date', total=Sum('amount'),
+    )
+    expenses = _grouped_by_month(Expense.objects.filter(span.filter('date')), 'date', total=Sum('amount'))
+    students = _grouped_by_month(StudentAttendance.objects.filter(span.filter('date')), 'date', **attendance)
+    staff = _grouped_by_month(StaffAttendance.objects.filter(span.filter('date')), 'date', **attendance)
+
+    buckets = {}
+    month = first
+    while month <= last:
+        student_row = students.get(month, {})
+        staff_row = staff.get(month, {})
+        buckets[month] = {
+            'month': month.strftime('%b'),
+            'revenue': float(revenue.get(month, {}).get('total') or 0),
+            'expenses': float(expenses.get(month, {}).get('total') or 0),
+            'attendance_students': _percent(student_row.get('present', 0), student_row.get('total', 0)),
+            'attendance_staff': _percent(staff_row.get('present', 0), staff_row.get('total', 0)),
+        }
+        month = add_months(month, 1)
+    return buckets
+
+
+def chart_buckets(today):
+    """
+    Chart buckets for the last CHART_MONTHS months. Closed months come
+    from the cache when frozen there; the rest are aggregated together and
+    closed ones frozen for good.
+    """
+    current = month_start(today)
+    months = [add_months(current, offset) for offset in range(1 - CHART_MONTHS, 1)]
+    frozen = cache.get_many([MONTH_KEY.format(month) for month in months[:-1]])
+
+    buckets = {}
+    missing = []
+    for month in months:
+        bucket = frozen.get(MONTH_KEY.format(month))
+        if bucket is None:
+            missing.append(month)
+        else:
+            buckets[month] = bucket
+
+    computed = compute_month_buckets(missing[0], missing[-1], today)
+    closed = {}
+    for month in missing:
+        buckets[month] = computed[month]
+        if month < current:
+            closed[MONTH_KEY.format(month)] = computed[month]
+    if closed:
+        cache.set_many(closed, None)
+    return [buckets[month] for month in months]
+
+
+def _recent_activities(today):
+    from students.models import StudentProfile
+    from accounting.models import Payment, Expense
+
+    activities = []
+    for payment in Payment.objects.select_related('tuition_fee__student__user').order_by('-payment_date', '-pk')[:2]:
+        activities.append((payment.payment_date, {
+            'content': (
+                f"Fee payment of ₦{payment.amount:,.0f} received from "
+                f"{payment.tuition_fee.student.user.get_full_name()}"
+            ),
+            'type': 'payment',
+        }))
+    for expense in Expense.objects.order_by('-date', '-pk')[:2]:
+        activities.append((expense.date, {
+            'content': f'Expense recorded: {expense.description} - ₦{expense.amount:,.0f}',
+            'type': 'expense',
+        }))
+    for student in StudentProfile.objects.select_related('user').order_by('-created_at')[:2]:
+        created_date = student.created_at.date() if student.created_at else today
+        activities.append((created_date, {
+            'content': f'New student registration: {student.user.get_full_name()} - {student.admission_number}',
+            'type': 'registration',
+        }))
+
+    activities.sort(key=lambda item: item[0], reverse=True)
+    return [{'time': _time_ago(day, today), **activity} for day, activity in activities[:4]]
+
+
+def build_admin_dashboard_context(today=None):
+    """Compute the admin dashboard context from the database"""
+    from students.models import StudentProfile, AttendanceRecord as StudentAttendance
+    from staff.models import StaffProfile, StaffAttendance
+    from accounting.models import TuitionFee, Expense, Payroll
+
+    today = today or timezone.now().date()
+
+    total_students = StudentProfile.objects.filter(user__is_active=True).count()
+    total_staff = StaffProfile.objects.filter(user__is_active=True).count()
+
+    fees = TuitionFee.objects.aggregate(
+        due=Sum('amount_due'),
+        paid=Sum('amount_paid'),
+        outstanding_students=Count('student', distinct=True, filter=Q(status__in=['unpaid', 'partial'])),
+    )
+    total_fees_due = fees['due'] or 0
+    total_fees_paid = fees['paid'] or 0
+    students_with_outstanding = fees['outstanding_students']
+    collection_rate = (total_fees_paid / total_fees_due * 100) if total_fees_due > 0 else 0
+
+    # Attendance rate (last 30 days, combined students + staff)
+    last_30 = today - timedelta(days=30)
+    attendance = {'total': Count('date'), 'present': Count('date', filter=Q(present=True))}
+    stud_30 = StudentAttendance.objects.filter(date__gte=last_30, date__lte=today).aggregate(**attendance)
+    staff_30 = StaffAttendance.objects.filter(date__gte=last_30, date__lte=today).aggregate(**attendance)
+    attendance_rate = _percent(stud_30['present'] + staff_30['present'], stud_30['total'] + staff_30['total'])
+
+    pending_tasks = []
+    unpaid_payroll_count = Payroll.objects.filter(paid=False).count()
+    if unpaid_payroll_count > 0:
+        pending_tasks.append({
+            'name': 'Unpaid Payroll',
+            'count': unpaid_payroll_count,
+            'badge_class': 'bg-danger',
+            'url': '/accounting/payroll/'
+        })
+    if students_with_outstanding > 0:
+        pending_tasks.append({
+            'name': 'Outstanding Fees',
+            'count': students_with_outstanding,
+            'badge_class': 'bg-warning',
+            'url': '/accounting/fees/'
+        })
+    high_value_expenses = Expense.objects.filter(amount__gte=50000, date__gte=today - timedelta(days=7)).count()
+    if high_value_expenses > 0:
+        pending_tasks.append({
+            'name': 'High-Value Expenses',
+            'count': high_value_expenses,
+            'badge_class': 'bg-info',
+            'url': '/accounting/expenses/'
+        })
+
+    buckets = chart_buckets(today)
+    chart_data = {
+        'months': [bucket['month'] for bucket in buckets],
+        'revenue': [bucket['revenue'] for bucket in buckets],
+        'expenses': [bucket['expenses'] for bucket in buckets],
+        # Student count (approximate - would need historical data)
+        'students': [total_students] * len(buckets),
+        'attendance_students': [bucket['attendance_students'] for bucket in buckets],
+        'attendance_staff': [bucket['attendance_staff'] for bucket in buckets],
+    }
+
+    return {
+        'total_students': total_students,
+        'total_staff': total_staff,
+        'attendance_rate': attendance_rate,
+        'collection_rate': round(collection_rate, 1),
+        'total_fees_paid': total_fees_paid,
+        'total_fees_due': total_fees_due,
+        'monthly_revenue': buckets[-1]['revenue'],
+        'monthly_expenses': buckets[-1]['expenses'],
+        'recent_activities': _recent_activities(today),
+        'pending_tasks': pending_tasks,
+        'students_with_outstanding': students_with_outstanding,
+        'chart_data': json.dumps(chart_data),
+        'last_updated': today.strftime('%B %d, %Y')
+    }
+
+
+def refresh():
+    """Rebuild the snapshot and store it; returns the new cache entry"""
+    started = generation()
+    today = timezone.now().date()
+    entry = {
+        'context': build_admin_dashboard_context(today),
+        'date': today,
+        'generation': started,
+        'built_at': time.time(),
+    }
+    cache.set(SNAPSHOT_KEY, entry, KEEP_FOR)
+    return entry
+
+
+def _background_refresh():
+    try:
+        refresh()
+    except Exception:
+        logger.exception("Background dashboard refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        connection.close()
+
+
+def refresh_in_background():
+    """Start one rebuild thread unless another worker is already rebuilding"""
+    if cache.add(REFRESH_LOCK_KEY, True, REFRESH_LOCK_TIMEOUT):
+        threading.Thread(target=_background_refresh, name='dashboard-refresh', daemon=True).start()
+
+
+def is_stale(entry):
+    return entry['generation'] != generation() or time.time() - entry['built_at'] > FRESH_FOR
+
+
+def get_admin_dashboard_snapshot():
+    """
+    Admin dashboard context from the cache. A missing snapshot, or one from
+    an earlier day, is rebuilt inline; a stale one is served as-is while a
+    background thread rebuilds it.
+    """
+    entry = cache.get(SNAPSHOT_KEY)
+    if entry is None or entry['date'] != timezone.now().date():
+        return refresh()['context']
+    if is_stale(entry):
+        refresh_in_background()
+    return entry['context']
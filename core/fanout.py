@@ -0,0 +1,151 @@
+"""
+Targeted notifications written off the request thread.
+
+A notice that really needs a UserNotification row per recipient
+(results published to their students, fee reminders for debtors) is queued as
+a NotificationFanout and written by a background thread. Recipients are
+streamed as user ids in id order from one ``values_list`` query per
+audience (RECIPIENTS), and rows are inserted NOTIFICATION_FANOUT_BATCH_SIZE
+at a time. Each chunk is committed together with the fan-out's progress
+(``sent`` and ``last_recipient``), so memory stays bounded by one chunk
+and an interrupted fan-out resumes after the last user it notified
+(``manage.py fanout_notifications``).
+
+School-wide notices should be Announcements instead (core.announcements),
+which are never copied per user.
+"""
+import logging
+import threading
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import NotificationFanout, UserNotification
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+STALE_AFTER = timedelta(seconds=getattr(settings, 'NOTIFICATION_FANOUT_STALE_SECONDS', 600))
+
+
+def _role(fanout, after):
+    return get_user_model().objects.filter(
+        role=fanout.target, is_active=True, pk__gt=after,
+    ).order_by('pk').values_list('pk', flat=True)
+
+
+def _class(fanout, after):
+    from students.models import StudentProfile
+    return StudentProfile.objects.filter(
+        current_class_id=fanout.target, user__is_active=True, user_id__gt=after,
+    ).order_by('user_id').values_list('user_id', flat=True)
+
+
+def _debtors(fanout, after):
+    from accounting.models import TuitionFee
+    fees = TuitionFee.objects.filter(
+        status__in=('unpaid', 'partial'), student__user__is_active=True, student__user_id__gt=after,
+    )
+    if fanout.target:
+        fees = fees.filter(session=fanout.target)
+    return fees.order_by('student__user_id').values_list('student__user_id', flat=True).distinct()
+
+
+def _users(fanout, after):
+    return get_user_model().objects.filter(
+        pk__in=[user_id for user_id in fanout.user_ids if user_id > after], is_active=True,
+    ).order_by('pk').values_list('pk', flat=True)
+
+
+# Audience -> function of (fan-out, last notified user id) returning the
+# ids of the users still to notify, in id order
+RECIPIENTS = {
+    'role': _role,
+    'class': _class,
+    'debtors': _debtors,
+    'users': _users,
+}
+
+
+def recipients(fanout):
+    """User ids ``fanout`` has still to notify"""
+    return RECIPIENTS[fanout.audience](fanout, fanout.last_recipient)
+
+
+def queue(title, message, audience, target='', link=None, created_by=None, user_ids=()):
+    """Record a fan-out to ``audience``, or to ``user_ids`` for a users audience, and start writing it"""
+    fanout = NotificationFanout(
+        title=title, message=message, link=link, audience=audience, target=str(target), created_by=created_by,
+        user_ids=sorted(set(user_ids)),
+    )
+    fanout.total = recipients(fanout).count()
+    fanout.save()
+    start(fanout)
+    return fanout
+
+
+def start(fanout):
+    """Write ``fanout`` in a background thread once the current transaction commits"""
+    if not getattr(settings, 'NOTIFICATION_FANOUT_BACKGROUND', True):
+        run(fanout.pk)
+        return
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_background, args=(fanout.pk,), name=f'notification-fanout-{fanout.pk}', daemon=True,
+    ).start())
+
+
+def _run_in_background(fanout_id):
+    try:
+        run(fanout_id)
+    finally:
+        connection.close()
+
+
+def _write_chunk(fanout, user_ids):
+    with transaction.atomic():
+        UserNotification.objects.bulk_create(
+            [UserNotification(user_id=user_id, title=fanout.title, message=fanout.message, link=fanout.link)
+             for user_id in user_ids],
+            batch_size=BATCH_SIZE,
+        )
+        NotificationFanout.objects.filter(pk=fanout.pk).update(
+            sent=F('sent') + len(user_ids), last_recipient=user_ids[-1], updated_at=timezone.now(),
+        )
+
+
+def run(fanout_id, resume=False):
+    """
+    Write a pending fan-out, or with ``resume`` a failed one or one whose
+    worker has written nothing for STALE_AFTER, from the user after its
+    last recipient. Returns the number of notifications written.
+    """
+    now = timezone.now()
+    claimable = Q(status='pending')
+    if resume:
+        claimable |= Q(status='failed') | Q(
+            Q(updated_at__lt=now - STALE_AFTER) | Q(updated_at__isnull=True, started_at__lt=now - STALE_AFTER),
+            status='running',
+        )
+    claimed = NotificationFanout.objects.filter(claimable, pk=fanout_id).update(
+        status='running', started_at=now, updated_at=None, error='',
+    )
+    if not claimed:
+        return 0
+    fanout = NotificationFanout.objects.get(pk=fanout_id)
+    written = 0
+    try:
+        ids = recipients(fanout).iterator(chunk_size=BATCH_SIZE)
+        while chunk := list(islice(ids, BATCH_SIZE)):
+            _write_chunk(fanout, chunk)
+            written += len(chunk)
+    except Exception as exc:
+        logger.exception(f"Notification fan-out {fanout_id} failed after {written} recipients")
+        NotificationFanout.objects.filter(pk=fanout_id).update(status='failed', error=str(exc))
+    else:
+        NotificationFanout.objects.filter(pk=fanout_id).update(status='done', finished_at=timezone.now())
+    return written
@@ -0,0 +1,347 @@
+"""
+Persistent performance history.
+
+Every metrics flush is also added to a per-minute key space in the cache
+(core.metrics.minute_space). Once a minute has closed and every worker
+has flushed into it, the first flusher thread to claim it reads it back
+and writes one PerformanceRollup row per URL name: request count, sparse
+latency buckets with p50/p95/p99, 4xx and 5xx counts, queries and N+1
+requests. When an hour has been written its minute rows are merged into
+one hourly row per route, and closed days are merged from hours in turn.
+Minute rows are kept PERFORMANCE_HISTORY_MINUTE_DAYS days, hourly rows
+PERFORMANCE_HISTORY_HOUR_DAYS days and daily rows for good.
+
+Readers stitch a window together from the coarsest rows that cover it and
+finer rows at its edges, so comparing one term with another reads daily
+rows while the last hour reads minutes.
+"""
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import metrics
+from .models import PerformanceRollup
+
+logger = logging.getLogger(__name__)
+
+MINUTE, HOUR, DAY = PerformanceRollup.MINUTE, PerformanceRollup.HOUR, PerformanceRollup.DAY
+DONE_KEY = 'history:done:{}'
+CLAIM_KEY = 'history:claim:{}:{:%Y%m%d%H%M}'
+CLAIM_TIMEOUT = 60 * 60
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Finer periods a coarse period waits for after it closes, so rows still
+# being saved by another worker's claim are included when it is merged
+LAG = 5
+
+_next_run = None
+
+
+def floor(moment, resolution):
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % resolution)
+
+
+def ceil(moment, resolution):
+    floored = floor(moment, resolution)
+    return floored if floored == moment else floored + timedelta(seconds=resolution)
+
+
+def _settle():
+    """How long after a minute closes until every worker has flushed into it"""
+    return timedelta(seconds=3 * getattr(settings, 'METRICS_FLUSH_INTERVAL', 5) + 5)
+
+
+class Rollup:
+    """Request metrics of one route over some span, merged from frames or rows"""
+
+    def __init__(self):
+        self.histogram = metrics.Histogram()
+        self.client_errors = 0
+        self.server_errors = 0
+        self.queries = 0
+        self.query_time = 0.0
+        self.n_plus_one = 0
+
+    def add_histogram(self, status, histogram):
+        self.histogram.merge(histogram)
+        if status == '4xx':
+            self.client_errors += histogram.count
+        elif status == '5xx':
+            self.server_errors += histogram.count
+
+    def add_row(self, row):
+        histogram = self.histogram
+        for index, count in row.buckets:
+            histogram.counts[index] += count
+        histogram.count += row.requests
+        histogram.total += row.duration_total
+        self.client_errors += row.client_errors
+        self.server_errors += row.server_errors
+        self.queries += row.queries
+        self.query_time += row.query_time
+        self.n_plus_one += row.n_plus_one
+
+    def row(self, resolution, period_start, route):
+        histogram = self.histogram
+        return PerformanceRollup(
+            resolution=resolution,
+            period_start=period_start,
+            route=route[:200],
+            requests=histogram.count,
+            client_errors=self.client_errors,
+            server_errors=self.server_errors,
+            duration_total=histogram.total,
+            buckets=[[index, count] for index, count in enumerate(histogram.counts) if count],
+            p50=histogram.percentile(0.5),
+            p95=histogram.percentile(0.95),
+            p99=histogram.percentile(0.99),
+            queries=self.queries,
+            query_time=self.query_time,
+            n_plus_one=self.n_plus_one,
+        )
+
+    def stats(self, endpoint=None):
+        histogram = self.histogram
+        requests = histogram.count
+        return {
+            'endpoint': endpoint,
+            'request_count': requests,
+            'avg_duration': histogram.mean,
+            'p50_duration': histogram.percentile(0.5),
+            'p95_duration': histogram.percentile(0.95),
+            'p99_duration': histogram.percentile(0.99),
+            'min_duration': histogram.minimum,
+            'max_duration': histogram.maximum,
+            'error_rate': (self.client_errors + self.server_errors) / requests * 100 if requests else 0,
+            'server_error_rate': self.server_errors / requests * 100 if requests else 0,
+            'query_count': self.queries,
+            'avg_queries': self.queries / requests if requests else 0,
+            'avg_query_time': self.query_time / requests if requests else 0,
+            'n_plus_one_requests': self.n_plus_one,
+        }
+
+
+def rollups_from_frame(frame):
+    """Per-route Rollups of a metrics frame"""
+    routes = defaultdict(Rollup)
+    for (name, labels), histogram in frame.histograms.items():
+        if name == metrics.REQUEST_DURATION:
+            route, _method, status = labels
+            routes[route].add_histogram(status, histogram)
+    for (name, labels), value in frame.counters.items():
+        if not labels or labels[0] not in routes:
+            continue
+        if name == metrics.DB_QUERIES:
+            routes[labels[0]].queries += value
+        elif name == metrics.DB_QUERY_MICROSECONDS:
+            routes[labels[0]].query_time += value / 1_000_000
+        elif name == metrics.N_PLUS_ONE:
+            routes[labels[0]].n_plus_one += value
+    return routes
+
+
+def _save(resolution, period_start, routes):
+    rows = [rollup.row(resolution, period_start, route) for route, rollup in routes.items()]
+    PerformanceRollup.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+def _claim(resolution, period_start):
+    return cache.add(CLAIM_KEY.format(resolution, period_start), os.getpid(), CLAIM_TIMEOUT)
+
+
+def done_until(resolution):
+    """End of the last period written at ``resolution`` (None before the first)"""
+    done = cache.get(DONE_KEY.format(resolution))
+    if done is None:
+        latest = PerformanceRollup.objects.filter(resolution=resolution).aggregate(latest=Max('period_start'))['latest']
+        if latest is not None:
+            done = latest + timedelta(seconds=resolution)
+            cache.set(DONE_KEY.format(resolution), done, None)
+    return done
+
+
+def _mark_done(resolution, until):
+    cache.set(DONE_KEY.format(resolution), until, None)
+
+
+def write_minutes(now=None):
+    """Roll up every closed minute not written yet. Returns the number of rows written."""
+    now = now or timezone.now()
+    last = floor(now - _settle(), MINUTE)
+    backlog = getattr(settings, 'METRICS_MINUTE_RETENTION', 2 * 3600)
+    minute = max(done_until(MINUTE) or EPOCH, floor(now - timedelta(seconds=backlog), MINUTE))
+    written = 0
+    while minute < last:
+        if _claim(MINUTE, minute):
+            routes = rollups_from_frame(metrics.read_space(metrics.minute_space(minute)))
+            written += _save(MINUTE, minute, routes)
+        minute += timedelta(minutes=1)
+        _mark_done(MINUTE, minute)
+    return written
+
+
+def _merge_rows(queryset):
+    routes = defaultdict(Rollup)
+    for row in queryset:
+        routes[row.route].add_row(row)
+    return routes
+
+
+def downsample():
+    """Merge fully written hours into hourly rows and fully written days into daily rows"""
+    written = 0
+    for coarse, fine in ((HOUR, MINUTE), (DAY, HOUR)):
+        fine_done = done_until(fine)
+        if fine_done is None:
+            continue
+        closed = floor(fine_done - timedelta(seconds=fine * LAG), coarse)
+        period = done_until(coarse)
+        if period is None:
+            first = PerformanceRollup.objects.filter(resolution=fine).aggregate(first=Min('period_start'))['first']
+            if first is None:
+                continue
+            period = floor(first, coarse)
+        size = timedelta(seconds=coarse)
+        while period < closed:
+            if _claim(coarse, period):
+                routes = _merge_rows(PerformanceRollup.objects.filter(
+                    resolution=fine, period_start__gte=period, period_start__lt=period + size,
+                ))
+                written += _save(coarse, period, routes)
+            period += size
+            _mark_done(coarse, period)
+    return written
+
+
+def prune(now=None):
+    """Delete minute and hourly rows past their retention"""
+    now = now or timezone.now()
+    minute_days = getattr(settings, 'PERFORMANCE_HISTORY_MINUTE_DAYS', 2)
+    hour_days = getattr(settings, 'PERFORMANCE_HISTORY_HOUR_DAYS', 90)
+    deleted, _ = PerformanceRollup.objects.filter(
+        resolution=MINUTE, period_start__lt=now - timedelta(days=minute_days),
+    ).delete()
+    hourly, _ = PerformanceRollup.objects.filter(
+        resolution=HOUR, period_start__lt=now - timedelta(days=hour_days),
+    ).delete()
+    return deleted + hourly
+
+
+def run(now=None):
+    """
+    Flusher hook: write closed minutes, then downsample and prune once
+    per hour. Cheap no-op until the next minute is due.
+    """
+    global _next_run
+    now = now or timezone.now()
+    if _next_run is not None and now < _next_run:
+        return 0
+    _next_run = floor(now, MINUTE) + timedelta(minutes=1) + _settle()
+    def closed_hour():
+        return floor((done_until(MINUTE) or now) - timedelta(minutes=LAG), HOUR)
+
+    try:
+        previous_hour = closed_hour()
+        written = write_minutes(now)
+        if closed_hour() != previous_hour:
+            written += downsample()
+            prune(now)
+        return written
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+# Reading
+
+def rows(start, end):
+    """
+    Rollup rows covering [start, end): daily rows for whole days already
+    downsampled, hourly rows for whole hours outside those, minute rows
+    for the rest.
+    """
+    covered = []
+    found = []
+    for resolution in (DAY, HOUR, MINUTE):
+        done = done_until(resolution)
+        low, high = ceil(start, resolution), floor(end, resolution)
+        if done is None or low >= min(high, done):
+            continue
+        high = min(high, done)
+        queryset = PerformanceRollup.objects.filter(
+            resolution=resolution, period_start__gte=low, period_start__lt=high,
+        )
+        found.extend(row for row in queryset if not any(a <= row.period_start < b for a, b in covered))
+        covered.append((low, high))
+    return found
+
+
+def route_stats(start, end):
+    """Per-route request statistics over [start, end), busiest first"""
+    stats = [rollup.stats(route) for route, rollup in _merge_rows(rows(start, end)).items()]
+    stats.sort(key=lambda item: item['request_count'], reverse=True)
+    return stats
+
+
+def summary(start, end):
+    """Statistics of all requests over [start, end)"""
+    overall = Rollup()
+    for row in rows(start, end):
+        overall.add_row(row)
+    return overall.stats()
+
+
+def series(start, end, resolution=DAY):
+    """Overall statistics per ``resolution`` period over [start, end), oldest first"""
+    periods = defaultdict(Rollup)
+    for row in rows(start, end):
+        periods[floor(row.period_start, resolution)].add_row(row)
+    return [{'period_start': period, **periods[period].stats()} for period in sorted(periods)]
+
+
+def periods(since=None, until=None, compare_since=None, compare_until=None):
+    """
+    (current, previous) windows from inclusive dates. By default the
+    current window is the last seven days up to today and the previous
+    one the same length just before it.
+    """
+    def midnight(day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    end = midnight(until or timezone.localdate()) + timedelta(days=1)
+    start = midnight(since) if since else end - timedelta(days=7)
+    if compare_since:
+        previous_start = midnight(compare_since)
+        previous_end = midnight(compare_until) + timedelta(days=1) if compare_until else previous_start + (end - start)
+    else:
+        previous_start, previous_end = start - (end - start), start
+    return (start, end), (previous_start, previous_end)
+
+
+def compare(current, previous, limit=15):
+    """
+    Routes of the ``current`` (start, end) window next to the same routes
+    in the ``previous`` one, busiest first.
+    """
+    before = {item['endpoint']: item for item in route_stats(*previous)}
+    comparison = []
+    for item in route_stats(*current)[:limit]:
+        old = before.get(item['endpoint'])
+        comparison.append({
+            'endpoint': item['endpoint'],
+            'current': item,
+            'previous': old,
+            'p95_change': (
+                (item['p95_duration'] - old['p95_duration']) / old['p95_duration'] * 100
+                if old and old['p95_duration'] else None
+            ),
+        })
+    return comparison
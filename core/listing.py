@@ -0,0 +1,241 @@
+"""
+Helpers for filtered list views: summary cards from a single aggregate,
+cached filter options and keyset (cursor) pagination.
+"""
+import json
+import math
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.utils.http import urlencode
+
+TABLE_VERSION_KEY = 'table_version:{}'
+FILTER_OPTIONS_TIMEOUT = 60 * 60 * 6
+CURSOR_SALT = 'core.listing.cursor'
+
+
+def filtered_summary(queryset, **cards):
+    """
+    Compute every summary card for a filtered queryset in one aggregate().
+
+    ``cards`` maps names to aggregate expressions, typically conditional
+    ones such as ``Sum('amount', filter=Q(paid=True))``. The row count is
+    returned as ``count`` so paginators need no separate COUNT query.
+    Missing totals come back as 0.
+    """
+    cards.setdefault('count', Count('pk'))
+    summary = queryset.order_by().aggregate(**cards)
+    return {name: value or 0 for name, value in summary.items()}
+
+
+def table_version(model):
+    """Version counter for a model's table, bumped on every save/delete"""
+    return cache.get(TABLE_VERSION_KEY.format(model._meta.label_lower)) or 0
+
+
+def bump_table_version(model):
+    key = TABLE_VERSION_KEY.format(model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _bump_on_change(sender, **kwargs):
+    bump_table_version(sender)
+
+
+def track_table_version(*models):
+    """Bump the table version of ``models`` whenever one of their rows changes"""
+    for model in models:
+        uid = f'table_version_{model._meta.label_lower}'
+        post_save.connect(_bump_on_change, sender=model, dispatch_uid=uid)
+        post_delete.connect(_bump_on_change, sender=model, dispatch_uid=uid)
+
+
+def distinct_options(model, field, queryset=None):
+    """
+    Sorted distinct values of ``field`` for a filter dropdown.
+
+    Cached per table version, so the list is recomputed only after the
+    table changes. The model must be registered with track_table_version().
+    """
+    key = f'filter_options:{model._meta.label_lower}:{field}:{table_version(model)}'
+    options = cache.get(key)
+    if options is None:
+        queryset = queryset if queryset is not None else model.objects.all()
+        options = list(
+            queryset.exclude(**{f'{field}__isnull': True}).order_by(field).values_list(field, flat=True).distinct()
+        )
+        cache.set(key, options, FILTER_OPTIONS_TIMEOUT)
+    return options
+
+
+def query_string(params, exclude=('page', 'cursor', 'dir')):
+    """Encode the current filters so pagination links keep them"""
+    return urlencode([
+        (name, value) for name, value in params.items()
+        if name not in exclude and value not in (None, '')
+    ])
+
+
+class CursorSerializer:
+    """Signing serializer that accepts dates and decimals in cursors"""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=DjangoJSONEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a fixed, unique ordering.
+
+    Pages are fetched with ``WHERE (ordering) > (cursor) LIMIT n`` rather
+    than OFFSET, so deep pages cost the same as the first. The last field
+    of ``ordering`` must be unique (normally ``pk``) and none may be NULL.
+    The row count is passed in, usually from filtered_summary().
+    """
+
+    def __init__(self, queryset, per_page, ordering, count):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.count = count
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    @staticmethod
+    def _field(name):
+        return name.lstrip('-')
+
+    def _values(self, obj):
+        values = []
+        for name in self.ordering:
+            value = obj
+            for part in self._field(name).split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _encode(self, obj):
+        return signing.dumps(self._values(obj), salt=CURSOR_SALT, serializer=CursorSerializer, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            values = signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+        except signing.BadSignature:
+            return None
+        return values if isinstance(values, list) and len(values) == len(self.ordering) else None
+
+    def _after(self, values, backwards=False):
+        """Rows strictly after ``values`` in the ordering (before, if backwards)"""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            step = Q(**{f'{self._field(name)}__{"lt" if descending else "gt"}': values[position]})
+            for earlier, earlier_name in enumerate(self.ordering[:position]):
+                step &= Q(**{self._field(earlier_name): values[earlier]})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def page(self, cursor=None, direction='next', number=1):
+        values = self._decode(cursor) if cursor else None
+        number = max(1, min(number, self.num_pages))
+
+        if direction == 'prev':
+            queryset = self.queryset.order_by(*self._reversed_ordering())
+            if values is None:
+                # Last page: only the rows left over after the full pages
+                size = self.count - (self.num_pages - 1) * self.per_page
+                rows = list(queryset[:size])
+                more = self.num_pages > 1
+                number = self.num_pages
+            else:
+                rows = list(queryset.filter(self._after(values, backwards=True))[:self.per_page + 1])
+                more = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(self, rows, number, has_previous=more, has_next=True)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values))
+        else:
+            number = 1
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        return KeysetPage(self, rows[:self.per_page], number, has_previous=values is not None, has_next=more)
+
+
+class KeysetPage:
+    """A page from KeysetPaginator, mirroring the parts of Django's Page used in templates"""
+
+    def __init__(self, paginator, object_list, number, has_previous, has_next):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_previous = has_previous and bool(object_list)
+        self._has_next = has_next and bool(object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return max(1, self.number - 1)
+
+    def start_index(self):
+        return (self.number - 1) * self.paginator.per_page + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+    @property
+    def next_cursor(self):
+        return self.paginator._encode(self.object_list[-1]) if self.object_list else ''
+
+    @property
+    def previous_cursor(self):
+        return self.paginator._encode(self.object_list[0]) if self.object_list else ''
+
+
+def keyset_page(request, queryset, ordering, count, per_page=25, prefix=''):
+    """
+    Build the KeysetPage requested by ``cursor``/``dir``/``page`` GET
+    parameters. ``prefix`` namespaces them when a page has several lists.
+    """
+    try:
+        number = int(request.GET.get(f'{prefix}page', 1))
+    except ValueError:
+        number = 1
+    paginator = KeysetPaginator(queryset, per_page, ordering, count)
+    return paginator.page(
+        cursor=request.GET.get(f'{prefix}cursor'),
+        direction=request.GET.get(f'{prefix}dir', 'next'),
+        number=number,
+    )
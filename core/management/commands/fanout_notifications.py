@@ -0,0 +1,42 @@
+"""
+Management command to show targeted notification fan-outs and finish interrupted ones.
+"""
+
+from django.core.management.base import BaseCommand
+from core import fanout
+from core.models import NotificationFanout
+
+
+class Command(BaseCommand):
+    help = 'Show notification fan-out progress and write pending or interrupted fan-outs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Write pending and failed fan-outs, and running ones idle for NOTIFICATION_FANOUT_STALE_SECONDS',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Fan-outs listed (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            unfinished = NotificationFanout.objects.exclude(status='done').order_by('created_at')
+            for pk in unfinished.values_list('pk', flat=True):
+                written = fanout.run(pk, resume=True)
+                self.stdout.write(self.style.SUCCESS(f"Fan-out {pk}: wrote {written} notification(s)"))
+
+        self.stdout.write(self.style.HTTP_INFO("\n📣 Notification fan-outs:"))
+        self.stdout.write("=" * 80)
+        for item in NotificationFanout.objects.all()[:options['limit']]:
+            style = {'done': self.style.SUCCESS, 'failed': self.style.ERROR}.get(item.status, self.style.WARNING)
+            self.stdout.write(style(
+                f"{item.pk:5}. {item.title[:40]:40} {item.get_audience_display()[:20]:20} "
+                f"{item.sent}/{item.total} ({item.progress:.0f}%) {item.status}"
+            ))
+            if item.error:
+                self.stdout.write(f"       {item.error}")
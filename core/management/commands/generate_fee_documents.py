@@ -0,0 +1,69 @@
+"""
+Management command to generate payment receipts or statements of account
+in bulk, e.g. at the end of a term.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from accounting import documents
+from accounting.models import TuitionFee, Payment
+
+
+class Command(BaseCommand):
+    help = 'Generate payment receipts or statements of account as a ZIP or merged PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['receipts', 'statements'], help='Documents to generate')
+        parser.add_argument('--output', required=True, help='File to write (.zip or .pdf)')
+        parser.add_argument('--session', help='Only fees for this session, e.g. 2024/2025')
+        parser.add_argument('--term', help='Only fees for this term')
+        parser.add_argument('--class', dest='class_name', help="Only students in this class")
+        parser.add_argument('--student', action='append', default=[],
+                            help='Admission number (repeatable)')
+        parser.add_argument('--from', dest='date_from', help='Receipts: payments on or after YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', help='Receipts: payments on or before YYYY-MM-DD')
+        parser.add_argument('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        output_path = options['output']
+        if output_path.endswith('.zip'):
+            output = 'zip'
+        elif output_path.endswith('.pdf'):
+            output = 'pdf'
+        else:
+            raise CommandError('--output must end in .zip or .pdf')
+
+        fees = TuitionFee.objects.all()
+        if options['session']:
+            fees = fees.filter(session=options['session'])
+        if options['term']:
+            fees = fees.filter(term=options['term'])
+        if options['class_name']:
+            fees = fees.filter(student__current_class__name=options['class_name'])
+        if options['student']:
+            fees = fees.filter(student__admission_number__in=options['student'])
+
+        if options['kind'] == 'receipts':
+            payments = Payment.objects.filter(tuition_fee__in=fees)
+            if options['date_from']:
+                payments = payments.filter(payment_date__gte=options['date_from'])
+            if options['date_to']:
+                payments = payments.filter(payment_date__lte=options['date_to'])
+            items = documents.load_receipts(payments)
+            kind = 'receipt'
+        else:
+            items = documents.load_statements(fees)
+            kind = 'statement'
+
+        if not items:
+            self.stdout.write(self.style.WARNING('Nothing to generate for the given filters'))
+            return
+
+        workers = options['workers'] or os.cpu_count() or 1
+        content = documents.render_documents(kind, items, output=output, workers=workers)
+        with open(output_path, 'wb') as handle:
+            handle.write(content)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(items)} {options['kind']} to {output_path} ({len(content) / 1024:.1f} KB)"
+        ))
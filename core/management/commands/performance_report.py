@@ -3,7 +3,9 @@ Management command to analyze and display performance metrics.
 """
 
 import json
-from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from core import history
 from core.performance import PerformanceAnalyzer
 
 
@@ -32,14 +34,35 @@ class Command(BaseCommand):
             action='store_true',
             help='Show performance summary',
         )
+        parser.add_argument(
+            '--queries',
+            action='store_true',
+            help='Show views with the most queries per request and N+1 patterns',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Compare two periods from the persistent history (default: last 7 days against the 7 before)',
+        )
+        parser.add_argument('--since', help='Start date of the period to compare (YYYY-MM-DD)')
+        parser.add_argument('--until', help='End date of the period to compare, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--compare-since', help='Start date of the earlier period (YYYY-MM-DD)')
+        parser.add_argument('--compare-until', help='End date of the earlier period, inclusive (YYYY-MM-DD)')
     
     def handle(self, *args, **options):
         hours = options['hours']
+        if options['compare']:
+            self.show_comparison(options)
+            return
+        show_all = not any([options['summary'], options['slow_endpoints'], options['queries']])
         
-        if options['slow_endpoints'] or not any([options['summary'], options['slow_endpoints']]):
+        if options['slow_endpoints'] or show_all:
             self.show_slow_endpoints(hours, options['json'])
         
-        if options['summary'] or not any([options['summary'], options['slow_endpoints']]):
+        if options['queries'] or show_all:
+            self.show_query_heavy_endpoints(hours, options['json'])
+        
+        if options['summary'] or show_all:
             self.show_performance_summary(hours, options['json'])
     
     def show_slow_endpoints(self, hours, json_output):
@@ -60,6 +83,7 @@ class Command(BaseCommand):
             
             for i, endpoint in enumerate(slow_endpoints, 1):
                 avg_time = endpoint['avg_duration']
+                p95_time = endpoint['p95_duration']
                 max_time = endpoint['max_duration']
                 count = endpoint['request_count']
                 
@@ -75,10 +99,38 @@ class Command(BaseCommand):
                     style(f"{i:2}. {endpoint['endpoint']}")
                 )
                 self.stdout.write(
-                    f"    Avg: {avg_time:.3f}s | Max: {max_time:.3f}s | Requests: {count}"
+                    f"    Avg: {avg_time:.3f}s | p95: {p95_time:.3f}s | Max: {max_time:.3f}s | Requests: {count}"
                 )
                 self.stdout.write("")
     
+    def show_query_heavy_endpoints(self, hours, json_output):
+        """Display the views running the most queries."""
+        endpoints = PerformanceAnalyzer.get_query_heavy_endpoints(hours)
+        
+        if json_output:
+            self.stdout.write(json.dumps({'query_heavy_endpoints': endpoints}, indent=2))
+            return
+        
+        self.stdout.write(
+            self.style.HTTP_INFO(f"\n🗄️ Most Queries per Request (Last {hours} hours):")
+        )
+        self.stdout.write("=" * 80)
+        
+        if not endpoints:
+            self.stdout.write("No query data available.")
+            return
+        
+        for i, endpoint in enumerate(endpoints, 1):
+            style = self.style.ERROR if endpoint['n_plus_one_requests'] else self.style.SUCCESS
+            self.stdout.write(style(f"{i:2}. {endpoint['endpoint']}"))
+            self.stdout.write(
+                f"    Queries/request: {endpoint['avg_queries']:.1f} | "
+                f"DB time/request: {endpoint['avg_query_time'] * 1000:.1f}ms | "
+                f"Requests: {endpoint['request_count']} | "
+                f"N+1 requests: {endpoint['n_plus_one_requests']}"
+            )
+            self.stdout.write("")
+    
     def show_performance_summary(self, hours, json_output):
         """Display performance summary."""
         summary = PerformanceAnalyzer.get_performance_summary(hours)
@@ -166,3 +218,60 @@ class Command(BaseCommand):
                     self.stdout.write(f"  • {rec}")
             
             self.stdout.write("")
+
+    @staticmethod
+    def _date(options, name):
+        value = options[name]
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"--{name.replace('_', '-')} must be a date like 2025-03-17")
+
+    def show_comparison(self, options):
+        """Display one period's performance against an earlier one."""
+        current, previous = history.periods(*(
+            self._date(options, name) for name in ('since', 'until', 'compare_since', 'compare_until')
+        ))
+        comparison = PerformanceAnalyzer.compare_periods(current, previous)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'comparison': comparison}, indent=2, default=str))
+            return
+
+        def span(window):
+            return f"{window[0]:%Y-%m-%d} to {window[1] - timedelta(days=1):%Y-%m-%d}"
+
+        self.stdout.write(self.style.HTTP_INFO(f"\n📅 {span(current)} compared with {span(previous)}:"))
+        self.stdout.write("=" * 80)
+        if not comparison or not comparison['current']['request_count']:
+            self.stdout.write("No performance history for this period.")
+            return
+
+        for label, stats in (('This period', comparison['current']), ('Earlier period', comparison['previous'])):
+            self.stdout.write(
+                f"{label}: {stats['request_count']:,} requests | Avg: {stats['avg_duration']:.3f}s | "
+                f"p95: {stats['p95_duration']:.3f}s | Errors: {stats['error_rate']:.2f}%"
+            )
+        self.stdout.write("")
+
+        for i, route in enumerate(comparison['routes'], 1):
+            now, before, change = route['current'], route['previous'], route['p95_change']
+            if change is not None and change > 25:
+                style = self.style.ERROR
+            elif change is not None and change > 10:
+                style = self.style.WARNING
+            else:
+                style = self.style.SUCCESS
+            self.stdout.write(style(f"{i:2}. {route['endpoint']}"))
+            line = f"    Requests: {now['request_count']:,} | p95: {now['p95_duration']:.3f}s"
+            if before:
+                line += (
+                    f" (was {before['p95_duration']:.3f}s over {before['request_count']:,} requests"
+                    + (f", {change:+.0f}%" if change is not None else "") + ")"
+                )
+            else:
+                line += " (no earlier traffic)"
+            self.stdout.write(line + f" | Errors: {now['error_rate']:.2f}%")
+            self.stdout.write("")
@@ -0,0 +1,29 @@
+"""
+Management command to recompute the per-term attendance bitmaps and the
+daily class summaries from the attendance records, e.g. after importing
+records with raw SQL or moving students between classes.
+"""
+
+from django.core.management.base import BaseCommand
+from results.models import AcademicTerm
+from students import attendance_bits, class_attendance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild term attendance bitmaps, school-day calendars and class daily summaries from attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, help='Only rebuild the term with this id')
+
+    def handle(self, *args, **options):
+        terms = AcademicTerm.objects.select_related('session')
+        if options['term']:
+            terms = terms.filter(pk=options['term'])
+        for term in terms:
+            students = attendance_bits.rebuild_term(term)
+            self.stdout.write(f'{term}: {students} student(s)')
+        if options['term']:
+            summaries = sum(class_attendance.rebuild(term.start_date, term.end_date) for term in terms)
+        else:
+            summaries = class_attendance.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(terms)} term(s) and {summaries} class summaries'))
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the general ledger from payments, expenses
+and payroll, or to write any missing monthly checkpoints.
+"""
+
+from django.core.management.base import BaseCommand
+from accounting import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ledger journal entries and monthly account checkpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoints-only',
+            action='store_true',
+            help='Only checkpoint closed months that lack one (safe to run nightly)',
+        )
+
+    def handle(self, *args, **options):
+        if options['checkpoints_only']:
+            months = ledger.ensure_checkpoints()
+            self.stdout.write(self.style.SUCCESS(f'Checkpointed {months} month(s)'))
+            return
+
+        counts = ledger.rebuild()
+        summary = ', '.join(f'{count} {source}' for source, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Ledger rebuilt from {summary}'))
@@ -0,0 +1,15 @@
+"""
+Management command to store the day's receivables aging snapshot.
+Schedule it nightly (e.g. from cron) to build the aging trend.
+"""
+
+from django.core.management.base import BaseCommand
+from accounting import aging
+
+
+class Command(BaseCommand):
+    help = 'Store receivables aging buckets per class, session and student'
+
+    def handle(self, *args, **options):
+        rows = aging.take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Aging snapshot stored ({rows} rows)'))
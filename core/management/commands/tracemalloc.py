@@ -0,0 +1,79 @@
+"""
+Management command to trace allocations in the running workers for leak hunting.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from core import telemetry
+
+
+class Command(BaseCommand):
+    help = 'Start or stop tracemalloc in every worker, or compare the snapshots they saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['start', 'stop', 'status', 'report'])
+        parser.add_argument(
+            '--minutes',
+            type=float,
+            default=10,
+            help='How long workers keep tracing after start (default: 10)',
+        )
+        parser.add_argument(
+            '--frames',
+            type=int,
+            default=10,
+            help='Stack frames stored per allocation (default: 10)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=15,
+            help='Allocation sites shown per worker in the report (default: 15)',
+        )
+        parser.add_argument(
+            '--pid',
+            type=int,
+            help='Only report on this worker',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action == 'start':
+            telemetry.request_tracing(options['minutes'], options['frames'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Workers will start tracing within one telemetry interval, for {options['minutes']:g} minutes."
+            ))
+        elif action == 'stop':
+            telemetry.cancel_tracing()
+            self.stdout.write(self.style.SUCCESS("Workers will stop tracing and save a final snapshot."))
+        elif action == 'status':
+            requested = telemetry.tracing_requested()
+            self.stdout.write(f"Tracing requested: {'yes' if requested else 'no'}")
+            for pid, paths in sorted(telemetry.snapshots().items()):
+                self.stdout.write(f"  worker {pid}: {len(paths)} snapshot(s)")
+        else:
+            self.show_report(options['pid'], options['limit'])
+
+    def show_report(self, pid, limit):
+        """Largest allocation growth between each worker's first and latest snapshot."""
+        grouped = telemetry.snapshots()
+        if pid is not None:
+            if pid not in grouped:
+                raise CommandError(f"No snapshots saved by worker {pid}")
+            grouped = {pid: grouped[pid]}
+        if not grouped:
+            self.stdout.write("No tracemalloc snapshots saved yet.")
+            return
+
+        for owner, paths in sorted(grouped.items()):
+            self.stdout.write(self.style.HTTP_INFO(f"\n🧠 Worker {owner} ({len(paths)} snapshots):"))
+            self.stdout.write("=" * 80)
+            if len(paths) < 2:
+                self.stdout.write("Need at least two snapshots to compare.")
+                continue
+            for i, stat in enumerate(telemetry.compare_snapshots(paths[0], paths[-1], limit), 1):
+                style = self.style.WARNING if stat.size_diff > 1024 * 1024 else self.style.SUCCESS
+                self.stdout.write(style(f"{i:2}. {stat.traceback[0]}"))
+                self.stdout.write(
+                    f"    Growth: {stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks) | "
+                    f"Now: {stat.size / 1024:.1f} KiB"
+                )
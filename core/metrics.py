@@ -0,0 +1,502 @@
+"""
+In-process request metrics with periodic flushing to the shared cache.
+
+Each worker process records request latencies into fixed-size, log-linear
+histograms (HDR style: four buckets per doubling, 100µs to ~2 minutes)
+and plain counters, keyed by series name and labels such as
+``(route name, method, status class)``. Recording is a dict lookup and a
+couple of integer additions on data owned by the recording thread, so it
+takes no lock and makes no network call.
+
+A daemon thread flushes every ``METRICS_FLUSH_INTERVAL`` seconds: it swaps
+each thread's live frame for an empty one and adds the frame retired on
+the previous flush to hourly cache keys with atomic increments, sent as
+one pipelined round trip on django-redis (``cache.incr`` per key on other
+backends). Waiting one interval before reading a retired frame lets any
+in-flight recording into it finish. Increments from every gunicorn worker
+add up correctly, which the old read-modify-write of a sample list did
+not. Slots of threads that have exited are dropped once their last frame
+is retired. The same thread writes pending last-seen times
+(core.activity).
+
+Each flush is added to the current hour, which read_window() merges for
+reports, to the current UTC minute, which core.history rolls up into the
+database, and to never-expiring totals, which the /metrics endpoint
+exposes as monotonic counters. Series are numbered per key space through
+an atomic counter so readers can enumerate them; a number is claimed by
+adding its name, and numbers kept in process are checked against their
+names on every flush, so a culled cache never hands one number to two
+series. Per-process gauges (the latest core.telemetry sample and
+in-flight requests) are published on every flush with a short timeout,
+so workers that have gone away drop out.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = 'request_duration'
+DB_QUERIES = 'db_queries'
+DB_QUERY_MICROSECONDS = 'db_query_us'
+N_PLUS_ONE = 'n_plus_one'
+PAGE_CACHE = 'page_cache'
+GC_PAUSE = 'gc_pause'
+ALLOCATION_SAMPLES = 'alloc_samples'
+ALLOCATED_BLOCKS = 'alloc_blocks'
+TRACED_BYTES = 'alloc_traced_bytes'
+KEY_PREFIX = 'metrics'
+TOTALS = 'total'
+WORKERS = 'workers'
+
+# Upper bucket bounds in seconds; one extra overflow bucket past the last
+BOUNDS = tuple(0.0001 * 2 ** (step / 4) for step in range(84))
+BUCKETS = len(BOUNDS) + 1
+
+
+class Histogram:
+    """Latency histogram over BOUNDS plus the exact count and sum"""
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_right(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def merge(self, other):
+        for index, value in enumerate(other.counts):
+            if value:
+                self.counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile (0 when empty)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * fraction))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                return BOUNDS[min(index, len(BOUNDS) - 1)]
+        return BOUNDS[-1]
+
+    @property
+    def minimum(self):
+        for index, value in enumerate(self.counts):
+            if value:
+                return BOUNDS[index - 1] if index else 0.0
+        return 0.0
+
+    @property
+    def maximum(self):
+        for index in range(BUCKETS - 1, -1, -1):
+            if self.counts[index]:
+                return BOUNDS[min(index, len(BOUNDS) - 1)]
+        return 0.0
+
+
+class Frame:
+    """Histograms and counters recorded by one thread between flushes"""
+    __slots__ = ('histograms', 'counters')
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def __bool__(self):
+        return bool(self.histograms or self.counters)
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = mine = Histogram()
+            mine.merge(histogram)
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        return self
+
+
+class _Slot:
+    __slots__ = ('frame', 'active', 'thread')
+
+    def __init__(self):
+        self.frame = Frame()
+        self.active = 0
+        self.thread = threading.current_thread()
+
+
+class MetricsRegistry:
+    """
+    Per-process metrics. Every thread writes only to its own slot; collect()
+    swaps the slots' frames and hands back those retired on the previous
+    call, so no frame is read while its thread may still be writing to it.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._slots = []
+        self._slots_lock = threading.Lock()
+        self._retired = []
+
+    def _slot(self):
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = self._local.slot = _Slot()
+            with self._slots_lock:
+                self._slots.append(slot)
+        return slot
+
+    def observe(self, name, labels, seconds):
+        histograms = self._slot().frame.histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        histogram.record(seconds)
+
+    def increment(self, name, labels=(), amount=1):
+        counters = self._slot().frame.counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def request_started(self):
+        self._slot().active += 1
+
+    def request_finished(self):
+        self._slot().active -= 1
+
+    def in_flight(self):
+        """Requests currently being served by this process"""
+        return sum(slot.active for slot in list(self._slots))
+
+    def collect(self, grace=True):
+        """
+        Merge the frames retired by the previous call and retire the live
+        ones. ``grace=False`` also returns the frames just retired; only use
+        it when no other thread is recording (tests, process exit).
+        """
+        retired = []
+        with self._slots_lock:
+            for slot in self._slots:
+                frame, slot.frame = slot.frame, Frame()
+                retired.append(frame)
+            # A thread that has exited writes nothing more, and its last
+            # frame was just retired above
+            self._slots = [slot for slot in self._slots if slot.thread.is_alive()]
+        ready, self._retired = self._retired, retired
+        if not grace:
+            ready, self._retired = ready + self._retired, []
+        merged = Frame()
+        for frame in ready:
+            merged.merge(frame)
+        return merged
+
+
+registry = MetricsRegistry()
+
+
+def status_class(status_code):
+    return f'{status_code // 100}xx' if status_code else 'unknown'
+
+
+def route_name(request):
+    """The URL name (or pattern) that served ``request`` rather than its raw path"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match.route or '<unnamed>'
+
+
+def record_request(request, status_code, seconds):
+    registry.observe(REQUEST_DURATION, (route_name(request), request.method, status_class(status_code)), seconds)
+
+
+def _hour(moment=None):
+    return (moment or timezone.now()).strftime('%Y%m%d%H')
+
+
+def minute_space(moment=None):
+    """Key space of the UTC minute containing ``moment``, read back by core.history"""
+    return 'm' + (moment or timezone.now()).strftime('%Y%m%d%H%M')
+
+
+def _timeout(space):
+    """Hourly key spaces expire; totals and the worker registry are kept"""
+    if space in (TOTALS, WORKERS):
+        return None
+    if space.startswith('m'):
+        return getattr(settings, 'METRICS_MINUTE_RETENTION', 2 * 3600)
+    return getattr(settings, 'METRICS_RETENTION_HOURS', 25) * 3600
+
+
+def _interval():
+    return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+
+def _incr(key, amount, timeout):
+    """Atomic add that creates the key when missing"""
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout):
+            cache.incr(key, amount)
+
+
+def _redis_client():
+    """Raw client behind a django-redis default cache, None for other backends"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _incr_many(increments):
+    """
+    Apply ``(key, amount, timeout)`` increments. On django-redis they go out
+    as one pipeline of INCRBY (plus EXPIRE for keys that expire); django-redis
+    stores integers unencoded, so cache.get() reads the sums back.
+    """
+    client = _redis_client()
+    if client is None:
+        for key, amount, timeout in increments:
+            _incr(key, amount, timeout)
+        return
+    pipe = client.pipeline(transaction=False)
+    for key, amount, timeout in increments:
+        full_key = cache.make_key(key)
+        pipe.incrby(full_key, amount)
+        if timeout is not None:
+            pipe.expire(full_key, timeout)
+    pipe.execute()
+
+
+_series_ids = {}
+
+
+def _name_key(space, series_id):
+    return f'{KEY_PREFIX}:{space}:s:{series_id}'
+
+
+def _register(space, kind, key):
+    """
+    Number of a series in the cache, claiming a new one when it has none.
+    Numbers whose name is still held are skipped, even after the ``:n``
+    counter itself has been evicted.
+    """
+    timeout = _timeout(space)
+    digest = hashlib.md5(repr((kind, key)).encode()).hexdigest()
+    lookup = f'{KEY_PREFIX}:{space}:id:{digest}'
+    series_id = cache.get(lookup)
+    if series_id is not None and cache.get(_name_key(space, series_id)) == (kind, key):
+        return series_id
+    while True:
+        series_id = _next_series(space)
+        if cache.add(_name_key(space, series_id), (kind, key), timeout):
+            break
+    # Values left by a series whose name was culled are not ours
+    prefix = f'{KEY_PREFIX}:{space}:{series_id}'
+    cache.delete_many([f'{prefix}:{suffix}' for suffix in ('value', 'count', 'us', *(f'b{i}' for i in range(BUCKETS)))])
+    cache.set(lookup, series_id, timeout)
+    return series_id
+
+
+def _series_id_map(space, series):
+    """
+    ``{(kind, key): number}`` for ``series`` in a key space. Numbers kept in
+    this process are checked against their names in one get_many first:
+    a culled or reused name means the number is no longer ours.
+    """
+    ids = {item: _series_ids.get((space, *item)) for item in series}
+    known = {item: series_id for item, series_id in ids.items() if series_id is not None}
+    names = cache.get_many([_name_key(space, series_id) for series_id in known.values()]) if known else {}
+    if len(_series_ids) > 10000:
+        _series_ids.clear()
+    for item, series_id in ids.items():
+        if series_id is None or names.get(_name_key(space, series_id)) != item:
+            ids[item] = _series_ids[(space, *item)] = _register(space, *item)
+    return ids
+
+
+def _series_id(space, kind, key):
+    """Number of a series within a key space, registering it on first sight"""
+    return _series_id_map(space, [(kind, key)])[(kind, key)]
+
+
+def _next_series(space):
+    key = f'{KEY_PREFIX}:{space}:n'
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, _timeout(space)):
+            return 1
+        return cache.incr(key)
+
+
+def _increments(space, frame):
+    """``(key, amount, timeout)`` increments adding ``frame`` to a key space"""
+    timeout = _timeout(space)
+    ids = _series_id_map(
+        space, [('h', key) for key in frame.histograms] + [('c', key) for key in frame.counters],
+    )
+    increments = []
+    for key, histogram in frame.histograms.items():
+        prefix = f'{KEY_PREFIX}:{space}:{ids["h", key]}'
+        for index, value in enumerate(histogram.counts):
+            if value:
+                increments.append((f'{prefix}:b{index}', value, timeout))
+        increments.append((f'{prefix}:count', histogram.count, timeout))
+        increments.append((f'{prefix}:us', round(histogram.total * 1_000_000), timeout))
+    for key, value in frame.counters.items():
+        increments.append((f'{KEY_PREFIX}:{space}:{ids["c", key]}:value', value, timeout))
+    return increments
+
+
+def _write(space, frame):
+    _incr_many(_increments(space, frame))
+
+
+def flush(grace=True):
+    """
+    Add the collected metrics to this hour's and minute's keys and the
+    totals. Returns the number of series written.
+    """
+    publish_worker()
+    frame = registry.collect(grace)
+    if not frame:
+        return 0
+    _incr_many([
+        *_increments(_hour(), frame),
+        *_increments(minute_space(), frame),
+        *_increments(TOTALS, frame),
+    ])
+    return len(frame.histograms) + len(frame.counters)
+
+
+def read_space(space):
+    """Frame of every series flushed into a key space by all workers"""
+    frame = Frame()
+    total = cache.get(f'{KEY_PREFIX}:{space}:n') or 0
+    if not total:
+        return frame
+    names = cache.get_many([_name_key(space, number) for number in range(1, total + 1)])
+    # A series registered twice (a lost race, an evicted lookup) adds up
+    for name_key, (kind, key) in names.items():
+        prefix = f'{KEY_PREFIX}:{space}:{name_key.rsplit(":", 1)[1]}'
+        if kind == 'c':
+            frame.counters[key] = frame.counters.get(key, 0) + (cache.get(f'{prefix}:value') or 0)
+            continue
+        bucket_keys = [f'{prefix}:b{index}' for index in range(BUCKETS)]
+        values = cache.get_many(bucket_keys + [f'{prefix}:count', f'{prefix}:us'])
+        histogram = Histogram()
+        histogram.counts = [values.get(bucket_key, 0) for bucket_key in bucket_keys]
+        histogram.count = values.get(f'{prefix}:count', 0)
+        histogram.total = values.get(f'{prefix}:us', 0) / 1_000_000
+        frame.histograms[key] = histogram.merge(frame.histograms[key]) if key in frame.histograms else histogram
+    return frame
+
+
+def read_window(hours=24, now=None):
+    """Metrics of the last ``hours`` hours merged across hours and workers"""
+    now = now or timezone.now()
+    frame = Frame()
+    for offset in range(hours):
+        frame.merge(read_space(_hour(now - timedelta(hours=offset))))
+    return frame
+
+
+def read_totals():
+    """Everything recorded since the totals were last cleared, across workers"""
+    return read_space(TOTALS)
+
+
+def worker_state():
+    """This process's gauges: the latest telemetry sample plus requests in flight"""
+    from . import telemetry
+
+    return {**telemetry.latest(), 'pid': os.getpid(), 'in_flight': registry.in_flight()}
+
+
+def publish_worker():
+    """Publish this process's gauges until a few flush intervals after it stops flushing"""
+    series_id = _series_id(WORKERS, 'g', os.getpid())
+    cache.set(f'{KEY_PREFIX}:{WORKERS}:{series_id}:value', worker_state(), max(3 * _interval(), 15))
+
+
+def read_workers():
+    """Latest gauges of every live worker, this one read directly"""
+    own = worker_state()
+    workers = {own['pid']: own}
+    total = cache.get(f'{KEY_PREFIX}:{WORKERS}:n') or 0
+    if total:
+        values = cache.get_many([f'{KEY_PREFIX}:{WORKERS}:{number}:value' for number in range(1, total + 1)])
+        for state in values.values():
+            workers.setdefault(state['pid'], state)
+    return sorted(workers.values(), key=lambda state: state['pid'])
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_forever(interval):
+    from . import activity, history
+
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Failed to flush metrics: {e}")
+        try:
+            history.run()
+        except Exception as e:
+            logger.error(f"Failed to write performance history: {e}")
+        try:
+            activity.flush_if_due()
+        except Exception as e:
+            logger.error(f"Failed to write last-seen times: {e}")
+
+
+def _flush_at_exit():
+    try:
+        flush(grace=False)
+    except Exception:
+        pass
+
+
+def ensure_flusher():
+    """Start this process's flush thread once (again after a fork); an interval of 0 disables it"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        interval = _interval()
+        if _flusher_pid == os.getpid() or not interval:
+            return
+        threading.Thread(target=_flush_forever, args=(interval,), name='metrics-flusher', daemon=True).start()
+        if _flusher_pid is None:
+            atexit.register(_flush_at_exit)
+        _flusher_pid = os.getpid()
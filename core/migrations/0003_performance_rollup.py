@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_newspost_upcomingevent_inboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(60, 'Minute'), (3600, 'Hour'), (86400, 'Day')])),
+                ('period_start', models.DateTimeField()),
+                ('route', models.CharField(max_length=200)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('client_errors', models.PositiveIntegerField(default=0)),
+                ('server_errors', models.PositiveIntegerField(default=0)),
+                ('duration_total', models.FloatField(default=0)),
+                ('buckets', models.JSONField(default=list)),
+                ('p50', models.FloatField(default=0)),
+                ('p95', models.FloatField(default=0)),
+                ('p99', models.FloatField(default=0)),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('query_time', models.FloatField(default=0)),
+                ('n_plus_one', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-period_start', 'route'],
+                'indexes': [models.Index(fields=['resolution', 'period_start'], name='core_perfor_resolut_c898d2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'route', 'period_start'), name='unique_performance_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:41
+
+from bisect import bisect_right
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def start_read_states(apps, schema_editor):
+    """
+    Carry over each user's read marks from the per-user copies the old
+    fan-out signal made, then remove the copies. An announcement is unread
+    for a user who still has an unread copy of it; the watermark stops
+    just below their oldest unread one and the ids read above it go into
+    read_ids. Users without unread copies have read everything.
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Announcement = apps.get_model('academics', 'Announcement')
+    AnnouncementReadState = apps.get_model('core', 'AnnouncementReadState')
+    UserNotification = apps.get_model('core', 'UserNotification')
+
+    ids_by_text = defaultdict(list)
+    for pk, title, message in Announcement.objects.order_by('pk').values_list('pk', 'title', 'message').iterator():
+        ids_by_text[(title, message)].append(pk)
+    all_ids = sorted(pk for ids in ids_by_text.values() for pk in ids)
+    latest = all_ids[-1] if all_ids else 0
+
+    copies = UserNotification.objects.filter(link='/notifications/', title__in=Announcement.objects.values('title'))
+    unread = defaultdict(set)
+    for user_id, title, message in copies.filter(is_read=False).values_list('user_id', 'title', 'message').iterator():
+        unread[user_id].update(ids_by_text.get((title, message), ()))
+
+    def state(user_id):
+        waiting = unread.get(user_id)
+        if not waiting:
+            return AnnouncementReadState(user_id=user_id, watermark=latest)
+        watermark = min(waiting) - 1
+        read_ids = [pk for pk in all_ids[bisect_right(all_ids, watermark):] if pk not in waiting]
+        return AnnouncementReadState(user_id=user_id, watermark=watermark, read_ids=read_ids)
+
+    AnnouncementReadState.objects.bulk_create(
+        (state(pk) for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    copies.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_performance_rollup'),
+        ('users', '0005_customuser_last_seen'),
+        ('academics', '0004_announcement_unread_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='announcement_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('watermark', models.PositiveIntegerField(default=0)),
+                ('read_ids', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(start_read_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_notification_fanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationfanout',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, help_text='When the last chunk was written', null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationfanout',
+            name='user_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Recipients of a users audience'),
+        ),
+        migrations.AlterField(
+            model_name='notificationfanout',
+            name='audience',
+            field=models.CharField(choices=[('role', 'Everyone with a role'), ('class', 'Students in a class'), ('debtors', 'Students with outstanding fees'), ('users', 'Chosen users')], max_length=20),
+        ),
+    ]
@@ -22,28 +22,6 @@ class UserNotification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
-    @classmethod
-    def create_from_announcement(cls, announcement):
-        """Create notifications for all users from an announcement"""
-        from users.models import CustomUser
-        # Get all users
-        users = CustomUser.objects.all()
-        
-        # Create a notification for each user
-        notifications = []
-        for user in users:
-            notification = cls(
-                user=user,
-                title=announcement.title,
-                message=announcement.message,
-                # Link to the notifications page
-                link='/notifications/'
-            )
-            notifications.append(notification)
-        
-        # Bulk create all notifications
-        cls.objects.bulk_create(notifications)
-        return notifications
 
 
 class InboxMessage(models.Model):
@@ -150,3 +128,116 @@ class UpcomingEvent(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class NotificationFanout(models.Model):
+    """
+    One notification sent as a UserNotification to every user in an
+    audience, written in chunks by core.fanout with its progress kept here.
+    """
+    AUDIENCE_CHOICES = (
+        ('role', 'Everyone with a role'),
+        ('class', 'Students in a class'),
+        ('debtors', 'Students with outstanding fees'),
+        ('users', 'Chosen users'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    link = models.CharField(max_length=255, blank=True, null=True)
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    target = models.CharField(
+        max_length=50, blank=True,
+        help_text="Role for role audiences, class id for class audiences, optional session for debtors",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    user_ids = models.JSONField(default=list, blank=True, help_text="Recipients of a users audience")
+    last_recipient = models.PositiveIntegerField(default=0, help_text="Highest user id notified so far")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='notification_fanouts'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True, help_text="When the last chunk was written")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.title} ({self.sent}/{self.total} {self.status})"
+
+    @property
+    def progress(self):
+        return self.sent / self.total * 100 if self.total else 100
+
+
+class AnnouncementReadState(models.Model):
+    """
+    Which announcements a user has read, without a row per announcement:
+    every announcement with an id up to ``watermark`` counts as read, and
+    ``read_ids`` holds the few above it read one at a time.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='announcement_state'
+    )
+    watermark = models.PositiveIntegerField(default=0)
+    read_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} read up to #{self.watermark} (+{len(self.read_ids)})"
+
+    def is_read(self, announcement_id):
+        return announcement_id <= self.watermark or announcement_id in self.read_ids
+
+
+class PerformanceRollup(models.Model):
+    """
+    Request metrics of one URL name over one minute, hour or day, written
+    by core.history from the metrics the workers flush. Latencies are kept
+    as sparse histogram buckets so periods can be merged and percentiles
+    recomputed after downsampling.
+    """
+    MINUTE, HOUR, DAY = 60, 3600, 86400
+    RESOLUTIONS = (
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    )
+
+    resolution = models.PositiveIntegerField(choices=RESOLUTIONS)
+    period_start = models.DateTimeField()
+    route = models.CharField(max_length=200)
+    requests = models.PositiveIntegerField(default=0)
+    client_errors = models.PositiveIntegerField(default=0)
+    server_errors = models.PositiveIntegerField(default=0)
+    duration_total = models.FloatField(default=0)  # seconds
+    buckets = models.JSONField(default=list)  # [[bucket index, count], ...] over core.metrics.BOUNDS
+    p50 = models.FloatField(default=0)
+    p95 = models.FloatField(default=0)
+    p99 = models.FloatField(default=0)
+    queries = models.PositiveIntegerField(default=0)
+    query_time = models.FloatField(default=0)  # seconds
+    n_plus_one = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-period_start', 'route']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'route', 'period_start'], name='unique_performance_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.route} @ {self.period_start:%Y-%m-%d %H:%M} ({self.get_resolution_display()})"
@@ -0,0 +1,176 @@
+"""
+OpenMetrics text exposition of the metrics aggregated in core.metrics.
+
+Counters and histograms come from the never-expiring totals every worker
+flushes to the cache, so any worker answering a scrape reports the whole
+deployment. Latency histograms are exposed at one bucket per doubling
+(every fourth internal bound, 100µs to ~105s). Worker gauges are per
+process, and the cache hit ratio is read from Redis when the cache is
+django-redis.
+"""
+from django.core.cache import cache
+
+from . import metrics
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+NAMESPACE = 'glad'
+EXPOSED_BOUNDS = tuple(range(0, len(metrics.BOUNDS), 4))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(lines, name, kind, help_text, samples, unit=None):
+    lines.append(f'# TYPE {name} {kind}')
+    if unit:
+        lines.append(f'# UNIT {name} {unit}')
+    lines.append(f'# HELP {name} {help_text}')
+    lines.extend(f'{name}{suffix}{_labels(**labels)} {_number(value)}' for suffix, labels, value in samples)
+
+
+def _histogram_samples(labels, histogram):
+    samples = []
+    cumulative = 0
+    previous = -1
+    for index in EXPOSED_BOUNDS:
+        cumulative += sum(histogram.counts[previous + 1:index + 1])
+        previous = index
+        samples.append(('_bucket', {**labels, 'le': f'{metrics.BOUNDS[index]:.6g}'}, cumulative))
+    samples.append(('_bucket', {**labels, 'le': '+Inf'}, histogram.count))
+    samples.append(('_count', labels, histogram.count))
+    samples.append(('_sum', labels, histogram.total))
+    return samples
+
+
+def cache_stats():
+    """(hits, misses) of the Redis server behind the default cache, or None"""
+    try:
+        info = cache.client.get_client().info('stats')
+        return info['keyspace_hits'], info['keyspace_misses']
+    except Exception:
+        return None
+
+
+def render():
+    totals = metrics.read_totals()
+    lines = []
+
+    requests, gc_pauses = [], []
+    for (name, key), histogram in sorted(totals.histograms.items()):
+        if name == metrics.REQUEST_DURATION:
+            route, method, status = key
+            requests.extend(_histogram_samples({'route': route, 'method': method, 'status': status}, histogram))
+        elif name == metrics.GC_PAUSE:
+            gc_pauses.extend(_histogram_samples({'generation': key[0]}, histogram))
+    _family(
+        lines, f'{NAMESPACE}_http_request_duration_seconds', 'histogram',
+        'Request latency by URL name, method and status class.', requests, unit='seconds',
+    )
+    _family(
+        lines, f'{NAMESPACE}_gc_pause_seconds', 'histogram',
+        'Garbage collector pauses by generation.', gc_pauses, unit='seconds',
+    )
+
+    queries, query_time, n_plus_one, page_cache = [], [], [], []
+    allocation_samples, allocated_blocks, traced_bytes = [], [], []
+    for (name, key), value in sorted(totals.counters.items()):
+        if name == metrics.DB_QUERIES:
+            queries.append(('_total', {'route': key[0]}, value))
+        elif name == metrics.DB_QUERY_MICROSECONDS:
+            query_time.append(('_total', {'route': key[0]}, value / 1_000_000))
+        elif name == metrics.N_PLUS_ONE:
+            n_plus_one.append(('_total', {'route': key[0]}, value))
+        elif name == metrics.PAGE_CACHE:
+            page_cache.append(('_total', {'view': key[0], 'outcome': key[1]}, value))
+        elif name == metrics.ALLOCATION_SAMPLES:
+            allocation_samples.append(('_total', {'route': key[0]}, value))
+        elif name == metrics.ALLOCATED_BLOCKS:
+            allocated_blocks.append(('_total', {'route': key[0]}, value))
+        elif name == metrics.TRACED_BYTES:
+            traced_bytes.append(('_total', {'route': key[0]}, value))
+    _family(lines, f'{NAMESPACE}_db_queries', 'counter', 'Database queries run by requests, by URL name.', queries)
+    _family(
+        lines, f'{NAMESPACE}_db_query_seconds', 'counter',
+        'Time spent in database queries, by URL name.', query_time, unit='seconds',
+    )
+    _family(
+        lines, f'{NAMESPACE}_n_plus_one_requests', 'counter',
+        'Requests repeating one SQL statement past N_PLUS_ONE_THRESHOLD, by URL name.', n_plus_one,
+    )
+    _family(
+        lines, f'{NAMESPACE}_page_cache_lookups', 'counter',
+        'Cached view lookups by view and outcome (hit or miss).', page_cache,
+    )
+    _family(
+        lines, f'{NAMESPACE}_allocation_sampled_requests', 'counter',
+        'Requests sampled for allocation tracking, by URL name.', allocation_samples,
+    )
+    _family(
+        lines, f'{NAMESPACE}_allocation_retained_blocks', 'counter',
+        'Memory blocks kept by sampled requests, by URL name.', allocated_blocks,
+    )
+    _family(
+        lines, f'{NAMESPACE}_allocation_traced_bytes', 'counter',
+        'Bytes kept by sampled requests while tracemalloc runs, by URL name.', traced_bytes, unit='bytes',
+    )
+
+    stats = cache_stats()
+    if stats is not None:
+        hits, misses = stats
+        _family(lines, f'{NAMESPACE}_cache_hits', 'counter', 'Cache server keyspace hits.', [('_total', {}, hits)])
+        _family(
+            lines, f'{NAMESPACE}_cache_misses', 'counter', 'Cache server keyspace misses.', [('_total', {}, misses)]
+        )
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        _family(lines, f'{NAMESPACE}_cache_hit_ratio', 'gauge', 'Cache server hit ratio.', [('', {}, ratio)])
+
+    workers = metrics.read_workers()
+
+    def gauge(field):
+        return [('', {'pid': state['pid']}, state[field]) for state in workers if state.get(field) is not None]
+
+    _family(
+        lines, f'{NAMESPACE}_worker_resident_memory_bytes', 'gauge', 'Resident memory per worker process.',
+        gauge('rss'), unit='bytes',
+    )
+    _family(
+        lines, f'{NAMESPACE}_worker_cpu_percent', 'gauge',
+        'CPU use per worker process since its previous telemetry sample.', gauge('cpu_percent'),
+    )
+    _family(
+        lines, f'{NAMESPACE}_worker_open_fds', 'gauge', 'Open file descriptors per worker process.', gauge('open_fds')
+    )
+    _family(lines, f'{NAMESPACE}_worker_threads', 'gauge', 'Threads per worker process.', gauge('threads'))
+    _family(
+        lines, f'{NAMESPACE}_worker_db_connection_age_seconds', 'gauge',
+        'Age of the oldest open database connection per worker process.', gauge('db_connection_age'), unit='seconds',
+    )
+    _family(
+        lines, f'{NAMESPACE}_worker_gc_collections', 'counter',
+        'Garbage collections per worker process and generation.',
+        [
+            ('_total', {'pid': state['pid'], 'generation': generation}, count)
+            for state in workers for generation, count in enumerate(state.get('gc_collections') or [])
+        ],
+    )
+    _family(
+        lines, f'{NAMESPACE}_worker_traced_memory_bytes', 'gauge',
+        'Memory traced by tracemalloc per worker process, while tracing.', gauge('traced_bytes'), unit='bytes',
+    )
+    _family(
+        lines, f'{NAMESPACE}_http_requests_in_flight', 'gauge', 'Requests being served per worker process.',
+        gauge('in_flight'),
+    )
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
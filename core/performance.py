@@ -2,19 +2,69 @@
 Performance monitoring middleware and utilities.
 """
 
+import re
 import time
 import logging
+from functools import lru_cache
 from django.utils.deprecation import MiddlewareMixin
-from django.core.cache import cache
 from django.conf import settings
-import threading
-from collections import defaultdict, deque
-import json
-from datetime import datetime, timedelta
+from django.db import connection
+from collections import defaultdict
+from datetime import timedelta
+from django.utils import timezone
+
+from . import metrics, profiling, request_log, telemetry
 
 logger = logging.getLogger(__name__)
 
 
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_IN_LISTS = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """SQL with literals, placeholders and IN lists collapsed, so repeats of one query match"""
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryCounter:
+    """
+    ``connection.execute_wrapper`` recording the queries of one request:
+    count, total time, per-fingerprint repeats and slow statements. Works
+    with DEBUG off, unlike ``connection.queries``.
+    """
+    
+    def __init__(self, slow_query_threshold=None):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = defaultdict(int)
+        self.slow_queries = []
+        self.slow_query_threshold = slow_query_threshold
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self.fingerprints[fingerprint(sql)] += 1
+            if self.slow_query_threshold is not None and elapsed > self.slow_query_threshold:
+                self.slow_queries.append({'sql': sql[:200] + '...' if len(sql) > 200 else sql, 'time': elapsed})
+    
+    def repeated(self, threshold):
+        """(fingerprint, count) of statements run at least ``threshold`` times, most repeated first"""
+        return sorted(
+            ((sql, count) for sql, count in self.fingerprints.items() if count >= threshold),
+            key=lambda item: item[1], reverse=True,
+        )
+
+
 class PerformanceMonitoringMiddleware(MiddlewareMixin):
     """
     Middleware to monitor request performance and detect slow requests.
@@ -25,23 +75,40 @@ class PerformanceMonitoringMiddleware(MiddlewareMixin):
         self.slow_request_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', 2.0)  # seconds
         super().__init__(get_response)
     
+    def __call__(self, request):
+        metrics.registry.request_started()
+        try:
+            return super().__call__(request)
+        finally:
+            metrics.registry.request_finished()
+            profiling.disarm(request)
+    
     def process_request(self, request):
-        request._performance_start_time = time.time()
+        request._performance_start_time = time.perf_counter()
+        metrics.ensure_flusher()
+        profiling.start_request(request)
         return None
     
     def process_response(self, request, response):
         if hasattr(request, '_performance_start_time'):
-            duration = time.time() - request._performance_start_time
+            duration = time.perf_counter() - request._performance_start_time
+            profile = profiling.finish_request(request, duration, self.slow_request_threshold)
+            slow = duration > self.slow_request_threshold
             
             # Log slow requests
-            if duration > self.slow_request_threshold:
+            if slow:
                 logger.warning(
                     f"Slow request detected: {request.method} {request.path} "
                     f"took {duration:.2f}s (User: {getattr(request.user, 'username', 'Anonymous')})"
+                    + (f" - profile {profile}" if profile else "")
                 )
             
-            # Store performance metrics
-            self._record_performance_metric(request, duration)
+            # Store performance metrics and the structured request event
+            self._record_performance_metric(request, response, duration)
+            try:
+                request_log.log_request(request, response, duration, metrics.route_name(request), slow, profile)
+            except Exception as e:
+                logger.error(f"Failed to log request event: {e}")
             
             # Add performance header for debugging
             if settings.DEBUG:
@@ -49,119 +116,106 @@ class PerformanceMonitoringMiddleware(MiddlewareMixin):
         
         return response
     
-    def _record_performance_metric(self, request, duration):
-        """Record performance metrics for analysis."""
+    def _record_performance_metric(self, request, response, duration):
+        """Record the request in this process's latency histograms (flushed to the cache in the background)."""
         try:
-            metric_data = {
-                'path': request.path,
-                'method': request.method,
-                'duration': duration,
-                'timestamp': datetime.now().isoformat(),
-                'user': getattr(request.user, 'username', 'anonymous') if hasattr(request, 'user') else 'anonymous',
-                'status_code': getattr(request, '_status_code', 'unknown'),
-            }
-            
-            # Store in cache for short-term analysis
-            cache_key = f"performance_metrics:{datetime.now().strftime('%Y%m%d%H')}"
-            metrics = cache.get(cache_key, [])
-            metrics.append(metric_data)
-            
-            # Keep only last 1000 metrics per hour
-            if len(metrics) > 1000:
-                metrics = metrics[-1000:]
-            
-            cache.set(cache_key, metrics, 3600)  # Store for 1 hour
-            
+            metrics.record_request(request, response.status_code, duration)
+            counter = getattr(request, '_query_counter', None)
+            if counter is not None and counter.count:
+                route = (metrics.route_name(request),)
+                metrics.registry.increment(metrics.DB_QUERIES, route, counter.count)
+                metrics.registry.increment(metrics.DB_QUERY_MICROSECONDS, route, round(counter.duration * 1_000_000))
         except Exception as e:
             logger.error(f"Failed to record performance metric: {e}")
 
 
 class DatabaseQueryMonitoringMiddleware(MiddlewareMixin):
     """
-    Middleware to monitor database query performance.
+    Middleware to monitor database query performance in every environment.
+    
+    Queries are counted through ``connection.execute_wrapper``. Statements
+    repeated at least N_PLUS_ONE_THRESHOLD times in one request are logged
+    as likely N+1 patterns and counted per view, and every response gets a
+    ``Server-Timing`` header with the query count and time.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
         self.slow_query_threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD', 0.5)  # seconds
+        self.n_plus_one_threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 10)
         super().__init__(get_response)
     
-    def process_request(self, request):
-        if settings.DEBUG:
-            from django.db import connection
-            request._db_query_count_start = len(connection.queries)
-        return None
+    def __call__(self, request):
+        request._query_counter = counter = QueryCounter(self.slow_query_threshold)
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = super().__call__(request)
+        self._add_server_timing(response, counter, time.perf_counter() - start)
+        return response
     
     def process_response(self, request, response):
-        if settings.DEBUG and hasattr(request, '_db_query_count_start'):
-            from django.db import connection
-            
-            query_count = len(connection.queries) - request._db_query_count_start
-            
-            # Check for slow queries
-            slow_queries = []
-            for query in connection.queries[request._db_query_count_start:]:
-                if float(query['time']) > self.slow_query_threshold:
-                    slow_queries.append({
-                        'sql': query['sql'][:200] + '...' if len(query['sql']) > 200 else query['sql'],
-                        'time': query['time']
-                    })
-            
-            if slow_queries:
-                logger.warning(
-                    f"Slow database queries detected for {request.path}: "
-                    f"{len(slow_queries)} slow queries out of {query_count} total"
-                )
-            
-            # Add debug headers
-            response['X-DB-Query-Count'] = str(query_count)
-            if slow_queries:
-                response['X-DB-Slow-Queries'] = str(len(slow_queries))
+        counter = getattr(request, '_query_counter', None)
+        if counter is None:
+            return response
+        route = metrics.route_name(request)
+        
+        if counter.slow_queries:
+            logger.warning(
+                f"Slow database queries detected for {route} ({request.path}): "
+                f"{len(counter.slow_queries)} slow queries out of {counter.count} total"
+            )
+        
+        repeated = counter.repeated(self.n_plus_one_threshold)
+        if repeated:
+            request._n_plus_one = True
+            metrics.registry.increment(metrics.N_PLUS_ONE, (route,))
+            sql, times = repeated[0]
+            logger.warning(
+                f"Possible N+1 queries in {route} ({request.path}): {times} runs of "
+                f"{sql[:200]} ({counter.count} queries in total)"
+            )
+        
+        # Add debug headers
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(counter.count)
+            if counter.slow_queries:
+                response['X-DB-Slow-Queries'] = str(len(counter.slow_queries))
         
         return response
+    
+    def _add_server_timing(self, response, counter, duration):
+        timing = f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries", app;dur={duration * 1000:.1f}'
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
 
 
-class MemoryMonitoringMiddleware(MiddlewareMixin):
+class ResourceTelemetryMiddleware:
     """
-    Middleware to monitor memory usage during request processing.
+    Starts this worker's telemetry sampler and tracks the allocations of a
+    sampled share of requests (see core.telemetry). Unsampled requests pay
+    one random() call.
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-        super().__init__(get_response)
-    
-    def process_request(self, request):
-        try:
-            import psutil
-            process = psutil.Process()
-            request._memory_start = process.memory_info().rss
-        except ImportError:
-            pass
-        return None
-    
-    def process_response(self, request, response):
-        if hasattr(request, '_memory_start'):
-            try:
-                import psutil
-                process = psutil.Process()
-                memory_end = process.memory_info().rss
-                memory_diff = memory_end - request._memory_start
-                
-                # Convert to MB
-                memory_diff_mb = memory_diff / (1024 * 1024)
-                
-                if memory_diff_mb > 10:  # Alert if request used more than 10MB
-                    logger.warning(
-                        f"High memory usage request: {request.path} "
-                        f"used {memory_diff_mb:.2f} MB"
-                    )
-                
-                if settings.DEBUG:
-                    response['X-Memory-Usage'] = f"{memory_diff_mb:.2f}MB"
-                    
-            except ImportError:
-                pass
-        
+        self.warn_blocks = getattr(settings, 'TELEMETRY_ALLOCATION_WARNING_BLOCKS', 100_000)
+
+    def __call__(self, request):
+        telemetry.ensure_sampler()
+        if not telemetry.sample_request():
+            return self.get_response(request)
+
+        tracker = telemetry.AllocationTracker()
+        response = self.get_response(request)
+        blocks, traced = tracker.stop()
+        telemetry.record_allocations(metrics.route_name(request), blocks, traced)
+        if blocks > self.warn_blocks:
+            logger.warning(
+                f"High memory usage request: {request.path} kept {blocks} memory blocks"
+                + (f" ({traced / (1024 * 1024):.2f} MB traced)" if traced is not None else "")
+            )
+        if settings.DEBUG:
+            response['X-Memory-Blocks'] = str(blocks)
         return response
 
 
@@ -170,36 +224,48 @@ class PerformanceAnalyzer:
     Utility class for analyzing performance metrics.
     """
     
+    @staticmethod
+    def _from_history(hours):
+        """Windows longer than the hourly cache keys are read from the rollups in core.history"""
+        return hours >= getattr(settings, 'METRICS_RETENTION_HOURS', 25)
+    
+    @staticmethod
+    def _history_stats(hours):
+        from . import history
+        now = timezone.now()
+        return history.route_stats(now - timedelta(hours=hours), now)
+    
+    @staticmethod
+    def _request_histograms(hours):
+        frame = metrics.read_window(hours)
+        return {
+            labels: histogram for (name, labels), histogram in frame.histograms.items()
+            if name == metrics.REQUEST_DURATION
+        }
+    
     @staticmethod
     def get_slow_endpoints(hours=24):
         """Get endpoints with slowest average response times."""
         try:
-            endpoint_stats = defaultdict(list)
+            if PerformanceAnalyzer._from_history(hours):
+                slow_endpoints = PerformanceAnalyzer._history_stats(hours)
+                slow_endpoints.sort(key=lambda x: x['avg_duration'], reverse=True)
+                return slow_endpoints[:10]
             
-            # Collect metrics from cache
-            now = datetime.now()
-            for hour_offset in range(hours):
-                timestamp = now - timedelta(hours=hour_offset)
-                cache_key = f"performance_metrics:{timestamp.strftime('%Y%m%d%H')}"
-                metrics = cache.get(cache_key, [])
-                
-                for metric in metrics:
-                    endpoint = f"{metric['method']} {metric['path']}"
-                    endpoint_stats[endpoint].append(metric['duration'])
+            endpoint_stats = defaultdict(metrics.Histogram)
+            for (route, method, _status), histogram in PerformanceAnalyzer._request_histograms(hours).items():
+                endpoint_stats[f"{method} {route}"].merge(histogram)
             
-            # Calculate averages
-            slow_endpoints = []
-            for endpoint, durations in endpoint_stats.items():
-                avg_duration = sum(durations) / len(durations)
-                max_duration = max(durations)
-                request_count = len(durations)
-                
-                slow_endpoints.append({
+            slow_endpoints = [
+                {
                     'endpoint': endpoint,
-                    'avg_duration': avg_duration,
-                    'max_duration': max_duration,
-                    'request_count': request_count,
-                })
+                    'avg_duration': histogram.mean,
+                    'p95_duration': histogram.percentile(0.95),
+                    'max_duration': histogram.maximum,
+                    'request_count': histogram.count,
+                }
+                for endpoint, histogram in endpoint_stats.items()
+            ]
             
             # Sort by average duration
             slow_endpoints.sort(key=lambda x: x['avg_duration'], reverse=True)
@@ -210,30 +276,70 @@ class PerformanceAnalyzer:
             logger.error(f"Failed to analyze slow endpoints: {e}")
             return []
     
+    @staticmethod
+    def get_query_heavy_endpoints(hours=24, limit=10):
+        """Views running the most queries per request, with how often they looked like N+1."""
+        try:
+            if PerformanceAnalyzer._from_history(hours):
+                endpoints = [item for item in PerformanceAnalyzer._history_stats(hours) if item['query_count']]
+                endpoints.sort(key=lambda x: (x['n_plus_one_requests'], x['avg_queries']), reverse=True)
+                return endpoints[:limit]
+            
+            frame = metrics.read_window(hours)
+            requests = defaultdict(int)
+            for (name, (route, _method, _status)), histogram in frame.histograms.items():
+                if name == metrics.REQUEST_DURATION:
+                    requests[route] += histogram.count
+            
+            endpoints = []
+            for (name, labels), queries in frame.counters.items():
+                route = labels[0] if labels else None
+                if name != metrics.DB_QUERIES or not requests.get(route):
+                    continue
+                endpoints.append({
+                    'endpoint': route,
+                    'request_count': requests[route],
+                    'query_count': queries,
+                    'avg_queries': queries / requests[route],
+                    'avg_query_time': frame.counters.get((metrics.DB_QUERY_MICROSECONDS, (route,)), 0)
+                    / 1_000_000 / requests[route],
+                    'n_plus_one_requests': frame.counters.get((metrics.N_PLUS_ONE, (route,)), 0),
+                })
+            
+            endpoints.sort(key=lambda x: (x['n_plus_one_requests'], x['avg_queries']), reverse=True)
+            return endpoints[:limit]
+            
+        except Exception as e:
+            logger.error(f"Failed to analyze query-heavy endpoints: {e}")
+            return []
+    
     @staticmethod
     def get_performance_summary(hours=24):
         """Get overall performance summary."""
         try:
-            all_durations = []
-            request_count = 0
-            error_count = 0
+            if PerformanceAnalyzer._from_history(hours):
+                from . import history
+                now = timezone.now()
+                stats = history.summary(now - timedelta(hours=hours), now)
+                return {
+                    'request_count': stats['request_count'],
+                    'avg_response_time': stats['avg_duration'],
+                    'p95_response_time': stats['p95_duration'],
+                    'p99_response_time': stats['p99_duration'],
+                    'error_rate': stats['error_rate'],
+                    'min_response_time': stats['min_duration'],
+                    'max_response_time': stats['max_duration'],
+                }
             
-            # Collect metrics from cache
-            now = datetime.now()
-            for hour_offset in range(hours):
-                timestamp = now - timedelta(hours=hour_offset)
-                cache_key = f"performance_metrics:{timestamp.strftime('%Y%m%d%H')}"
-                metrics = cache.get(cache_key, [])
-                
-                for metric in metrics:
-                    all_durations.append(metric['duration'])
-                    request_count += 1
-                    
-                    # Count errors (assuming status codes >= 400 are errors)
-                    if isinstance(metric.get('status_code'), int) and metric['status_code'] >= 400:
-                        error_count += 1
+            overall = metrics.Histogram()
+            error_count = 0
+            for (_route, _method, status), histogram in PerformanceAnalyzer._request_histograms(hours).items():
+                overall.merge(histogram)
+                # Count errors (status codes >= 400)
+                if status in ('4xx', '5xx'):
+                    error_count += histogram.count
             
-            if not all_durations:
+            if not overall.count:
                 return {
                     'request_count': 0,
                     'avg_response_time': 0,
@@ -242,101 +348,33 @@ class PerformanceAnalyzer:
                     'error_rate': 0,
                 }
             
-            # Calculate percentiles
-            sorted_durations = sorted(all_durations)
-            p95_index = int(len(sorted_durations) * 0.95)
-            p99_index = int(len(sorted_durations) * 0.99)
-            
             return {
-                'request_count': request_count,
-                'avg_response_time': sum(all_durations) / len(all_durations),
-                'p95_response_time': sorted_durations[p95_index] if p95_index < len(sorted_durations) else 0,
-                'p99_response_time': sorted_durations[p99_index] if p99_index < len(sorted_durations) else 0,
-                'error_rate': (error_count / request_count) * 100 if request_count > 0 else 0,
-                'min_response_time': min(all_durations),
-                'max_response_time': max(all_durations),
+                'request_count': overall.count,
+                'avg_response_time': overall.mean,
+                'p95_response_time': overall.percentile(0.95),
+                'p99_response_time': overall.percentile(0.99),
+                'error_rate': (error_count / overall.count) * 100,
+                'min_response_time': overall.minimum,
+                'max_response_time': overall.maximum,
             }
             
         except Exception as e:
             logger.error(f"Failed to generate performance summary: {e}")
             return {}
-
-
-class RequestRateLimiter:
-    """
-    Simple rate limiter to prevent abuse.
-    """
     
-    def __init__(self):
-        self.requests = defaultdict(deque)
-        self.lock = threading.Lock()
-    
-    def is_rate_limited(self, identifier, max_requests=100, window_seconds=60):
+    @staticmethod
+    def compare_periods(current, previous, limit=15):
         """
-        Check if identifier is rate limited.
-        
-        Args:
-            identifier: Unique identifier (IP, user ID, etc.)
-            max_requests: Maximum requests allowed in window
-            window_seconds: Time window in seconds
-        
-        Returns:
-            bool: True if rate limited, False otherwise
+        Overall and per-route statistics of the ``current`` (start, end)
+        window next to the ``previous`` one, from the persistent rollups.
         """
-        now = time.time()
-        window_start = now - window_seconds
-        
-        with self.lock:
-            # Clean old requests
-            request_times = self.requests[identifier]
-            while request_times and request_times[0] < window_start:
-                request_times.popleft()
-            
-            # Check if rate limited
-            if len(request_times) >= max_requests:
-                return True
-            
-            # Add current request
-            request_times.append(now)
-            
-            return False
-
-
-# Global rate limiter instance
-rate_limiter = RequestRateLimiter()
-
-
-class RateLimitMiddleware(MiddlewareMixin):
-    """
-    Middleware to implement rate limiting.
-    """
-    
-    def __init__(self, get_response):
-        self.get_response = get_response
-        self.max_requests = getattr(settings, 'RATE_LIMIT_REQUESTS', 100)
-        self.window_seconds = getattr(settings, 'RATE_LIMIT_WINDOW', 60)
-        super().__init__(get_response)
-    
-    def process_request(self, request):
-        # Use IP address as identifier
-        identifier = self._get_client_ip(request)
-        
-        if rate_limiter.is_rate_limited(
-            identifier, 
-            self.max_requests, 
-            self.window_seconds
-        ):
-            from django.http import HttpResponseTooManyRequests
-            logger.warning(f"Rate limit exceeded for {identifier}")
-            return HttpResponseTooManyRequests("Rate limit exceeded")
-        
-        return None
-    
-    def _get_client_ip(self, request):
-        """Get client IP address."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        try:
+            from . import history
+            return {
+                'current': history.summary(*current),
+                'previous': history.summary(*previous),
+                'routes': history.compare(current, previous, limit),
+            }
+        except Exception as e:
+            logger.error(f"Failed to compare performance periods: {e}")
+            return {}
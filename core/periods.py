@@ -0,0 +1,139 @@
+"""
+Reporting periods as half-open date ranges.
+
+A Period covers ``start <= day < end``. Filtering with ``Period.filter()``
+turns into a plain range condition on the column, which can use an index
+on it, unlike ``__month``/``__year`` lookups that wrap the column in a date
+function. Months are computed by calendar, never as multiples of 30 days.
+"""
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, count):
+    """First day of the month ``count`` months after the month of ``day``"""
+    index = day.year * 12 + day.month - 1 + count
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def next_month(day):
+    return add_months(day, 1)
+
+
+def month_end(day):
+    return next_month(day) - timedelta(days=1)
+
+
+class Period(NamedTuple):
+    start: object
+    end: object
+    label: str
+
+    @property
+    def last_day(self):
+        """Inclusive end date, for APIs that take closed ranges"""
+        return self.end - timedelta(days=1)
+
+    def contains(self, day):
+        return self.start <= day < self.end
+
+    def bounds(self, aware=False):
+        """The range as dates, or as timezone-aware datetimes for DateTimeFields"""
+        if not aware:
+            return self.start, self.end
+        return tuple(
+            timezone.make_aware(datetime.combine(day, time.min)) for day in (self.start, self.end)
+        )
+
+    def filter(self, field, aware=False):
+        """Q object selecting rows whose ``field`` falls in the period"""
+        start, end = self.bounds(aware)
+        return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+
+    def until(self, day):
+        """The part of the period up to and including ``day``"""
+        return self._replace(end=min(self.end, day + timedelta(days=1)))
+
+
+def month(day):
+    start = month_start(day)
+    return Period(start, next_month(start), start.strftime('%B %Y'))
+
+
+def quarter(day):
+    number = (day.month - 1) // 3 + 1
+    start = day.replace(month=(number - 1) * 3 + 1, day=1)
+    return Period(start, add_months(start, 3), f'Q{number} {day.year}')
+
+
+def year(day):
+    start = day.replace(month=1, day=1)
+    return Period(start, start.replace(year=start.year + 1), str(start.year))
+
+
+def last_months(day, count):
+    """The ``count`` calendar months up to and including the month of ``day``, oldest first"""
+    current = month_start(day)
+    return [month(add_months(current, offset)) for offset in range(1 - count, 1)]
+
+
+def term(academic_term):
+    """Period of a results.AcademicTerm (its end_date is inclusive)"""
+    return Period(academic_term.start_date, academic_term.end_date + timedelta(days=1), str(academic_term))
+
+
+def session(academic_session):
+    """Period of a results.AcademicSession (its end_date is inclusive)"""
+    return Period(
+        academic_session.start_date, academic_session.end_date + timedelta(days=1), academic_session.name
+    )
+
+
+def current_term(day=None):
+    """The AcademicTerm containing ``day`` (or flagged current), as a Period; None if unknown"""
+    from results.models import AcademicTerm
+
+    day = day or timezone.now().date()
+    academic_term = (
+        AcademicTerm.objects.select_related('session').filter(start_date__lte=day, end_date__gte=day).first()
+        or AcademicTerm.objects.select_related('session').filter(is_current=True).first()
+    )
+    return term(academic_term) if academic_term else None
+
+
+def current_session(day=None):
+    from results.models import AcademicSession
+
+    day = day or timezone.now().date()
+    academic_session = (
+        AcademicSession.objects.filter(start_date__lte=day, end_date__gte=day).first()
+        or AcademicSession.objects.filter(is_current=True).first()
+    )
+    return session(academic_session) if academic_session else None
+
+
+# Named periods offered by the report forms. "Current" periods stop at today.
+NAMED_PERIODS = {
+    'current_month': lambda today: month(today).until(today),
+    'last_month': lambda today: month(add_months(today, -1)),
+    'current_quarter': lambda today: quarter(today).until(today),
+    'last_quarter': lambda today: quarter(add_months(month_start(today), -3)),
+    'current_year': lambda today: year(today).until(today),
+    'last_year': lambda today: year(today.replace(month=1, day=1) - timedelta(days=1)),
+    'current_term': lambda today: current_term(today),
+    'current_session': lambda today: current_session(today),
+}
+
+
+def named_period(name, today=None):
+    """Period for a name in NAMED_PERIODS; None for unknown names or undefined terms"""
+    today = today or timezone.now().date()
+    factory = NAMED_PERIODS.get(name)
+    return factory(today) if factory else None
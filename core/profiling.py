@@ -0,0 +1,215 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+With ``PROFILE_SLOW_REQUESTS`` on, PerformanceMonitoringMiddleware arms a
+profile for each request. One daemon thread per process wakes every
+``PROFILE_INTERVAL`` seconds while any profile is armed and records the
+current stack of each armed request thread from ``sys._current_frames()``,
+so the request threads themselves do no work beyond arming and disarming.
+
+Requests that end up slower than ``SLOW_REQUEST_THRESHOLD`` have their
+samples written in collapsed-stack format (``frame;frame;frame count``,
+ready for flamegraph.pl or speedscope) to ``PROFILE_DIR``, with a JSON
+sidecar holding the URL name, role, path and duration. The directory is a
+ring: only the newest ``PROFILE_RING_SIZE`` profiles are kept.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME = re.compile(r'^[\w.-]+$')
+MAX_DEPTH = 128
+
+
+def enabled():
+    return getattr(settings, 'PROFILE_SLOW_REQUESTS', False)
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+
+
+class Profile:
+    """Collapsed stacks sampled from one thread"""
+    __slots__ = ('thread_id', 'stacks', 'samples')
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add(self, frame):
+        self.stacks[collapse(frame)] += 1
+        self.samples += 1
+
+
+def collapse(frame):
+    """Root-first ``module:function`` names of a stack, joined by semicolons"""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of armed threads from a single background thread"""
+
+    def __init__(self):
+        self._armed = {}
+        self._wake = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name='stack-sampler', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        sampler_id = threading.get_ident()
+        while True:
+            if not self._armed:
+                self._wake.wait()
+                self._wake.clear()
+            time.sleep(getattr(settings, 'PROFILE_INTERVAL', 0.01))
+            frames = sys._current_frames()
+            for thread_id, profile in list(self._armed.items()):
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != sampler_id:
+                    profile.add(frame)
+
+    def start(self):
+        """Arm a profile for the calling thread"""
+        self._ensure_thread()
+        profile = Profile(threading.get_ident())
+        self._armed[profile.thread_id] = profile
+        self._wake.set()
+        return profile
+
+    def stop(self, profile):
+        self._armed.pop(profile.thread_id, None)
+        return profile
+
+
+sampler = StackSampler()
+
+
+def start_request(request):
+    if enabled():
+        request._profile = sampler.start()
+
+
+def disarm(request):
+    profile = getattr(request, '_profile', None)
+    if profile is not None:
+        sampler.stop(profile)
+
+
+def finish_request(request, duration, threshold):
+    """Disarm the request's profile and keep it when the request was slow"""
+    profile = getattr(request, '_profile', None)
+    if profile is None:
+        return None
+    sampler.stop(profile)
+    if duration <= threshold or not profile.samples:
+        return None
+    try:
+        return save(profile, request, duration)
+    except OSError as e:
+        logger.error(f"Failed to save request profile: {e}")
+        return None
+
+
+def save(profile, request, duration):
+    """Write a profile and its metadata to the ring directory; returns the profile name"""
+    from . import metrics
+
+    route = metrics.route_name(request)
+    user = getattr(request, 'user', None)
+    role = getattr(user, 'role', None) if user is not None and user.is_authenticated else 'anonymous'
+    created = datetime.now()
+    slug = re.sub(r'[^\w-]+', '-', route).strip('-')[:60] or 'request'
+    name = f"{created:%Y%m%d-%H%M%S-%f}-{os.getpid()}-{slug}"
+
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stacks = ''.join(f'{stack} {count}\n' for stack, count in profile.stacks.most_common())
+    (directory / f'{name}.folded').write_text(stacks)
+    (directory / f'{name}.json').write_text(json.dumps({
+        'name': name,
+        'route': route,
+        'role': role or 'unknown',
+        'method': request.method,
+        'path': request.path,
+        'duration': round(duration, 3),
+        'samples': profile.samples,
+        'created': created.isoformat(timespec='seconds'),
+    }))
+    _trim(directory)
+    logger.info(f"Saved profile {name} ({profile.samples} samples, {duration:.2f}s)")
+    return name
+
+
+def _trim(directory):
+    keep = getattr(settings, 'PROFILE_RING_SIZE', 50)
+    stale = sorted(directory.glob('*.json'))[:-keep or None] if keep else []
+    for meta in stale:
+        for path in (meta, meta.with_suffix('.folded')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def recent_profiles():
+    """Metadata of the saved profiles, newest first"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for meta in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(meta.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def read_profile(name):
+    """Collapsed stacks of a saved profile, or None for unknown or unsafe names"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / f'{name}.folded'
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def hottest_frames(stacks_text, limit=15):
+    """(function, samples, share) of the leaf frames with most samples in a collapsed profile"""
+    leaves = Counter()
+    total = 0
+    for line in stacks_text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if not stack or not count.isdigit():
+            continue
+        leaves[stack.rsplit(';', 1)[-1]] += int(count)
+        total += int(count)
+    return [(frame, count, round(count / total * 100, 1)) for frame, count in leaves.most_common(limit)]
@@ -0,0 +1,180 @@
+"""
+Shared-state rate limiting.
+
+Each request is matched to the first policy whose path prefix, methods and
+roles fit, and counted against a sliding-window counter for that policy
+and client: the hits of the current fixed window plus the previous
+window's hits weighted by how much of it still overlaps the sliding
+window. That is two small integers per client kept in the configured
+cache and bumped with an atomic ``incr``, so limits hold across all
+gunicorn workers and memory does not grow with the history of requests.
+
+If the cache backend fails, counting falls back to a bounded in-process
+LRU until it recovers, so requests are still limited per worker.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+STAFF_ROLES = ('admin', 'staff', 'accountant', 'it_support')
+
+DEFAULT_POLICIES = [
+    {'name': 'exempt', 'prefixes': ('/static/', '/media/', '/health/', '/metrics'), 'requests': None},
+    {'name': 'login', 'prefixes': ('/accounts/login/',), 'methods': ('POST',),
+     'requests': 10, 'window': 300, 'key': 'ip'},
+    {'name': 'password-reset', 'prefixes': ('/accounts/password_reset/',), 'methods': ('POST',),
+     'requests': 5, 'window': 3600, 'key': 'ip'},
+    {'name': 'admission', 'prefixes': ('/admission/',), 'methods': ('POST',),
+     'requests': 5, 'window': 3600, 'key': 'ip'},
+    {'name': 'staff-dashboards', 'prefixes': ('/dashboard/', '/accounting/', '/attendance/'), 'roles': STAFF_ROLES,
+     'requests': 600, 'window': 60},
+]
+
+
+class RatePolicy(NamedTuple):
+    name: str
+    requests: Optional[int]  # None: never limited
+    window: int = 60  # seconds
+    prefixes: tuple = ('/',)
+    methods: tuple = ()  # empty: any method
+    roles: tuple = ()  # empty: anyone, including anonymous users
+    key: str = 'user'  # 'user' (per account, per IP when anonymous) or 'ip'
+
+    def matches(self, request, role):
+        return (
+            request.path.startswith(self.prefixes)
+            and (not self.methods or request.method in self.methods)
+            and (not self.roles or role in self.roles)
+        )
+
+
+def policies():
+    configured = getattr(settings, 'RATE_LIMIT_POLICIES', DEFAULT_POLICIES)
+    default = RatePolicy(
+        'default', getattr(settings, 'RATE_LIMIT_REQUESTS', 100), getattr(settings, 'RATE_LIMIT_WINDOW', 60)
+    )
+    return [RatePolicy(**policy) for policy in configured] + [default]
+
+
+def client_ip(request):
+    """
+    Client address as seen by the outermost trusted proxy. Entries left of
+    the RATE_LIMIT_TRUSTED_PROXIES ones appended by our proxies come from
+    the client, who could vary them to get a fresh bucket per request.
+    """
+    trusted = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 0)
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if trusted and x_forwarded_for:
+        hops = [hop.strip() for hop in x_forwarded_for.split(',')]
+        return hops[max(len(hops) - trusted, 0)]
+    return request.META.get('REMOTE_ADDR')
+
+
+class LocalCounters:
+    """Bounded LRU of counters used while the cache is unreachable"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counts.pop(key, 0) + 1
+            self._counts[key] = value
+            if len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            return self._counts.get(key, 0)
+
+
+local_counters = LocalCounters(getattr(settings, 'RATE_LIMIT_LOCAL_KEYS', 10000))
+_degraded = False
+
+
+def _count(current_key, previous_key, timeout):
+    """(current, previous) window hits after counting this one"""
+    global _degraded
+    try:
+        if cache.add(current_key, 1, timeout):
+            current = 1
+        else:
+            current = cache.incr(current_key)
+        previous = cache.get(previous_key) or 0
+        if _degraded:
+            _degraded = False
+            logger.info("Rate limiter is using the shared cache again")
+        return current, previous
+    except ValueError:
+        # The key expired between add and incr; count it as a first hit
+        return 1, 0
+    except Exception as e:
+        if not _degraded:
+            _degraded = True
+            logger.warning(f"Rate limiter cache unavailable, counting per process: {e}")
+        return local_counters.incr(current_key), local_counters.get(previous_key)
+
+
+def hit(policy, identifier, now=None):
+    """
+    Count a request and decide it. Returns (allowed, retry_after_seconds);
+    the estimate is current + previous * (share of the previous window
+    still inside the sliding window).
+    """
+    if policy.requests is None:
+        return True, 0
+    now = time.time() if now is None else now
+    index, offset = divmod(now, policy.window)
+    base = f'{KEY_PREFIX}:{policy.name}:{identifier}'
+    current, previous = _count(f'{base}:{int(index)}', f'{base}:{int(index) - 1}', policy.window * 2)
+    estimate = current + previous * (1 - offset / policy.window)
+    if estimate <= policy.requests:
+        return True, 0
+    return False, max(1, math.ceil(policy.window - offset))
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Middleware to implement rate limiting. Must come after
+    AuthenticationMiddleware so role policies and per-user keys apply.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policies = policies()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        role = getattr(user, 'role', None) if authenticated else None
+        policy = next(policy for policy in self.policies if policy.matches(request, role))
+        if policy.requests is None:
+            return None
+
+        if policy.key == 'user' and authenticated:
+            identifier = f'user:{user.pk}'
+        else:
+            identifier = f'ip:{client_ip(request)}'
+        allowed, retry_after = hit(policy, identifier)
+        if allowed:
+            return None
+
+        logger.warning(f"Rate limit '{policy.name}' exceeded for {identifier} on {request.method} {request.path}")
+        response = HttpResponse("Rate limit exceeded", status=429, content_type='text/plain')
+        response['Retry-After'] = str(retry_after)
+        return response
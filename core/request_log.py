@@ -0,0 +1,187 @@
+"""
+Structured request events written off the request path.
+
+PerformanceMonitoringMiddleware emits one event dict per request to the
+``glad_tidings.requests`` logger. That logger's NDJSONQueueHandler only
+puts the record on a bounded queue; a writer thread takes records off in
+batches (up to ``batch_size`` or ``flush_interval`` seconds, whichever
+comes first), serialises each as one JSON line and writes the batch to a
+rotating file with a single flush. When the queue is full, events are
+dropped and counted rather than blocking the request.
+
+Successful requests are sampled (``REQUEST_LOG_SAMPLE_RATE``, with
+per-URL-name overrides in ``REQUEST_LOG_SAMPLE_RATES``); errors, slow
+requests and requests flagged for N+1 queries are always logged. Each
+event carries its sample rate so counts can be scaled back up.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+logger = logging.getLogger('glad_tidings.requests')
+
+
+class NDJSONFormatter(logging.Formatter):
+    """One JSON object per line; dict messages are merged into the object"""
+
+    def format(self, record):
+        event = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+        }
+        if isinstance(record.msg, dict):
+            event.update(record.msg)
+        else:
+            event['message'] = record.getMessage()
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str, separators=(',', ':'))
+
+
+class _BatchFileHandler(RotatingFileHandler):
+    """Rotating file handler that leaves flushing to the end of each batch"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class NDJSONQueueHandler(QueueHandler):
+    """
+    QueueHandler feeding a background writer thread that appends batches of
+    NDJSON lines to ``filename`` (rotated like RotatingFileHandler).
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, batch_size=200, flush_interval=1.0, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.writer = _BatchFileHandler(filename, maxBytes=maxBytes, backupCount=backupCount, delay=True)
+        self.writer.setFormatter(NDJSONFormatter())
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='request-log-writer', daemon=True)
+        self._thread.start()
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread; event dicts are not mutated after logging
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()  # forked after the handler was configured
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for record in batch:
+            self.writer.handle(record)
+        self.writer.flush_batch()
+
+    def _run(self):
+        while not self._stop.is_set() or not self.queue.empty():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                self.handleError(batch[-1])
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        """Wait until everything queued so far has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval * 2 + 1)
+        self.writer.close()
+        super().close()
+
+
+def sample_rate(route, status_code, always):
+    """Share of requests like this one that are logged"""
+    from django.conf import settings
+
+    if always or status_code >= 400:
+        return 1.0
+    rates = getattr(settings, 'REQUEST_LOG_SAMPLE_RATES', {})
+    return rates.get(route, getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0))
+
+
+def log_request(request, response, duration, route, slow=False, profile=None):
+    """Emit the request's structured event, subject to sampling"""
+    counter = getattr(request, '_query_counter', None)
+    n_plus_one = getattr(request, '_n_plus_one', False)
+    rate = sample_rate(route, response.status_code, slow or n_plus_one)
+    if rate <= 0 or (rate < 1 and random.random() >= rate) or not logger.isEnabledFor(logging.INFO):
+        return
+
+    user = getattr(request, 'user', None)
+    authenticated = user is not None and user.is_authenticated
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    event = {
+        'event': 'request',
+        'route': route,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'db_queries': counter.count if counter else None,
+        'db_ms': round(counter.duration * 1000, 2) if counter else None,
+        'user_id': user.pk if authenticated else None,
+        'role': getattr(user, 'role', None) if authenticated else None,
+        'ip': forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:200],
+        'sample_rate': rate,
+    }
+    if slow:
+        event['slow'] = True
+    if n_plus_one:
+        event['n_plus_one'] = True
+    if profile:
+        event['profile'] = profile
+
+    if response.status_code >= 500:
+        logger.error(event)
+    elif response.status_code >= 400 or slow:
+        logger.warning(event)
+    else:
+        logger.info(event)
@@ -1,13 +1,27 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from academics.models import Announcement
-from .models import UserNotification, NewsPost, UpcomingEvent
+from accounting.models import Payment, Expense, TuitionFee, Payroll
+from staff.models import StaffProfile, StaffAttendance
+from students.models import StudentProfile, AttendanceRecord
+from results.models import (
+    AcademicSession, AcademicTerm, Assessment, StudentClass, StudentResult, Subject, TermResult,
+)
+from . import dashboard
+from .listing import track_table_version
+from .models import NewsPost, UpcomingEvent
 
-@receiver(post_save, sender=Announcement)
-def create_notifications_from_announcement(sender, instance, created, **kwargs):
-    """When a new announcement is created, create notifications for all users"""
-    if created and instance.is_active:
-        UserNotification.create_from_announcement(instance)
+# Models whose rows feed the cached admin dashboard snapshot
+DASHBOARD_MODELS = (
+    Payment, Expense, TuitionFee, Payroll,
+    StudentProfile, AttendanceRecord, StaffProfile, StaffAttendance,
+)
+
+# Models read by cached pages and fragments (see core.caching)
+track_table_version(
+    Announcement, NewsPost, UpcomingEvent, StudentProfile, AttendanceRecord,
+    AcademicSession, AcademicTerm, Assessment, StudentClass, StudentResult, Subject, TermResult,
+)
 
 
 @receiver(post_save, sender=NewsPost)
@@ -36,3 +50,20 @@ def event_notification(sender, instance, created, **kwargs):
             is_active=True,
             created_by=instance.created_by,
         )
+
+
+def dashboard_date_moving(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        dashboard.remember_date(sender, instance, update_fields)
+
+
+def dashboard_data_changed(sender, instance, **kwargs):
+    """Mark the admin dashboard snapshot stale when one of its inputs changes"""
+    dashboard.data_changed(sender, instance)
+
+
+for model in DASHBOARD_MODELS:
+    uid = f'dashboard_{model._meta.label_lower}'
+    pre_save.connect(dashboard_date_moving, sender=model, dispatch_uid=uid)
+    post_save.connect(dashboard_data_changed, sender=model, dispatch_uid=uid)
+    post_delete.connect(dashboard_data_changed, sender=model, dispatch_uid=uid)
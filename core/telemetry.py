@@ -0,0 +1,292 @@
+"""
+Sampled resource telemetry for each worker process.
+
+A daemon thread samples the process every TELEMETRY_INTERVAL seconds:
+resident memory, CPU use since the previous sample, open file
+descriptors, threads, the age of the oldest open database connection and
+garbage collector counts. The latest sample rides along with the worker
+gauges core.metrics publishes on every flush, so /metrics and the system
+health page see every live worker. GC pauses are timed with a gc callback
+into a histogram.
+
+Requests never touch psutil. A sampled share of them
+(TELEMETRY_ALLOCATION_SAMPLE_RATE) records how many memory blocks the
+interpreter kept while serving it, plus the traced bytes while
+tracemalloc is running.
+
+tracemalloc is off by default. ``manage.py tracemalloc start`` sets a flag
+in the cache; each worker's sampler starts tracing when it sees the flag,
+dumps a snapshot to TELEMETRY_DIR every TRACEMALLOC_SNAPSHOT_INTERVAL
+seconds and stops once the flag expires or is cleared. ``manage.py
+tracemalloc report`` compares each worker's first and latest snapshots.
+"""
+import gc
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACE_KEY = 'telemetry:tracemalloc'
+SNAPSHOT_PREFIX = 'tracemalloc-'
+
+_latest = {}
+_previous_cpu = None
+_process = None
+_process_pid = None
+_sampler_pid = None
+_sampler_lock = threading.Lock()
+_trace = {'started': None, 'snapshot_at': 0.0}
+
+_connections = weakref.WeakKeyDictionary()
+_connections_lock = threading.Lock()
+_gc_local = threading.local()
+
+
+def _interval():
+    return getattr(settings, 'TELEMETRY_INTERVAL', 10)
+
+
+def _snapshot_dir():
+    return Path(getattr(settings, 'TELEMETRY_DIR', Path(settings.BASE_DIR) / 'logs' / 'telemetry'))
+
+
+def _psutil_process():
+    """psutil handle for this process, created once per pid (None without psutil)"""
+    global _process, _process_pid
+    if _process_pid != os.getpid():
+        try:
+            import psutil
+            _process = psutil.Process()
+        except Exception:
+            _process = None
+        _process_pid = os.getpid()
+    return _process
+
+
+def _connection_opened(sender, connection, **kwargs):
+    with _connections_lock:
+        _connections[connection] = time.monotonic()
+
+
+connection_created.connect(_connection_opened, dispatch_uid='telemetry_connection_opened')
+
+
+def connection_ages(now=None):
+    """Seconds since each database connection of this process that is still open was opened"""
+    now = time.monotonic() if now is None else now
+    with _connections_lock:
+        opened = list(_connections.items())
+    return [now - started for wrapper, started in opened if wrapper.connection is not None]
+
+
+def _gc_callback(phase, info):
+    if phase == 'start':
+        _gc_local.started = time.perf_counter()
+        return
+    started = getattr(_gc_local, 'started', None)
+    if started is not None:
+        _gc_local.started = None
+        metrics.registry.observe(metrics.GC_PAUSE, (str(info['generation']),), time.perf_counter() - started)
+
+
+def sample():
+    """Take one resource sample of this process"""
+    global _previous_cpu
+    ages = connection_ages()
+    stats = gc.get_stats()
+    state = {
+        'sampled_at': time.time(),
+        'threads': threading.active_count(),
+        'db_connections': len(ages),
+        'db_connection_age': round(max(ages), 1) if ages else None,
+        'gc_counts': gc.get_count(),
+        'gc_collections': [generation['collections'] for generation in stats],
+        'gc_collected': sum(generation['collected'] for generation in stats),
+        'gc_uncollectable': sum(generation['uncollectable'] for generation in stats),
+        'rss': None,
+        'cpu_percent': None,
+        'open_fds': None,
+        'tracing': tracemalloc.is_tracing(),
+    }
+    process = _psutil_process()
+    if process is not None:
+        try:
+            with process.oneshot():
+                state['rss'] = process.memory_info().rss
+                cpu = process.cpu_times()
+                if hasattr(process, 'num_fds'):
+                    state['open_fds'] = process.num_fds()
+            cpu_seconds = cpu.user + cpu.system
+            wall = time.monotonic()
+            if _previous_cpu is not None and wall > _previous_cpu[1]:
+                state['cpu_percent'] = round((cpu_seconds - _previous_cpu[0]) / (wall - _previous_cpu[1]) * 100, 1)
+            _previous_cpu = (cpu_seconds, wall)
+        except Exception as e:
+            logger.debug(f"psutil sample failed: {e}")
+    if state['tracing']:
+        state['traced_bytes'], state['traced_peak'] = tracemalloc.get_traced_memory()
+    return state
+
+
+def latest():
+    """The most recent sample, taken now if the sampler has not run yet"""
+    global _latest
+    if not _latest or _latest.get('pid') != os.getpid():
+        _latest = {'pid': os.getpid(), **sample()}
+    return _latest
+
+
+# tracemalloc on demand
+
+def request_tracing(minutes=10, frames=10):
+    """Ask every worker to trace allocations for the next ``minutes``"""
+    cache.set(TRACE_KEY, {'frames': frames, 'requested_at': time.time()}, int(minutes * 60))
+
+
+def cancel_tracing():
+    cache.delete(TRACE_KEY)
+
+
+def tracing_requested():
+    try:
+        return cache.get(TRACE_KEY)
+    except Exception:
+        return None
+
+
+def save_snapshot():
+    """Dump a tracemalloc snapshot of this process; returns its path"""
+    directory = _snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+    path = directory / f'{SNAPSHOT_PREFIX}{os.getpid()}-{time.time_ns()}.snap'
+    snapshot.dump(str(path))
+    keep = getattr(settings, 'TRACEMALLOC_KEEP', 20)
+    saved = snapshots(os.getpid())
+    # Keep the first snapshot as the baseline for comparisons
+    for old in saved[1:-(keep - 1)] if len(saved) > keep else []:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def snapshots(pid=None):
+    """Saved snapshot files, oldest first, grouped per worker when ``pid`` is None"""
+    directory = _snapshot_dir()
+    if not directory.is_dir():
+        return {} if pid is None else []
+    grouped = {}
+    for path in directory.glob(f'{SNAPSHOT_PREFIX}*.snap'):
+        owner, stamp = path.stem[len(SNAPSHOT_PREFIX):].split('-')
+        grouped.setdefault(int(owner), []).append((int(stamp), path))
+    grouped = {owner: [path for _, path in sorted(paths)] for owner, paths in grouped.items()}
+    return grouped if pid is None else grouped.get(pid, [])
+
+
+def compare_snapshots(first, last, limit=15, key_type='lineno'):
+    """Largest allocation growth between two saved snapshots"""
+    before = tracemalloc.Snapshot.load(str(first))
+    after = tracemalloc.Snapshot.load(str(last))
+    return after.compare_to(before, key_type)[:limit]
+
+
+def _trace_tick(now):
+    wanted = tracing_requested()
+    if wanted and not tracemalloc.is_tracing():
+        tracemalloc.start(wanted.get('frames', 10))
+        _trace['started'] = now
+        _trace['snapshot_at'] = 0.0
+        logger.info(f"tracemalloc started in worker {os.getpid()}")
+    elif not wanted and _trace['started'] is not None:
+        if tracemalloc.is_tracing():
+            save_snapshot()
+            tracemalloc.stop()
+        _trace['started'] = None
+        logger.info(f"tracemalloc stopped in worker {os.getpid()}")
+        return
+    if _trace['started'] is not None and now - _trace['snapshot_at'] >= getattr(
+        settings, 'TRACEMALLOC_SNAPSHOT_INTERVAL', 60
+    ):
+        _trace['snapshot_at'] = now
+        save_snapshot()
+
+
+def tick():
+    """One sampler round: refresh the latest sample and follow tracing requests"""
+    global _latest
+    _trace_tick(time.monotonic())
+    _latest = {'pid': os.getpid(), **sample()}
+
+
+def _sample_forever(interval):
+    while True:
+        try:
+            tick()
+        except Exception as e:
+            logger.error(f"Worker telemetry sample failed: {e}")
+        time.sleep(interval)
+
+
+def ensure_sampler():
+    """Start this process's sampler thread once (again after a fork); an interval of 0 disables it"""
+    global _sampler_pid
+    if _sampler_pid == os.getpid():
+        return
+    with _sampler_lock:
+        interval = _interval()
+        if _sampler_pid == os.getpid() or not interval:
+            return
+        if _gc_callback not in gc.callbacks:
+            gc.callbacks.append(_gc_callback)
+        threading.Thread(target=_sample_forever, args=(interval,), name='worker-telemetry', daemon=True).start()
+        _sampler_pid = os.getpid()
+
+
+# Per-request allocations, for a sampled share of requests
+
+class AllocationTracker:
+    """
+    Memory blocks (and traced bytes, while tracemalloc runs) kept by the
+    interpreter between start and stop. Process-wide, so exact for sync
+    workers and approximate when threads serve requests concurrently.
+    """
+
+    def __init__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    def stop(self):
+        blocks = sys.getallocatedblocks() - self.blocks
+        traced = None
+        if self.traced is not None and tracemalloc.is_tracing():
+            traced = tracemalloc.get_traced_memory()[0] - self.traced
+        return blocks, traced
+
+
+def sample_request():
+    rate = getattr(settings, 'TELEMETRY_ALLOCATION_SAMPLE_RATE', 0.01)
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def record_allocations(route, blocks, traced):
+    metrics.registry.increment(metrics.ALLOCATION_SAMPLES, (route,))
+    if blocks > 0:
+        metrics.registry.increment(metrics.ALLOCATED_BLOCKS, (route,), blocks)
+    if traced is not None and traced > 0:
+        metrics.registry.increment(metrics.TRACED_BYTES, (route,), traced)
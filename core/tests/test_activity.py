@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import activity
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'activity-tests'}}
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM, ACTIVITY_FLUSH_INTERVAL=3600)
+class LastSeenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        activity._recent.clear()
+        activity.flush()
+        self.addCleanup(cache.clear)
+
+    def test_requests_are_throttled_and_flushed_in_one_update(self):
+        users = [User.objects.create_user(username=f'seen_{n}', password='pass12345') for n in range(3)]
+        for user in users:
+            self.assertTrue(activity.touch(user.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(activity.touch(users[0].pk))
+
+        # Another worker that has not seen the user loses the cache claim
+        activity._recent.clear()
+        self.assertFalse(activity.touch(users[0].pk))
+
+        self.assertIsNone(User.objects.get(pk=users[0].pk).last_seen)
+        self.assertIsNotNone(activity.last_seen(users[0]))
+        with self.assertNumQueries(1):
+            self.assertEqual(activity.flush(), 3)
+        self.assertEqual(User.objects.filter(last_seen__isnull=False).count(), 3)
+
+    def test_requests_never_flush_and_the_flusher_hook_does(self):
+        user = User.objects.create_user(username='seen_flusher', password='pass12345')
+        activity._last_flush = float('-inf')
+        with self.assertNumQueries(0):
+            activity.touch(user.pk)
+        self.assertIn(user.pk, activity._pending)
+
+        with override_settings(ACTIVITY_FLUSH_INTERVAL=0):
+            self.assertEqual(activity.flush_if_due(), 1)
+        self.assertIsNotNone(User.objects.get(pk=user.pk).last_seen)
+        # Not due again until the interval has passed
+        activity._pending[user.pk] = timezone.now()
+        self.assertEqual(activity.flush_if_due(), 0)
+
+    def test_admin_dashboard_shows_online_count(self):
+        admin = User.objects.create_user(username='seen_admin', password='pass12345', role='admin')
+        User.objects.create_user(username='seen_student', password='pass12345', last_seen=timezone.now())
+        User.objects.create_user(
+            username='seen_earlier', password='pass12345', last_seen=timezone.now() - timedelta(hours=1)
+        )
+        self.client.force_login(admin)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['online_now'], {'total': 1, 'by_role': {'student': 1}})
+        self.assertContains(response, '1 online now')
+        self.assertIn(admin.pk, activity._pending)
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting import aging
+from accounting.models import TuitionFee, AgingSnapshot
+from results.models import StudentClass
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class ReceivablesAgingTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        jss1 = StudentClass.objects.create(name="JSS 1A", level="JSS1")
+        jss2 = StudentClass.objects.create(name="JSS 2A", level="JSS2")
+        self.ada = self.make_student("aging_ada", "GTS/A/001", jss1)
+        self.bola = self.make_student("aging_bola", "GTS/A/002", jss2)
+
+        self.make_fee(self.ada, "2024/2025", 10, "10000")        # not yet due
+        self.make_fee(self.ada, "2024/2025", -5, "20000", "5000")  # 0-30
+        self.make_fee(self.ada, "2023/2024", -45, "30000")       # 31-60
+        self.make_fee(self.bola, "2023/2024", -75, "40000")      # 61-90
+        self.make_fee(self.bola, "2023/2024", -200, "50000")     # 90+
+        self.make_fee(self.bola, "2023/2024", -200, "9000", "9000")  # paid, excluded
+
+    def make_student(self, username, admission_number, student_class):
+        user = User.objects.create_user(
+            username=username, password="pass12345", role="student", first_name=username.split("_")[1].title()
+        )
+        return StudentProfile.objects.create(
+            user=user, admission_number=admission_number, date_of_birth=date(2010, 1, 1), current_class=student_class
+        )
+
+    def make_fee(self, student, session, due_in_days, amount_due, amount_paid="0"):
+        return TuitionFee.objects.create(
+            student=student, session=session, term="First", amount_due=Decimal(amount_due),
+            amount_paid=Decimal(amount_paid), due_date=self.today + timedelta(days=due_in_days),
+        )
+
+    def test_summary_buckets(self):
+        with self.assertNumQueries(1):
+            summary = aging.aging_summary(self.today)
+        self.assertEqual(summary["current"], Decimal("10000"))
+        self.assertEqual(summary["days_0_30"], Decimal("15000"))
+        self.assertEqual(summary["days_31_60"], Decimal("30000"))
+        self.assertEqual(summary["days_61_90"], Decimal("40000"))
+        self.assertEqual(summary["days_over_90"], Decimal("50000"))
+        self.assertEqual(summary["total"], Decimal("145000"))
+        self.assertEqual(summary["fee_count"], 5)
+
+    def test_each_dimension_is_one_query(self):
+        for dimension in ("class", "session", "student"):
+            with self.assertNumQueries(1):
+                rows = aging.aging_by(dimension, self.today)
+            self.assertEqual(sum(row["total"] for row in rows), Decimal("145000"))
+
+        by_class = {row["label"]: row for row in aging.aging_by("class", self.today)}
+        self.assertEqual(by_class["JSS 1A"]["days_31_60"], Decimal("30000"))
+        self.assertEqual(by_class["JSS 2A"]["days_over_90"], Decimal("50000"))
+
+        top = aging.aging_by("student", self.today, limit=1)[0]
+        self.assertEqual(top["key"], str(self.bola.pk))
+        self.assertIn("GTS/A/002", top["label"])
+
+    def test_snapshot_and_comparison(self):
+        rows = aging.take_snapshot(self.today - timedelta(days=30))
+        self.assertEqual(rows, 1 + 2 + 2 + 2)
+        self.assertEqual(aging.take_snapshot(self.today - timedelta(days=30)), rows)
+        self.assertEqual(AgingSnapshot.objects.count(), rows)
+
+        previous = aging.snapshot_on_or_before(self.today - timedelta(days=10))
+        self.assertEqual(previous[""].total, Decimal("145000"))
+        self.assertEqual(len(aging.aging_trend(days=60)), 1)
+
+    def test_report_and_drilldown_views(self):
+        accountant = User.objects.create_user(username="aging_accountant", password="pass12345", role="accountant")
+        self.client.force_login(accountant)
+
+        response = self.client.get(reverse("accounting:aging_report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["summary"]["total"], Decimal("145000"))
+
+        response = self.client.get(reverse("accounting:aging_report"), {"compare": "99999999999"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["compare_days"], 3650)
+
+        response = self.client.get(reverse("accounting:student_aging", args=[self.ada.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [fee.aging_bucket for fee in response.context["fees"]], ["days_31_60", "days_0_30", "current"]
+        )
@@ -0,0 +1,81 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from academics.models import Announcement
+from core import announcements
+from core.models import UserNotification
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'announcement-tests'}}
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class AnnouncementReadStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.old = Announcement.objects.create(title='Before', message='x', audience='all')
+        self.student = User.objects.create_user(username='ann_student', password='pass12345', role='student')
+        self.staff = User.objects.create_user(username='ann_staff', password='pass12345', role='staff')
+
+    def post(self, audience, title):
+        return Announcement.objects.create(title=title, message='x', audience=audience)
+
+    def test_announcements_are_not_copied_per_user(self):
+        self.post('all', 'Sports day')
+        self.assertFalse(UserNotification.objects.exists())
+
+    def test_audience_and_join_date_decide_what_is_unread(self):
+        everyone = self.post('all', 'Sports day')
+        students = self.post('students', 'Exam timetable')
+        staff = self.post('staff', 'Staff meeting')
+
+        self.assertEqual(announcements.unread_ids(self.student), {everyone.id, students.id})
+        self.assertEqual(announcements.unread_ids(self.staff), {everyone.id, staff.id})
+        self.assertNotIn(self.old.id, announcements.unread_ids(self.student))
+
+    def test_out_of_order_reads_are_compacted_into_the_watermark(self):
+        first, second, third = (self.post('students', title) for title in ('One', 'Two', 'Three'))
+
+        self.assertTrue(announcements.mark_read(self.student, third.id))
+        state = announcements.state(self.student)
+        self.assertEqual((state.watermark, state.read_ids), (first.id - 1, [third.id]))
+
+        self.assertTrue(announcements.mark_read(self.student, first.id))
+        self.assertEqual((state.watermark, state.read_ids), (first.id, [third.id]))
+        self.assertFalse(announcements.mark_read(self.student, first.id))
+
+        self.assertEqual(announcements.unread_ids(self.student), {second.id})
+        self.assertEqual(announcements.mark_all_read(self.student), 1)
+        state.refresh_from_db()
+        self.assertEqual((state.watermark, state.read_ids), (third.id, []))
+        self.assertEqual(announcements.unread_count(self.student), 0)
+
+    def test_accountants_read_staff_announcements(self):
+        accountant = User.objects.create_user(username='ann_accountant', password='pass12345', role='accountant')
+        staff = self.post('staff', 'Staff meeting')
+        self.assertEqual(announcements.unread_ids(accountant), {staff.id})
+
+    def test_other_audiences_cannot_be_marked(self):
+        staff_only = self.post('staff', 'Staff meeting')
+        self.assertFalse(announcements.mark_read(self.student, staff_only.id))
+
+    def test_notification_views_count_and_mark_announcements(self):
+        UserNotification.objects.create(user=self.student, title='Fee receipt', message='Paid')
+        notice = self.post('students', 'Exam timetable')
+        self.client.force_login(self.student)
+
+        self.assertEqual(self.client.get(reverse('notification_unread_count')).json()['count'], 2)
+        response = self.client.get(reverse('notifications'))
+        self.assertContains(response, reverse('mark_announcement_read', args=[notice.id]))
+        self.assertEqual(response.context['unread_announcements'], 1)
+
+        self.client.post(reverse('mark_announcement_read', args=[notice.id]))
+        self.assertEqual(self.client.get(reverse('notification_unread_count')).json()['count'], 1)
+        response = self.client.get(reverse('notifications'))
+        self.assertNotContains(response, reverse('mark_announcement_read', args=[notice.id]))
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import attendance
+from results.models import AcademicSession, AcademicTerm, ResultSheet, StudentClass
+from students import attendance_bits
+from students.models import StudentProfile, AttendanceRecord, TermAttendance, SchoolDayCalendar
+
+User = get_user_model()
+
+START = date(2025, 1, 6)
+
+
+@pytest.mark.unit
+class AttendanceBitmapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = AcademicSession.objects.create(
+            name="2024/2025", start_date=date(2024, 9, 9), end_date=date(2025, 7, 18)
+        )
+        cls.term = AcademicTerm.objects.create(
+            session=cls.session, name="second", start_date=START, end_date=date(2025, 4, 4)
+        )
+        cls.jss1 = StudentClass.objects.create(name="JSS 1A", level="JSS1")
+        cls.students = []
+        for number in range(3):
+            user = User.objects.create_user(
+                username=f"bits_{number}", password="pass12345", role="student", last_name=f"Student{number}"
+            )
+            cls.students.append(StudentProfile.objects.create(
+                user=user, admission_number=f"GTS/B/{number}", date_of_birth=date(2010, 1, 1), current_class=cls.jss1,
+            ))
+
+    def mark(self, offset, student, present):
+        return AttendanceRecord.objects.update_or_create(
+            student=student, date=START + timedelta(days=offset), defaults={"present": present}
+        )[0]
+
+    def test_single_saves_and_deletes_update_bitmaps(self):
+        ada = self.students[0]
+        for offset, present in [(0, True), (1, True), (2, False), (3, True), (4, True), (7, True)]:
+            self.mark(offset, ada, present)
+
+        summary = attendance_bits.student_term_summary(ada, self.term)
+        self.assertEqual((summary["days_present"], summary["days_absent"], summary["school_days"]), (5, 1, 6))
+        self.assertEqual((summary["current_streak"], summary["longest_streak"]), (3, 3))
+        self.assertEqual(summary["percent"], 83.3)
+
+        # Deleting the absence un-marks the day and drops it from the calendar
+        AttendanceRecord.objects.get(student=ada, date=START + timedelta(days=2)).delete()
+        summary = attendance_bits.student_term_summary(ada, self.term)
+        self.assertEqual((summary["days_absent"], summary["school_days"], summary["longest_streak"]), (0, 5, 5))
+
+    def test_bulk_marks_and_class_report(self):
+        ids = [s.pk for s in self.students]
+        attendance.mark_students(ids, START, present=True)
+        attendance.mark_students(ids[:2], START + timedelta(days=1), present=True)
+        attendance.mark_students(ids[2:], START + timedelta(days=1), present=False)
+
+        with self.assertNumQueries(2):
+            report = attendance_bits.class_term_report(self.jss1, self.term)
+        self.assertEqual(report["school_days"], 2)
+        self.assertEqual(report["daily_present"], [(START, 3), (START + timedelta(days=1), 2)])
+        self.assertEqual([row["days_present"] for row in report["students"]], [2, 2, 1])
+
+        # Records outside any term leave the bitmaps alone
+        attendance.mark_students(ids, date(2025, 6, 1), present=True)
+        self.assertEqual(SchoolDayCalendar.objects.get(term=self.term).school_days, 2)
+
+    def test_rebuild_matches_incremental_and_fills_result_sheet(self):
+        bola = self.students[1]
+        for offset, present in [(0, True), (1, False), (8, True)]:
+            self.mark(offset, bola, present)
+        incremental = TermAttendance.objects.get(student=bola, term=self.term)
+
+        TermAttendance.objects.all().delete()
+        attendance_bits.rebuild_term(self.term)
+        rebuilt = TermAttendance.objects.get(student=bola, term=self.term)
+        self.assertEqual(
+            (rebuilt.marked_bits, rebuilt.present_bits), (incremental.marked_bits, incremental.present_bits)
+        )
+
+        sheet = ResultSheet.objects.create(student=bola, session=self.session, term=self.term, student_class=self.jss1)
+        sheet.compile_result_sheet()
+        sheet.refresh_from_db()
+        self.assertEqual(
+            (sheet.total_days_present, sheet.total_days_absent, sheet.total_school_days), (2, 1, 3)
+        )
+
+    def test_result_sheet_keeps_attendance_entered_by_hand(self):
+        sheet = ResultSheet.objects.create(
+            student=self.students[0], session=self.session, term=self.term, student_class=self.jss1,
+            total_days_present=50, total_days_absent=4, total_school_days=54,
+        )
+        sheet.compile_result_sheet()
+        sheet.refresh_from_db()
+        self.assertEqual(
+            (sheet.total_days_present, sheet.total_days_absent, sheet.total_school_days), (50, 4, 54)
+        )
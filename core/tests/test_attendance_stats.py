@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import attendance
+from staff.models import StaffProfile, StaffAttendance
+from students.models import StudentProfile, AttendanceRecord
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'attendance-stats-tests'}}
+
+
+@pytest.mark.unit
+class AttendanceStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        user = User.objects.create_user(username="stats_student", password="pass12345", role="student")
+        cls.student = StudentProfile.objects.create(
+            user=user, admission_number="GTS/S/001", date_of_birth=date(2010, 1, 1)
+        )
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(student=cls.student, date=cls.today - timedelta(days=offset), present=offset % 4 != 0)
+            for offset in range(60)
+        )
+        teacher = User.objects.create_user(username="stats_teacher", password="pass12345", role="staff")
+        staff = StaffProfile.objects.create(user=teacher, staff_id="STF/S/1", position="teacher", department="arts")
+        StaffAttendance.objects.create(staff=staff, date=cls.today, present=True)
+        cls.admin = User.objects.create_user(username="stats_admin", password="pass12345", role="admin")
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            summary = attendance.attendance_summary(AttendanceRecord.objects.all())
+        self.assertEqual(summary, {"total": 60, "present": 45, "absent": 15, "percent": 75.0})
+
+    def test_admin_overview_pages_records(self):
+        self.client.force_login(self.admin)
+        url = reverse("attendance")
+        response = self.client.get(url)
+        self.assertEqual(response.context["student_total"], 60)
+        self.assertEqual(response.context["staff_present"], 1)
+        self.assertEqual(response.context["students_today_present"], 0)  # offset 0 is an absence
+        first = response.context["student_records"]
+        self.assertEqual(len(first), attendance.RECORDS_PER_PAGE)
+        self.assertEqual(first.object_list[0].date, self.today)
+
+        response = self.client.get(url, {"s_cursor": first.next_cursor, "s_page": 2})
+        second = response.context["student_records"]
+        self.assertEqual(len(second), 10)
+        self.assertEqual(second.number, 2)
+        self.assertEqual(second.object_list[-1].date, self.today - timedelta(days=59))
+
+    def test_student_pages_filter_and_ignore_bad_dates(self):
+        self.client.force_login(self.student.user)
+        since = (self.today - timedelta(days=9)).isoformat()
+
+        for url in (reverse("attendance"), reverse("students:attendance")):
+            response = self.client.get(url, {"start_date": since, "end_date": "not-a-date"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["total_days"], 10)
+            self.assertEqual(response.context["days_absent"], 3)
+            self.assertEqual(response.context["end_date"], "")
+            self.assertEqual(response.context["filter_query"], f"start_date={since}")
+
+    @override_settings(CACHES=LOCMEM)
+    def test_today_snapshot_is_cached_until_marking(self):
+        cache.clear()
+        self.assertEqual(attendance.today_snapshot(self.today)["students_present"], 0)
+        with self.assertNumQueries(0):
+            attendance.today_snapshot(self.today)
+
+        attendance.mark_students([self.student.pk], self.today, present=True)
+        self.assertEqual(attendance.today_snapshot(self.today)["students_present"], 1)
+        cache.clear()
@@ -0,0 +1,120 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import attendance
+from results.models import StudentClass
+from staff.models import StaffProfile, StaffAttendance
+from students.models import StudentProfile, AttendanceRecord
+
+User = get_user_model()
+
+DAY = date(2025, 3, 4)
+
+
+@pytest.mark.unit
+class BulkAttendanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jss1 = StudentClass.objects.create(name="JSS 1A", level="JSS1")
+        cls.students = []
+        for number in range(30):
+            user = User.objects.create_user(username=f"att_{number}", password="pass12345", role="student")
+            cls.students.append(StudentProfile.objects.create(
+                user=user, admission_number=f"GTS/T/{number:03d}", date_of_birth=date(2010, 1, 1),
+                current_class=cls.jss1 if number < 10 else None,
+            ))
+
+    def test_marking_cost_does_not_grow_with_rows(self):
+        def queries(students):
+            with CaptureQueriesContext(connection) as ctx:
+                attendance.mark_students([s.pk for s in students], DAY, present=True)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(self.students[:3]), queries(self.students))
+        self.assertEqual(AttendanceRecord.objects.filter(date=DAY).count(), 30)
+
+    def test_remarking_updates_in_place_and_skips_bad_ids(self):
+        ids = [s.pk for s in self.students[:5]]
+        attendance.mark_students(ids, DAY, present=True)
+        count = attendance.mark_students(ids[:2] + ["junk", 999999], DAY, present=False)
+
+        self.assertEqual(count, 2)
+        records = dict(AttendanceRecord.objects.filter(date=DAY).values_list("student_id", "present"))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(sorted(pk for pk, present in records.items() if not present), sorted(ids[:2]))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttendanceRecord.objects.create(student=self.students[0], date=DAY)
+
+    def test_upsert_names_no_conflict_target_on_mysql(self):
+        teacher = User.objects.create_user(username="att_mysql", password="pass12345", role="staff")
+        staff = StaffProfile.objects.create(user=teacher, staff_id="STF/T/2", position="teacher", department="science")
+        with (
+            mock.patch.object(connection.features, "supports_update_conflicts_with_target", False),
+            mock.patch.object(StaffAttendance.objects, "bulk_create") as bulk_create,
+        ):
+            attendance.mark_staff([staff.pk], DAY, present=True)
+        options = bulk_create.call_args.kwargs
+        self.assertTrue(options["update_conflicts"])
+        self.assertNotIn("unique_fields", options)
+
+    def test_staff_remarking_without_upsert_support(self):
+        teacher = User.objects.create_user(username="att_oracle", password="pass12345", role="staff")
+        staff = StaffProfile.objects.create(user=teacher, staff_id="STF/T/3", position="teacher", department="science")
+        with mock.patch.object(connection.features, "supports_update_conflicts", False):
+            attendance.mark_staff([staff.pk], DAY, present=True)
+            attendance.mark_staff([staff.pk], DAY, present=False)
+        self.assertFalse(StaffAttendance.objects.get(staff=staff, date=DAY).present)
+
+    def test_staff_marking_keeps_first_marker(self):
+        admin = User.objects.create_user(username="att_admin", password="pass12345", role="admin")
+        other = User.objects.create_user(username="att_other", password="pass12345", role="admin")
+        teacher = User.objects.create_user(username="att_teacher", password="pass12345", role="staff")
+        staff = StaffProfile.objects.create(user=teacher, staff_id="STF/T/1", position="teacher", department="science")
+
+        attendance.mark_staff([staff.pk], DAY, present=True, marked_by=admin)
+        attendance.mark_staff([staff.pk], DAY, present=False, marked_by=other)
+        record = StaffAttendance.objects.get(staff=staff, date=DAY)
+        self.assertFalse(record.present)
+        self.assertEqual(record.created_by, admin)
+
+    def test_class_register_marks_everyone_in_class(self):
+        teacher = User.objects.create_user(username="att_staff", password="pass12345", role="staff")
+        self.jss1.class_teacher = StaffProfile.objects.create(
+            user=teacher, staff_id="STF/T/4", position="teacher", department="arts"
+        )
+        self.jss1.save()
+        self.client.force_login(teacher)
+        url = reverse("class_register")
+        present = [s.pk for s in self.students[:7]]
+
+        response = self.client.post(url, {
+            "class": self.jss1.pk, "date": DAY.isoformat(),
+            "present_ids": present + [self.students[20].pk],  # not in the class
+        })
+        self.assertEqual(response.status_code, 302)
+        records = dict(AttendanceRecord.objects.filter(date=DAY).values_list("student_id", "present"))
+        self.assertEqual(len(records), 10)
+        self.assertEqual(sum(records.values()), 7)
+
+        response = self.client.get(url, {"class": self.jss1.pk, "date": DAY.isoformat()})
+        marks = [student.present for student in response.context["register"]]
+        self.assertEqual(sorted(marks), [False] * 3 + [True] * 7)
+
+    def test_class_register_is_limited_to_the_class_teacher(self):
+        other = User.objects.create_user(username="att_other_staff", password="pass12345", role="staff")
+        self.client.force_login(other)
+        url = reverse("class_register")
+
+        self.client.post(url, {"class": self.jss1.pk, "date": DAY.isoformat(), "present_ids": []})
+        self.assertFalse(AttendanceRecord.objects.filter(date=DAY).exists())
+        response = self.client.get(url, {"class": self.jss1.pk})
+        self.assertIsNone(response.context["student_class"])
+        self.assertNotIn(self.jss1, response.context["classes"])
@@ -0,0 +1,94 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import caching
+from core.attendance import mark_students
+from core.models import NewsPost
+from students.models import StudentProfile
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'caching-tests'}}
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_public_pages_are_cached_until_the_table_changes(self):
+        NewsPost.objects.create(title='Sports day', content='Report')
+        first = self.client.get(reverse('news_list'))
+        self.assertContains(first, 'Sports day')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('news_list')).content, first.content)
+
+        NewsPost.objects.create(title='Science fair', content='Report')
+        self.assertContains(self.client.get(reverse('news_list')), 'Science fair')
+
+    def test_pages_filtered_on_the_clock_expire_quickly(self):
+        from core import views
+
+        with mock.patch.object(caching.cache, 'set', wraps=caching.cache.set) as cache_set:
+            self.client.get(reverse('events_list'))
+            self.client.get(reverse('news_list'))
+        timeouts = [call.args[2] for call in cache_set.call_args_list if call.args[0].startswith('page:')]
+        self.assertEqual(timeouts, [views.CLOCK_PAGE_TIMEOUT, caching.PAGE_TIMEOUT])
+
+    def test_signed_in_users_skip_the_public_cache(self):
+        user = User.objects.create_user(username='cache_staff', password='pass12345', role='staff')
+        self.client.get(reverse('about_us'))
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('about_us')), 'Logout')
+
+    def test_student_pages_are_cached_per_user(self):
+        students = []
+        for number in range(2):
+            user = User.objects.create_user(username=f'cache_student_{number}', password='pass12345', role='student')
+            students.append(StudentProfile.objects.create(
+                user=user, admission_number=f'GTS/K/{number}', date_of_birth=date(2010, 1, 1),
+            ))
+
+        self.client.force_login(students[0].user)
+        url = reverse('students:attendance')
+        first = self.client.get(url)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertEqual(first.context['total_days'], 0)
+        self.assertIsNone(self.client.get(url).context)  # served from the cache, nothing rendered
+
+        self.client.force_login(students[1].user)
+        self.assertIsNotNone(self.client.get(url).context)
+
+        self.client.force_login(students[0].user)
+        mark_students([students[0].pk], date(2025, 1, 6), True)
+        self.assertEqual(self.client.get(url).context['total_days'], 1)
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_fragment_is_rebuilt_after_a_version_bump(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {'count': len(builds)}
+
+        for _ in range(2):
+            self.assertEqual(caching.cached_fragment('demo', 'staff', ('core.newspost',), build), {'count': 1})
+        self.assertEqual(caching.cached_fragment('demo', 'admin', ('core.newspost',), build), {'count': 2})
+
+        NewsPost.objects.create(title='Notice', content='Body')
+        self.assertEqual(caching.cached_fragment('demo', 'staff', ('core.newspost',), build), {'count': 3})
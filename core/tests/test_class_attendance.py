@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from core import attendance
+from results.models import AcademicSession, AcademicTerm, StudentClass
+from staff.models import StaffProfile
+from students import class_attendance
+from students.models import StudentProfile, AttendanceRecord, ClassAttendanceSummary
+
+User = get_user_model()
+
+START = date(2025, 1, 6)  # a Monday
+
+
+@pytest.mark.unit
+class ClassAttendanceSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        session = AcademicSession.objects.create(
+            name="2024/2025", start_date=date(2024, 9, 9), end_date=date(2025, 7, 18)
+        )
+        cls.term = AcademicTerm.objects.create(
+            session=session, name="second", start_date=START, end_date=date(2025, 4, 4)
+        )
+        teacher = User.objects.create_user(username="class_teacher", password="pass12345", role="staff")
+        cls.teacher = StaffProfile.objects.create(
+            user=teacher, staff_id="STF/C/1", position="teacher", department="arts"
+        )
+        cls.jss1 = StudentClass.objects.create(name="JSS 1A", level="JSS1", class_teacher=cls.teacher)
+        cls.jss2 = StudentClass.objects.create(name="JSS 2A", level="JSS2")
+        cls.students = []
+        for number, student_class in enumerate([cls.jss1, cls.jss1, cls.jss1, cls.jss2]):
+            user = User.objects.create_user(username=f"class_{number}", password="pass12345", role="student")
+            cls.students.append(StudentProfile.objects.create(
+                user=user, admission_number=f"GTS/C/{number}", date_of_birth=date(2010, 1, 1),
+                current_class=student_class,
+            ))
+        cls.admin = User.objects.create_user(username="class_admin", password="pass12345", role="admin")
+
+    def summary(self, student_class, day):
+        row = ClassAttendanceSummary.objects.filter(student_class=student_class, date=day).first()
+        return (row.present, row.absent) if row else None
+
+    def test_bulk_and_single_writes_keep_summaries_current(self):
+        ids = [s.pk for s in self.students]
+        attendance.mark_students(ids, START, present=True)
+        attendance.mark_students(ids[2:3], START, present=False)
+        self.assertEqual(self.summary(self.jss1, START), (2, 1))
+        self.assertEqual(self.summary(self.jss2, START), (1, 0))
+
+        AttendanceRecord.objects.filter(student=self.students[3], date=START).delete()
+        self.assertIsNone(self.summary(self.jss2, START))
+
+        AttendanceRecord.objects.create(student=self.students[0], date=START + timedelta(days=1), present=False)
+        self.assertEqual(self.summary(self.jss1, START + timedelta(days=1)), (0, 1))
+
+        incremental = sorted(ClassAttendanceSummary.objects.values_list('student_class', 'date', 'present', 'absent'))
+        class_attendance.rebuild()
+        rebuilt = sorted(ClassAttendanceSummary.objects.values_list('student_class', 'date', 'present', 'absent'))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_summaries_upsert_without_a_conflict_target(self):
+        AttendanceRecord.objects.create(student=self.students[0], date=START, present=True)
+        with (
+            mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False),
+            mock.patch.object(ClassAttendanceSummary.objects, 'bulk_create') as bulk_create,
+        ):
+            class_attendance.refresh_days(START, {self.jss1.pk})
+        options = bulk_create.call_args.kwargs
+        self.assertTrue(options['update_conflicts'])
+        self.assertNotIn('unique_fields', options)
+
+        with mock.patch.object(connection.features, 'supports_update_conflicts', False):
+            attendance.mark_students([s.pk for s in self.students], START, present=True)
+            attendance.mark_students([self.students[1].pk], START, present=False)
+        self.assertEqual(self.summary(self.jss1, START), (2, 1))
+        self.assertEqual(self.summary(self.jss2, START), (1, 0))
+
+    def test_heatmaps_read_only_summaries(self):
+        ids = [s.pk for s in self.students[:3]]
+        for offset in (0, 1, 7):
+            attendance.mark_students(ids, START + timedelta(days=offset), present=True)
+        attendance.mark_students(ids[:1], START + timedelta(days=7), present=False)
+
+        with self.assertNumQueries(1):
+            weekly = class_attendance.weekly_heatmap(self.jss1, START + timedelta(days=7), weeks=2)
+        self.assertEqual([week['week_of'] for week in weekly['weeks']], ['2025-01-06', '2025-01-13'])
+        self.assertEqual(weekly['weeks'][0]['days'][0]['rate'], 100.0)
+        self.assertIsNone(weekly['weeks'][0]['days'][2])
+        self.assertEqual(weekly['weeks'][1]['days'][0]['absent'], 1)
+
+        monthly = class_attendance.monthly_heatmap(self.jss1, START)
+        self.assertEqual(monthly['month'], 'January 2025')
+        self.assertIsNone(monthly['weeks'][0][0])  # 30 December
+        self.assertEqual((monthly['present'], monthly['absent']), (8, 1))
+
+    def test_overview_lists_rates_and_chronic_absentees(self):
+        chronic, regular = self.students[0], self.students[1]
+        for offset in range(12):
+            day = START + timedelta(days=offset)
+            attendance.mark_students([regular.pk], day, present=True)
+            attendance.mark_students([chronic.pk], day, present=offset % 3 != 0)
+
+        self.client.force_login(self.admin)
+        data = self.client.get(reverse('class_attendance_overview'), {'term': self.term.pk}).json()
+        self.assertEqual([row['class_name'] for row in data['classes']], ['JSS 1A'])
+        self.assertEqual(data['classes'][0]['rate'], 83.3)
+        self.assertEqual([row['student_id'] for row in data['chronic_absentees']], [chronic.pk])
+        self.assertEqual(data['chronic_absentees'][0]['days_absent'], 4)
+
+        response = self.client.get(
+            reverse('class_attendance_heatmap', args=[self.jss1.pk]), {'view': 'month', 'date': '2025-01-20'}
+        )
+        self.assertEqual(response.json()['month'], 'January 2025')
+
+    def test_class_teachers_only_see_their_classes(self):
+        self.client.force_login(self.teacher.user)
+        self.assertEqual(self.client.get(reverse('class_attendance_heatmap', args=[self.jss1.pk])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('class_attendance_heatmap', args=[self.jss2.pk])).status_code, 404)
+
+        self.client.force_login(self.students[0].user)
+        self.assertEqual(self.client.get(reverse('class_attendance_overview')).status_code, 403)
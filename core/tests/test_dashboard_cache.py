@@ -0,0 +1,85 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounting.models import TuitionFee, Payment, Expense
+from core import dashboard
+from core.periods import add_months
+from students.models import StudentProfile
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard-tests'}}
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class AdminDashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.last_month = add_months(self.today.replace(day=1), -1)
+        user = User.objects.create_user(username="dash_student", password="pass12345", role="student")
+        student = StudentProfile.objects.create(user=user, admission_number="GTS/D/001", date_of_birth=date(2010, 1, 1))
+        self.fee = TuitionFee.objects.create(
+            student=student, session="2024/2025", term="First", amount_due=Decimal("50000"),
+            due_date=self.today + timedelta(days=30),
+        )
+        Payment.objects.create(tuition_fee=self.fee, amount=Decimal("10000"), payment_date=self.last_month)
+        Expense.objects.create(description="Chalk", amount=Decimal("2500"), date=self.today, category="supplies")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_snapshot_is_served_from_cache(self):
+        context = dashboard.get_admin_dashboard_snapshot()
+        self.assertEqual(context['total_students'], 1)
+        self.assertEqual(context['students_with_outstanding'], 1)
+        self.assertEqual(context['monthly_expenses'], 2500.0)
+        chart = json.loads(context['chart_data'])
+        self.assertEqual(len(chart['months']), dashboard.CHART_MONTHS)
+        self.assertEqual(chart['revenue'][-2], 10000.0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.get_admin_dashboard_snapshot(), context)
+
+    def test_change_serves_stale_and_revalidates(self):
+        dashboard.get_admin_dashboard_snapshot()
+        Expense.objects.create(description="Diesel", amount=Decimal("7500"), date=self.today, category="utility")
+
+        with mock.patch.object(dashboard, 'refresh_in_background') as revalidate:
+            stale = dashboard.get_admin_dashboard_snapshot()
+        revalidate.assert_called_once()
+        self.assertEqual(stale['monthly_expenses'], 2500.0)
+
+        dashboard.refresh()
+        self.assertEqual(dashboard.get_admin_dashboard_snapshot()['monthly_expenses'], 10000.0)
+
+    def test_closed_months_are_frozen(self):
+        dashboard.chart_buckets(self.today)
+        # Only the current month is aggregated again: one query per table
+        with self.assertNumQueries(4):
+            buckets = dashboard.chart_buckets(self.today)
+        self.assertEqual(buckets[-2]['revenue'], 10000.0)
+
+        # A backdated payment drops the frozen bucket for its month
+        Payment.objects.create(tuition_fee=self.fee, amount=Decimal("5000"), payment_date=self.last_month)
+        self.assertEqual(dashboard.chart_buckets(self.today)[-2]['revenue'], 15000.0)
+
+    def test_moving_a_row_forgets_the_month_it_left(self):
+        two_months_ago = add_months(self.last_month, -1)
+        payment = Payment.objects.create(tuition_fee=self.fee, amount=Decimal("5000"), payment_date=two_months_ago)
+        buckets = dashboard.chart_buckets(self.today)
+        self.assertEqual((buckets[-3]['revenue'], buckets[-2]['revenue']), (5000.0, 10000.0))
+
+        payment.payment_date = self.last_month
+        payment.save()
+        buckets = dashboard.chart_buckets(self.today)
+        self.assertEqual((buckets[-3]['revenue'], buckets[-2]['revenue']), (0, 15000.0))
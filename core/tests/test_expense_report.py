@@ -0,0 +1,54 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.test import TestCase
+
+from accounting.models import Expense
+from accounting.report_utils import ReportGenerator
+
+
+@pytest.mark.unit
+class ExpenseReportTests(TestCase):
+    def setUp(self):
+        for day, amount, category in [
+            (date(2024, 1, 5), "1000", "supplies"),
+            (date(2024, 1, 20), "3000", "utility"),
+            (date(2024, 3, 2), "6000", "supplies"),
+            (date(2024, 3, 9), "500", "other"),
+            (date(2023, 12, 31), "9999", "supplies"),  # outside the range
+        ]:
+            Expense.objects.create(description=f"{category} {day}", amount=Decimal(amount), date=day, category=category)
+
+    def report(self):
+        return ReportGenerator(date(2024, 1, 1), date(2024, 3, 31), "Q1 2024").generate_expense_report()
+
+    def test_totals_and_categories(self):
+        report = self.report()
+
+        self.assertEqual(report["total_expenses"], 10500.00)
+        self.assertEqual(report["total_transactions"], 4)
+        self.assertEqual(report["largest_expense"], 6000.00)
+        self.assertEqual(report["average_transaction"], 2625.00)
+        by_category = {item["name"]: item for item in report["expenses_by_category"]}
+        self.assertEqual(by_category["Supplies"]["amount"], 7000.00)
+        self.assertEqual(by_category["Maintenance"]["amount"], 0.00)
+        self.assertEqual(report["expense_categories"]["utility"], 3000.00)
+
+    def test_monthly_trend_includes_empty_months(self):
+        trend = self.report()["monthly_trend"]
+
+        self.assertEqual([month["month_name"] for month in trend], ["January 2024", "February 2024", "March 2024"])
+        self.assertEqual([month["count"] for month in trend], [2, 0, 2])
+        self.assertEqual(trend[0]["average"], 2000.00)
+        self.assertEqual(trend[2]["total"], 6500.00)
+
+    def test_breakdowns_come_from_grouped_queries(self):
+        # Grouped totals, detail rows and top expenses, regardless of row count
+        with self.assertNumQueries(3):
+            report = self.report()
+
+        self.assertEqual(report["top_vendors"][0]["name"], "Unknown")
+        self.assertEqual(report["top_vendors"][0]["count"], 4)
+        self.assertEqual(report["top_expenses"][0]["amount"], 6000.0)
+        self.assertEqual(report["expenses_shown"], 4)
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import TuitionFee
+from core import fanout
+from core.models import UserNotification
+from results.models import AcademicSession, AcademicTerm, ResultSheet, StudentClass
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+@override_settings(NOTIFICATION_FANOUT_BACKGROUND=False)
+class NotificationFanoutTests(TestCase):
+    def setUp(self):
+        self.jss1 = StudentClass.objects.create(name="JSS 1A", level="JSS1")
+        self.jss2 = StudentClass.objects.create(name="JSS 2A", level="JSS2")
+        self.students = [self.make_student(i, self.jss1 if i < 5 else self.jss2) for i in range(7)]
+        User.objects.create_user(username='fanout_staff', password='pass12345', role='staff')
+
+    def make_student(self, number, student_class):
+        user = User.objects.create_user(username=f'fanout_{number}', password='pass12345', role='student')
+        return StudentProfile.objects.create(
+            user=user, admission_number=f'GTS/F/{number:03d}', date_of_birth=date(2010, 1, 1),
+            current_class=student_class,
+        )
+
+    def owe(self, student, paid='0', session='2024/2025'):
+        TuitionFee.objects.create(
+            student=student, session=session, term='First', amount_due=Decimal('50000'), amount_paid=Decimal(paid),
+            due_date=timezone.now().date() + timedelta(days=30),
+        )
+
+    @mock.patch.object(fanout, 'BATCH_SIZE', 2)
+    def test_class_fanout_is_written_in_chunks(self):
+        item = fanout.queue('Results out', 'Check your result sheet', 'class', self.jss1.pk)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.total, item.sent), ('done', 5, 5))
+        self.assertEqual(item.last_recipient, self.students[4].user_id)
+        self.assertEqual(
+            set(UserNotification.objects.values_list('user_id', flat=True)),
+            {student.user_id for student in self.students[:5]},
+        )
+
+    def test_debtors_are_notified_once(self):
+        self.owe(self.students[0])
+        self.owe(self.students[0], paid='20000', session='2023/2024')
+        self.owe(self.students[1], paid='50000')
+        self.owe(self.students[6], paid='20000')
+
+        fanout.queue('Fee reminder', 'Please pay', 'debtors')
+        self.assertEqual(
+            sorted(UserNotification.objects.values_list('user_id', flat=True)),
+            [self.students[0].user_id, self.students[6].user_id],
+        )
+        UserNotification.objects.all().delete()
+        fanout.queue('Fee reminder', 'Please pay', 'debtors', '2023/2024')
+        self.assertEqual(list(UserNotification.objects.values_list('user_id', flat=True)), [self.students[0].user_id])
+
+    @mock.patch.object(fanout, 'BATCH_SIZE', 3)
+    def test_interrupted_fanout_resumes_after_last_recipient(self):
+        real_write = fanout._write_chunk
+        calls = []
+
+        def failing_write(item, user_ids):
+            calls.append(user_ids)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            real_write(item, user_ids)
+
+        with mock.patch.object(fanout, '_write_chunk', failing_write):
+            item = fanout.queue('Open day', 'Come along', 'role', 'student')
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.sent, item.error), ('failed', 3, 'database went away'))
+
+        out = StringIO()
+        call_command('fanout_notifications', '--resume', stdout=out)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.sent), ('done', 7))
+        self.assertEqual(UserNotification.objects.count(), 7)
+        self.assertIn('7/7', out.getvalue())
+
+    def test_resume_leaves_fanouts_that_are_still_being_written(self):
+        with mock.patch.object(fanout, 'start'):
+            item = fanout.queue('Open day', 'Come along', 'role', 'student')
+        item.status = 'running'
+        item.updated_at = timezone.now()
+        item.save()
+        self.assertEqual(fanout.run(item.pk, resume=True), 0)
+
+        item.updated_at = timezone.now() - fanout.STALE_AFTER - timedelta(seconds=1)
+        item.save()
+        self.assertEqual(fanout.run(item.pk, resume=True), 7)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.sent), ('done', 7))
+
+    def test_publishing_result_sheets_notifies_their_owners(self):
+        session = AcademicSession.objects.create(
+            name="2024/2025", start_date=date(2024, 9, 9), end_date=date(2025, 7, 18)
+        )
+        first = AcademicTerm.objects.create(
+            session=session, name="first", start_date=date(2024, 9, 9), end_date=date(2024, 12, 13),
+        )
+        second = AcademicTerm.objects.create(
+            session=session, name="second", start_date=date(2025, 1, 6), end_date=date(2025, 4, 4),
+        )
+        # students[5] has since moved up to JSS 2 but the sheet is from JSS 1
+        sheets = [
+            ResultSheet.objects.create(student=self.students[0], session=session, term=first, student_class=self.jss1),
+            ResultSheet.objects.create(student=self.students[5], session=session, term=first, student_class=self.jss1),
+            ResultSheet.objects.create(student=self.students[1], session=session, term=second, student_class=self.jss1),
+        ]
+        ResultSheet.objects.create(student=self.students[2], session=session, term=first, student_class=self.jss1)
+
+        admin = User.objects.create_superuser(username='fanout_admin', password='pass12345', email='f@example.com')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:results_resultsheet_changelist'), {
+            'action': 'publish_results', '_selected_action': [sheet.pk for sheet in sheets],
+        })
+
+        notified = {
+            (title, user_id) for title, user_id in UserNotification.objects.values_list('title', 'user')
+        }
+        self.assertEqual(notified, {
+            (f'Results published: 2024/2025 {first.get_name_display()}', self.students[0].user_id),
+            (f'Results published: 2024/2025 {first.get_name_display()}', self.students[5].user_id),
+            (f'Results published: 2024/2025 {second.get_name_display()}', self.students[1].user_id),
+        })
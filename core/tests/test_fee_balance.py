@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounting.models import TuitionFee, Payment
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+def make_fee(amount_due="100000"):
+    user = User.objects.create_user(username=f"fee_{User.objects.count()}", password="pass12345", role="student")
+    student = StudentProfile.objects.create(
+        user=user,
+        admission_number=f"GTS-{user.pk:04d}",
+        date_of_birth=date(2010, 1, 1),
+    )
+    return TuitionFee.objects.create(
+        student=student,
+        session="2024/2025",
+        term="First",
+        amount_due=Decimal(amount_due),
+        due_date=timezone.now().date() + timedelta(days=30),
+    )
+
+
+def pay(fee, amount, reference=""):
+    return Payment.objects.create(
+        tuition_fee=fee,
+        amount=Decimal(amount),
+        payment_date=timezone.now().date(),
+        method="cash",
+        reference=reference,
+    )
+
+
+@pytest.mark.unit
+class FeeBalanceTests(TestCase):
+    def test_payments_through_stale_instances_are_not_lost(self):
+        fee = make_fee()
+        first_view = TuitionFee.objects.get(pk=fee.pk)
+        second_view = TuitionFee.objects.get(pk=fee.pk)
+
+        pay(first_view, "30000")
+        pay(second_view, "20000")
+
+        fee.refresh_from_db()
+        self.assertEqual(fee.amount_paid, Decimal("50000"))
+        self.assertEqual(fee.status, "partial")
+
+    def test_overpayment_check_uses_current_balance(self):
+        fee = make_fee()
+        stale_view = TuitionFee.objects.get(pk=fee.pk)
+        pay(fee, "80000")
+
+        with self.assertRaises(ValidationError):
+            pay(stale_view, "30000")
+
+        fee.refresh_from_db()
+        self.assertEqual(fee.amount_paid, Decimal("80000"))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_final_payment_marks_fee_paid(self):
+        fee = make_fee("50000")
+        payment = pay(fee, "50000")
+
+        self.assertEqual(payment.tuition_fee.status, "paid")
+        self.assertEqual(payment.tuition_fee.paid_date, timezone.now().date())
+
+    def test_record_payment_refuses_overpayment(self):
+        fee = make_fee("50000")
+        self.assertFalse(TuitionFee.record_payment(fee.pk, Decimal("50000.01")))
+        self.assertTrue(TuitionFee.record_payment(fee.pk, Decimal("50000")))
+
+    def test_check_constraint_rejects_overpayment(self):
+        fee = make_fee("50000")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TuitionFee.objects.filter(pk=fee.pk).update(amount_paid=Decimal("60000"))
+
+
+@pytest.mark.slow
+class ConcurrentFeePaymentTests(TransactionTestCase):
+    """Several cashiers posting against the same fee at once"""
+
+    threads = 8
+    payments_per_thread = 10
+    amount = Decimal("1000")
+    # Attempts per statement while SQLite reports the database busy
+    retries = 50
+    backoff = 0.01
+
+    def _hammer(self, worker, fee_id, outcomes):
+        close_old_connections()
+        try:
+            for attempt in range(self.payments_per_thread):
+                reference = f"T{worker}-{attempt}"
+                for retry in range(self.retries):
+                    try:
+                        pay(TuitionFee.objects.get(pk=fee_id), self.amount, reference)
+                        outcomes.append("ok")
+                    except ValidationError:
+                        outcomes.append("rejected")
+                    except OperationalError:
+                        # SQLite reports a busy database instead of waiting on
+                        # row locks; the payment may still have committed
+                        if self._committed(reference):
+                            outcomes.append("ok")
+                            break
+                        time.sleep(self.backoff * (retry + 1))
+                        continue
+                    break
+                else:
+                    outcomes.append("gave up")
+        finally:
+            connection.close()
+
+    @classmethod
+    def _committed(cls, reference):
+        for retry in range(cls.retries):
+            try:
+                return Payment.objects.filter(reference=reference).exists()
+            except OperationalError:
+                time.sleep(cls.backoff * (retry + 1))
+        raise OperationalError(f"Database stayed locked checking payment {reference}")
+
+    def _run_threads(self, fee):
+        outcomes = []
+        workers = [
+            threading.Thread(target=self._hammer, args=(worker, fee.pk, outcomes))
+            for worker in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return outcomes
+
+    def test_concurrent_payments_sum_exactly(self):
+        total = self.amount * self.threads * self.payments_per_thread
+        fee = make_fee(str(total))
+
+        outcomes = self._run_threads(fee)
+
+        fee.refresh_from_db()
+        self.assertEqual(outcomes.count("ok"), self.threads * self.payments_per_thread)
+        self.assertEqual(fee.amount_paid, total)
+        self.assertEqual(fee.status, "paid")
+        self.assertEqual(Payment.objects.filter(tuition_fee=fee).count(), len(outcomes))
+
+    def test_concurrent_payments_never_overpay(self):
+        # Room for only half of the attempted payments
+        capacity = self.amount * self.threads * self.payments_per_thread / 2
+        fee = make_fee(str(capacity))
+
+        outcomes = self._run_threads(fee)
+
+        fee.refresh_from_db()
+        self.assertEqual(fee.amount_paid, capacity)
+        self.assertEqual(outcomes.count("ok") * self.amount, capacity)
+        self.assertEqual(Payment.objects.filter(tuition_fee=fee).count(), outcomes.count("ok"))
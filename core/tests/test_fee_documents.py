@@ -0,0 +1,93 @@
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting import documents
+from accounting.models import TuitionFee, Payment
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class FeeDocumentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        due = timezone.now().date() + timedelta(days=30)
+        for number in range(3):
+            user = User.objects.create_user(
+                username=f"doc_{number}", password="pass12345", role="student", first_name=f"Pupil{number}"
+            )
+            student = StudentProfile.objects.create(
+                user=user, admission_number=f"GTS/D/{number:03d}", date_of_birth=date(2010, 1, 1)
+            )
+            for term in ("First", "Second"):
+                fee = TuitionFee.objects.create(
+                    student=student, session="2024/2025", term=term, amount_due=Decimal("50000"), due_date=due
+                )
+                Payment.objects.create(
+                    tuition_fee=fee, amount=Decimal("20000"), payment_date=timezone.now().date(), method="bank"
+                )
+
+    def test_statements_prefetch_in_two_queries(self):
+        with self.assertNumQueries(2):
+            statements = documents.load_statements(TuitionFee.objects.all())
+        self.assertEqual(len(statements), 3)
+        self.assertEqual([len(statement["fees"]) for statement in statements], [2, 2, 2])
+        self.assertEqual(statements[0]["fees"][0]["payments"][0]["amount"], Decimal("20000"))
+
+    def test_receipts_zip(self):
+        content = documents.receipts_for(Payment.objects.all(), output="zip")
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 6)
+            self.assertTrue(all(archive.read(name).startswith(b"%PDF") for name in names))
+
+    def test_merged_statement_pdf(self):
+        content = documents.statements_for(TuitionFee.objects.all(), output="pdf")
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertEqual(content.count(b"/Type /Page\n"), 3)
+
+    def test_chunks_render_in_process_pool(self):
+        items = documents.load_receipts(Payment.objects.all())
+        content = documents.render_documents("receipt", items, output="zip", workers=2, chunk_size=2)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(len(archive.namelist()), 6)
+
+    def test_admin_actions_render_in_process_and_limit_batches(self):
+        admin = User.objects.create_superuser(username="doc_admin", password="pass12345", email="doc@example.com")
+        self.client.force_login(admin)
+        url = reverse("admin:accounting_tuitionfee_changelist")
+        selected = list(TuitionFee.objects.values_list("pk", flat=True))
+
+        with mock.patch.object(documents, "CHUNK_SIZE", 2), \
+                mock.patch.object(documents, "ProcessPoolExecutor", side_effect=AssertionError("forked")):
+            response = self.client.post(url, {"action": "download_statements_zip", "_selected_action": selected})
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+        with mock.patch.object(documents, "ADMIN_DOCUMENT_LIMIT", 2):
+            response = self.client.post(
+                url, {"action": "download_statements_zip", "_selected_action": selected}, follow=True
+            )
+        self.assertContains(response, "generate_fee_documents")
+
+    def test_management_command(self):
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statements.zip")
+            out = StringIO()
+            call_command("generate_fee_documents", "statements", "--output", path, "--term", "First", stdout=out)
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+        self.assertIn("Wrote 3 statements", out.getvalue())
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import history, metrics
+from core.models import PerformanceRollup
+from core.performance import PerformanceAnalyzer
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'history-tests'}}
+START = datetime(2025, 3, 17, 9, 0, tzinfo=dt_timezone.utc)
+
+
+def record_minute(minute, route, durations, status='2xx', queries=0):
+    frame = metrics.Frame()
+    histogram = frame.histograms[(metrics.REQUEST_DURATION, (route, 'GET', status))] = metrics.Histogram()
+    for seconds in durations:
+        histogram.record(seconds)
+    if queries:
+        frame.counters[(metrics.DB_QUERIES, (route,))] = queries
+    metrics._write(metrics.minute_space(minute), frame)
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM, METRICS_MINUTE_RETENTION=600)
+class PerformanceHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._series_ids.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(metrics._series_ids.clear)
+
+    def test_minutes_are_rolled_up_and_downsampled(self):
+        record_minute(START, 'dashboard', [0.1, 0.2], queries=6)
+        record_minute(START + timedelta(minutes=1), 'dashboard', [0.4], status='5xx', queries=3)
+        record_minute(START + timedelta(minutes=1), 'results', [1.5])
+
+        self.assertEqual(history.write_minutes(START + timedelta(minutes=3)), 3)
+        self.assertEqual(PerformanceRollup.objects.filter(resolution=history.MINUTE).count(), 3)
+        # Already written minutes are not written again
+        self.assertEqual(history.write_minutes(START + timedelta(minutes=3)), 0)
+
+        history.write_minutes(START + timedelta(hours=1, minutes=10))
+        self.assertEqual(history.downsample(), 2)
+        hourly = PerformanceRollup.objects.get(resolution=history.HOUR, route='dashboard')
+        self.assertEqual((hourly.period_start, hourly.requests, hourly.server_errors, hourly.queries), (START, 3, 1, 9))
+
+        # Minute and hourly rows of the same requests are only counted once
+        stats = {item['endpoint']: item for item in history.route_stats(START, START + timedelta(hours=2))}
+        self.assertEqual(stats['dashboard']['request_count'], 3)
+        self.assertEqual(stats['dashboard']['avg_queries'], 3)
+        self.assertAlmostEqual(stats['dashboard']['server_error_rate'], 100 / 3)
+        self.assertEqual(stats['results']['request_count'], 1)
+        self.assertGreaterEqual(stats['results']['p95_duration'], 1.5)
+
+        # A window starting mid-hour reads the minute rows at its edge
+        partial = history.summary(START + timedelta(minutes=1), START + timedelta(hours=2))
+        self.assertEqual(partial['request_count'], 2)
+
+    def test_old_minute_rows_are_pruned(self):
+        record_minute(START, 'dashboard', [0.1])
+        history.write_minutes(START + timedelta(minutes=2))
+        history.prune(START + timedelta(days=3))
+        self.assertFalse(PerformanceRollup.objects.filter(resolution=history.MINUTE).exists())
+
+    def test_long_windows_and_comparisons_read_the_history(self):
+        now = datetime.now(dt_timezone.utc)
+        last_week = history.floor(now - timedelta(days=9), history.MINUTE)
+        this_week = history.floor(now - timedelta(days=2), history.MINUTE)
+        for minute, durations in ((last_week, [0.1, 0.1]), (this_week, [0.5, 0.5, 0.5])):
+            rollup = history.Rollup()
+            for seconds in durations:
+                rollup.histogram.record(seconds)
+            rollup.row(history.MINUTE, minute, 'results').save()
+
+        summary = PerformanceAnalyzer.get_performance_summary(hours=24 * 4)
+        self.assertEqual(summary['request_count'], 3)
+
+        comparison = PerformanceAnalyzer.compare_periods(*history.periods())
+        self.assertEqual(comparison['current']['request_count'], 3)
+        self.assertEqual(comparison['previous']['request_count'], 2)
+        self.assertGreater(comparison['routes'][0]['p95_change'], 100)
+
+        out = StringIO()
+        call_command('performance_report', '--compare', stdout=out)
+        self.assertIn('results', out.getvalue())
+        self.assertIn('was', out.getvalue())
+
+        admin = User.objects.create_user(username='history_admin', password='pass12345', role='admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('itsupport:system_health'))
+        self.assertContains(response, 'Performance History')
+        self.assertEqual(response.context['comparison']['routes'][0]['endpoint'], 'results')
@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting import ledger
+from accounting.models import TuitionFee, Payment, Expense, Payroll, JournalEntry, JournalLine, AccountBalance
+from accounting.report_utils import ReportGenerator
+from staff.models import StaffProfile
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+def months_ago(count):
+    day = ledger.month_start(timezone.now().date())
+    for _ in range(count):
+        day = ledger.month_start(day - timedelta(days=1))
+    return day
+
+
+@pytest.mark.unit
+class GeneralLedgerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="ledger_student", password="pass12345", role="student")
+        student = StudentProfile.objects.create(
+            user=user, admission_number="GTS/2024/100", date_of_birth=date(2010, 1, 1)
+        )
+        self.fee = TuitionFee.objects.create(
+            student=student, session="2024/2025", term="First",
+            amount_due=Decimal("100000"), due_date=timezone.now().date(),
+        )
+        staff_user = User.objects.create_user(username="ledger_staff", password="pass12345", role="staff")
+        self.staff = StaffProfile.objects.create(
+            user=staff_user, staff_id="STF-100", position="teacher", department="science"
+        )
+        self.two_months_ago = months_ago(2)
+        self.last_month = months_ago(1)
+
+    def pay(self, amount, on):
+        return Payment.objects.create(tuition_fee=self.fee, amount=Decimal(amount), payment_date=on, method="cash")
+
+    def spend(self, amount, on, category="supplies"):
+        return Expense.objects.create(description="Chalk", amount=Decimal(amount), date=on, category=category)
+
+    def test_sources_post_balanced_entries(self):
+        self.pay("30000", self.last_month)
+        self.spend("5000", self.last_month)
+        payroll = Payroll.objects.create(staff=self.staff, month="May", year=2024, amount=Decimal("8000"))
+
+        self.assertEqual(JournalEntry.objects.count(), 2)
+        payroll.paid = True
+        payroll.paid_date = self.last_month
+        payroll.save()
+        self.assertEqual(JournalEntry.objects.count(), 3)
+
+        for entry in JournalEntry.objects.prefetch_related("lines"):
+            lines = list(entry.lines.all())
+            self.assertEqual(sum(l.debit for l in lines), sum(l.credit for l in lines))
+
+    def test_balance_sheet_cash_nets_outflows(self):
+        self.pay("30000", self.two_months_ago)
+        self.spend("5000", self.two_months_ago)
+        Payroll.objects.create(
+            staff=self.staff, month="May", year=2024, amount=Decimal("8000"), paid=True, paid_date=self.last_month
+        )
+
+        report = ReportGenerator(self.two_months_ago, timezone.now().date(), "To date").generate_balance_sheet()
+        self.assertEqual(report["assets"]["cash_on_hand"], 17000.00)
+
+    def test_balances_use_checkpoints_plus_delta(self):
+        self.pay("30000", self.two_months_ago)
+        self.pay("10000", self.last_month)
+
+        self.assertEqual(ledger.ensure_checkpoints(), 2)
+        checkpoint = AccountBalance.objects.get(account="cash", month=self.last_month)
+        self.assertEqual(checkpoint.balance, Decimal("40000"))
+
+        today = timezone.now().date()
+        self.pay("5000", today)
+        with self.assertNumQueries(3):
+            balances = ledger.balances_as_of(today)
+        self.assertEqual(balances["cash"], Decimal("45000"))
+        self.assertEqual(ledger.balances_as_of(ledger.month_end(self.two_months_ago))["cash"], Decimal("30000"))
+
+    def test_backdated_posting_invalidates_later_checkpoints(self):
+        self.pay("30000", self.last_month)
+        ledger.ensure_checkpoints()
+        self.assertTrue(AccountBalance.objects.filter(month=self.last_month).exists())
+
+        self.spend("2000", self.two_months_ago)
+        self.assertFalse(AccountBalance.objects.filter(month__gte=self.two_months_ago).exists())
+        self.assertEqual(ledger.balances_as_of(timezone.now().date())["cash"], Decimal("28000"))
+
+    def test_edits_and_deletes_rebuild_the_entry(self):
+        expense = self.spend("5000", self.last_month)
+        expense.amount = Decimal("7000")
+        expense.save()
+        self.assertEqual(JournalLine.objects.get(account="cash").credit, Decimal("7000"))
+
+        expense.delete()
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_cash_flow_from_ledger_movements(self):
+        self.pay("30000", self.two_months_ago)
+        self.pay("20000", self.last_month)
+        self.spend("5000", self.last_month, category="utility")
+        Payroll.objects.create(
+            staff=self.staff, month="May", year=2024, amount=Decimal("8000"), paid=True, paid_date=self.last_month
+        )
+
+        report = ReportGenerator(self.last_month, ledger.month_end(self.last_month), "Last month").generate_cash_flow()
+        operating = report["operating_activities"]
+        self.assertEqual(operating["cash_from_operations"], 20000.00)
+        self.assertEqual(operating["cash_for_expenses"], 5000.00)
+        self.assertEqual(operating["cash_for_payroll"], 8000.00)
+        self.assertEqual(report["net_change_in_cash"], 7000.00)
+
+    def test_rebuild_matches_incremental_posting(self):
+        self.pay("30000", self.two_months_ago)
+        self.spend("5000", self.last_month)
+        before = ledger.balances_as_of(timezone.now().date())
+
+        counts = ledger.rebuild()
+        self.assertEqual(counts, {"payment": 1, "expense": 1, "payroll": 0})
+        self.assertEqual(ledger.balances_as_of(timezone.now().date()), before)
+
+    def test_rebuild_without_ids_from_bulk_insert(self):
+        payments = [self.pay("30000", self.two_months_ago), self.pay("20000", self.last_month)]
+        self.spend("5000", self.last_month)
+        before = ledger.balances_as_of(timezone.now().date())
+
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            counts = ledger.rebuild()
+        self.assertEqual(counts, {"payment": 2, "expense": 1, "payroll": 0})
+        self.assertEqual(
+            sorted(JournalEntry.objects.filter(source_type="payment").values_list("source_id", flat=True)),
+            [payment.pk for payment in payments],
+        )
+        self.assertFalse(JournalEntry.objects.filter(lines__isnull=True).exists())
+        self.assertEqual(ledger.balances_as_of(timezone.now().date()), before)
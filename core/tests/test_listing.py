@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Q, Sum
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import TuitionFee
+from core.listing import KeysetPaginator, filtered_summary, keyset_page
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class FilteredListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        due = timezone.now().date() + timedelta(days=30)
+        for number in range(23):
+            user = User.objects.create_user(username=f"list_{number}", password="pass12345", role="student")
+            student = StudentProfile.objects.create(
+                user=user, admission_number=f"GTS/L/{number:03d}", date_of_birth=date(2010, 1, 1)
+            )
+            TuitionFee.objects.create(
+                student=student, session="2024/2025" if number % 2 else "2023/2024", term="First",
+                amount_due=Decimal("1000"), amount_paid=Decimal("1000") if number < 5 else Decimal("0"), due_date=due,
+            )
+
+    def test_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = filtered_summary(
+                TuitionFee.objects.all(),
+                total=Sum("amount_due"),
+                paid=Sum("amount_due", filter=Q(status="paid")),
+                partial=Sum("amount_due", filter=Q(status="partial")),
+            )
+        self.assertEqual(summary, {"total": Decimal("23000"), "paid": Decimal("5000"), "partial": 0, "count": 23})
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        fees = TuitionFee.objects.all()
+        paginator = KeysetPaginator(fees, 10, ("-pk",), fees.count())
+        expected = list(fees.order_by("-pk").values_list("pk", flat=True))
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor, number=2)
+        third = paginator.page(second.next_cursor, number=3)
+        self.assertEqual([fee.pk for page in (first, second, third) for fee in page], expected)
+        self.assertFalse(third.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+
+        back = paginator.page(third.previous_cursor, direction="prev", number=2)
+        self.assertEqual([fee.pk for fee in back], [fee.pk for fee in second])
+        self.assertTrue(back.has_previous())
+
+        last = paginator.page(direction="prev")
+        self.assertEqual(last.number, 3)
+        self.assertEqual([fee.pk for fee in last], [fee.pk for fee in third])
+
+    def test_multi_field_ordering_and_bad_cursor(self):
+        fees = TuitionFee.objects.all()
+        paginator = KeysetPaginator(fees, 4, ("session", "-pk"), fees.count())
+        expected = list(fees.order_by("session", "-pk").values_list("pk", flat=True))
+
+        seen, page = [], paginator.page()
+        while True:
+            seen.extend(fee.pk for fee in page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor, number=page.next_page_number())
+        self.assertEqual(seen, expected)
+
+        request = RequestFactory().get("/", {"cursor": "tampered", "page": "4"})
+        self.assertEqual(keyset_page(request, fees, ("-pk",), 23).number, 1)
+
+    def test_fee_list_page_queries(self):
+        accountant = User.objects.create_user(username="list_accountant", password="pass12345", role="accountant")
+        self.client.force_login(accountant)
+        url = reverse("accounting:fee_list")
+
+        response = self.client.get(url, {"session": "2024/2025", "status": "unpaid"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["fee_stats"]["total_due"], Decimal("9000"))
+        self.assertEqual(response.context["sessions"], ["2023/2024", "2024/2025"])
+        self.assertEqual(len(response.context["page_obj"]), 9)
+        self.assertFalse(response.context["page_obj"].has_other_pages())
+        self.assertEqual(response.context["filter_query"], "session=2024%2F2025&status=unpaid")
@@ -0,0 +1,171 @@
+import os
+import threading
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, openmetrics
+from core.performance import PerformanceAnalyzer
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'metrics-tests'}}
+
+
+@pytest.mark.unit
+class HistogramTests(TestCase):
+    def test_percentiles_are_bucket_bounds_within_a_fifth(self):
+        histogram = metrics.Histogram()
+        for millis in range(1, 1001):
+            histogram.record(millis / 1000)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean, 0.5005)
+        for fraction in (0.5, 0.95, 0.99):
+            self.assertLessEqual(abs(histogram.percentile(fraction) - fraction) / fraction, 0.2)
+        self.assertGreaterEqual(histogram.maximum, 1.0)
+        self.assertLessEqual(histogram.minimum, 0.001)
+
+    def test_collect_holds_back_live_frames_for_one_round(self):
+        registry = metrics.MetricsRegistry()
+        registry.increment('hits', ('a',))
+        self.assertFalse(registry.collect())
+        registry.increment('hits', ('a',), 2)
+        self.assertEqual(registry.collect().counters, {('hits', ('a',)): 1})
+        self.assertEqual(registry.collect(grace=False).counters, {('hits', ('a',)): 2})
+
+    def test_threads_record_into_their_own_frames(self):
+        registry = metrics.MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                registry.observe('latency', ('x',), 0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(registry.collect(grace=False).histograms[('latency', ('x',))].count, 4000)
+
+    def test_slots_of_finished_threads_are_dropped(self):
+        registry = metrics.MetricsRegistry()
+        thread = threading.Thread(target=registry.increment, args=('hits', ('a',)))
+        thread.start()
+        thread.join()
+        self.assertEqual(len(registry._slots), 1)
+
+        self.assertFalse(registry.collect())
+        self.assertEqual(registry._slots, [])
+        # The finished thread's last frame is still reported
+        self.assertEqual(registry.collect().counters, {('hits', ('a',)): 1})
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class MetricsFlushTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._series_ids.clear()
+        metrics.registry.collect(grace=False)
+
+    def tearDown(self):
+        cache.clear()
+        metrics._series_ids.clear()
+
+    def test_flushes_from_several_workers_add_up(self):
+        key = (metrics.REQUEST_DURATION, ('core:dashboard', 'GET', '2xx'))
+        for duration in (0.05, 0.2):
+            metrics.registry.observe(*key, duration)
+            metrics.flush(grace=False)
+            metrics._series_ids.clear()  # as if flushed by another process
+
+        histogram = metrics.read_window(1).histograms[key]
+        self.assertEqual(histogram.count, 2)
+        self.assertAlmostEqual(histogram.total, 0.25)
+
+    def test_flush_sends_one_pipeline_on_redis(self):
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+                self.executed = 0
+
+            def incrby(self, key, amount):
+                self.commands.append(('incrby', key, amount))
+
+            def expire(self, key, timeout):
+                self.commands.append(('expire', key, timeout))
+
+            def execute(self):
+                self.executed += 1
+
+        pipeline = Pipeline()
+        client = mock.Mock(pipeline=mock.Mock(return_value=pipeline))
+        metrics.registry.observe(metrics.REQUEST_DURATION, ('core:dashboard', 'GET', '2xx'), 0.05)
+        metrics.registry.increment(metrics.DB_QUERIES, ('core:dashboard',), 3)
+        with mock.patch.object(metrics, '_redis_client', return_value=client):
+            metrics.flush(grace=False)
+
+        self.assertEqual(pipeline.executed, 1)
+        increments = [command for command in pipeline.commands if command[0] == 'incrby']
+        # bucket, count and microseconds of the histogram plus the counter, in three key spaces
+        self.assertEqual(len(increments), 3 * 4)
+        # Totals never expire
+        self.assertEqual(sum(command[0] == 'expire' for command in pipeline.commands), 2 * 4)
+
+    def test_middleware_records_route_names(self):
+        user = User.objects.create_user(username='metrics_admin', password='pass12345', role='admin')
+        self.client.force_login(user)
+        self.client.get(reverse('attendance'))
+        self.client.get('/no-such-page/')
+        metrics.flush(grace=False)
+
+        endpoints = {row['endpoint']: row for row in PerformanceAnalyzer.get_slow_endpoints(1)}
+        self.assertEqual(endpoints['GET attendance']['request_count'], 1)
+        self.assertIn('GET <unresolved>', endpoints)
+        summary = PerformanceAnalyzer.get_performance_summary(1)
+        self.assertEqual(summary['request_count'], 2)
+        self.assertEqual(summary['error_rate'], 50.0)
+
+    def test_openmetrics_endpoint_exposes_totals_and_worker_gauges(self):
+        user = User.objects.create_user(username='metrics_staff', password='pass12345', role='admin')
+        self.client.force_login(user)
+        self.client.get(reverse('attendance'))
+        metrics.flush(grace=False)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], openmetrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertTrue(body.endswith('# EOF\n'))
+        self.assertIn('glad_http_request_duration_seconds_count{route="attendance",method="GET",status="2xx"} 1', body)
+        self.assertIn(
+            'glad_http_request_duration_seconds_bucket{route="attendance",method="GET",status="2xx",le="+Inf"} 1', body
+        )
+        self.assertRegex(body, r'glad_db_queries_total\{route="attendance"\} [1-9]')
+        self.assertIn(f'glad_http_requests_in_flight{{pid="{os.getpid()}"}} 1', body)
+
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            ok = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(ok.status_code, 200)
+
+    def test_evicted_counter_does_not_hand_out_numbers_in_use(self):
+        first = (metrics.DB_QUERIES, ('core:dashboard',))
+        second = (metrics.DB_QUERIES, ('core:attendance',))
+        metrics.registry.increment(*first, 3)
+        metrics.flush(grace=False)
+
+        # The cache culls the counter and this worker's number of ``first``
+        cache.delete(f'{metrics.KEY_PREFIX}:{metrics.TOTALS}:n')
+        cache.delete(metrics._name_key(metrics.TOTALS, 1))
+        metrics._series_ids.clear()  # another worker registers ``second``
+        metrics.registry.increment(*second, 5)
+        metrics.flush(grace=False)
+
+        metrics.registry.increment(*first, 2)
+        metrics.flush(grace=False)
+        self.assertEqual(metrics.read_totals().counters, {first: 2, second: 5})
+
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import Expense, FinancialReport
+from core import periods
+from results.models import AcademicSession, AcademicTerm
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class PeriodTests(TestCase):
+    def test_calendar_months_and_quarters(self):
+        self.assertEqual(periods.month(date(2024, 12, 31)), (date(2024, 12, 1), date(2025, 1, 1), "December 2024"))
+        self.assertEqual(periods.quarter(date(2024, 11, 5))[:2], (date(2024, 10, 1), date(2025, 1, 1)))
+        # 30-day steps from March 31st skip February; calendar months do not
+        labels = [period.label for period in periods.last_months(date(2024, 3, 31), 3)]
+        self.assertEqual(labels, ["January 2024", "February 2024", "March 2024"])
+
+    def test_named_periods(self):
+        today = date(2025, 1, 15)
+        self.assertEqual(periods.named_period("last_quarter", today).label, "Q4 2024")
+        self.assertEqual(periods.named_period("last_year", today)[:2], (date(2024, 1, 1), date(2025, 1, 1)))
+        current = periods.named_period("current_month", today)
+        self.assertEqual((current.start, current.last_day), (date(2025, 1, 1), today))
+        self.assertIsNone(periods.named_period("current_term", today))
+        self.assertIsNone(periods.named_period("fortnight", today))
+
+        session = AcademicSession.objects.create(
+            name="2024/2025", start_date=date(2024, 9, 9), end_date=date(2025, 7, 18)
+        )
+        AcademicTerm.objects.create(
+            session=session, name="second", start_date=date(2025, 1, 6), end_date=date(2025, 4, 4)
+        )
+        term = periods.named_period("current_term", today)
+        self.assertEqual((term.start, term.end), (date(2025, 1, 6), date(2025, 4, 5)))
+        self.assertTrue(periods.named_period("current_session", today).contains(date(2025, 7, 18)))
+
+    def test_range_filters_on_dates_and_datetimes(self):
+        for day in (date(2024, 1, 31), date(2024, 2, 1), date(2024, 2, 29), date(2024, 3, 1)):
+            Expense.objects.create(description=str(day), amount=Decimal("10"), date=day, category="other")
+        february = periods.month(date(2024, 2, 10))
+        self.assertEqual(Expense.objects.filter(february.filter("date")).count(), 2)
+
+        user = User.objects.create_user(username="period_user", password="pass12345", role="accountant")
+        report = FinancialReport.objects.create(
+            report_type="income_statement", format="PDF", period_start=february.start,
+            period_end=february.last_day, period_name=february.label, generated_by=user,
+        )
+        FinancialReport.objects.filter(pk=report.pk).update(
+            generated_at=timezone.make_aware(datetime(2024, 2, 29, 23, 30))
+        )
+        self.assertEqual(FinancialReport.objects.filter(february.filter("generated_at", aware=True)).count(), 1)
+
+    def test_accounting_home_trends_use_calendar_months(self):
+        today = timezone.now().date()
+        Expense.objects.create(description="This month", amount=Decimal("400"), date=today, category="other")
+        accountant = User.objects.create_user(username="period_accountant", password="pass12345", role="accountant")
+        self.client.force_login(accountant)
+
+        response = self.client.get(reverse("accounting:home"))
+        trends = response.context["monthly_trends"]
+        self.assertEqual([trend["month"] for trend in trends], [p.label for p in periods.last_months(today, 6)])
+        self.assertEqual(trends[-1]["expenses"], 400.0)
+        self.assertEqual(response.context["monthly_expenses"], Decimal("400"))
@@ -0,0 +1,65 @@
+import tempfile
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+
+User = get_user_model()
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.unit
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(PROFILE_SLOW_REQUESTS=True, PROFILE_DIR=self.tmp.name, PROFILE_RING_SIZE=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def profiled_request(self, seconds, threshold=0.05):
+        request = RequestFactory().get('/attendance/')
+        request.resolver_match = None
+        request.user = User(username='profiled', role='staff')
+        profiling.start_request(request)
+        _spin(seconds)
+        return profiling.finish_request(request, seconds, threshold)
+
+    def test_slow_requests_are_saved_in_a_bounded_ring(self):
+        names = [self.profiled_request(0.15) for _ in range(3)]
+        self.assertTrue(all(names))
+        self.assertIsNone(self.profiled_request(0.02))
+
+        saved = profiling.recent_profiles()
+        self.assertEqual([p['name'] for p in saved], names[:0:-1])
+        self.assertEqual((saved[0]['role'], saved[0]['route']), ('staff', '<unresolved>'))
+
+        stacks = profiling.read_profile(names[-1])
+        self.assertIn('test_profiling:_spin', stacks)
+        frame, _, share = profiling.hottest_frames(stacks)[0]
+        self.assertEqual(frame, 'core.tests.test_profiling:_spin')
+        self.assertGreater(share, 50)
+        self.assertIsNone(profiling.read_profile('../etc/passwd'))
+
+    def test_system_health_lists_profiles_for_it_support(self):
+        name = self.profiled_request(0.15)
+        it_user = User.objects.create_user(username='it_health', password='pass12345', role='it_support')
+        self.client.force_login(it_user)
+
+        response = self.client.get(reverse('itsupport:system_health'), {'profile': name})
+        self.assertContains(response, name)
+        self.assertEqual(response.context['hottest_frames'][0][0], 'core.tests.test_profiling:_spin')
+        download = self.client.get(reverse('itsupport:download_profile', args=[name]))
+        self.assertIn(b'_spin', download.content)
+
+        self.client.force_login(User.objects.create_user(username='student_health', password='pass12345'))
+        self.assertEqual(self.client.get(reverse('itsupport:system_health')).status_code, 403)
@@ -0,0 +1,45 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.performance import QueryCounter, fingerprint
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class QueryMonitoringTests(TestCase):
+    def test_fingerprint_strips_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 42 AND name = 'O''Brien'  AND pk IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)",
+        )
+        self.assertEqual(fingerprint('SELECT "T3"."col_2" FROM x LIMIT 21'), 'SELECT "T3"."col_2" FROM x LIMIT ?')
+
+    def test_counter_groups_repeated_statements(self):
+        User.objects.create_user(username='query_user', password='pass12345')
+        counter = QueryCounter(slow_query_threshold=0)
+        with connection.execute_wrapper(counter):
+            for pk in range(12):
+                User.objects.filter(pk=pk).exists()
+            User.objects.count()
+        self.assertEqual(counter.count, 13)
+        self.assertEqual(len(counter.slow_queries), 13)
+        [(sql, times)] = counter.repeated(10)
+        self.assertEqual(times, 12)
+        self.assertIn('WHERE "users_customuser"."id" = ?', sql)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=1)
+    def test_responses_carry_server_timing_and_flag_n_plus_one(self):
+        metrics.registry.collect(grace=False)
+        user = User.objects.create_user(username='query_admin', password='pass12345', role='admin')
+        self.client.force_login(user)
+        response = self.client.get(reverse('attendance'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+        counters = metrics.registry.collect(grace=False).counters
+        self.assertGreater(counters[(metrics.DB_QUERIES, ('attendance',))], 0)
+        self.assertEqual(counters[(metrics.N_PLUS_ONE, ('attendance',))], 1)
@@ -0,0 +1,88 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import ratelimit
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'}}
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_sliding_window_weighs_the_previous_window(self):
+        policy = ratelimit.RatePolicy('test', requests=10, window=60)
+        for _ in range(10):
+            self.assertEqual(ratelimit.hit(policy, 'ip:1', now=120.0), (True, 0))
+        self.assertEqual(ratelimit.hit(policy, 'ip:1', now=150.0), (False, 30))
+
+        # Halfway through the next window half of the previous 11 hits still count
+        self.assertTrue(ratelimit.hit(policy, 'ip:1', now=210.0)[0])
+        allowed = [ratelimit.hit(policy, 'ip:1', now=210.0)[0] for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+
+    def test_login_posts_are_limited_per_ip_but_pages_are_not(self):
+        login = reverse('login')
+        for _ in range(10):
+            self.client.post(login, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.1')
+        response = self.client.post(login, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+
+        self.assertNotEqual(self.client.get(login, REMOTE_ADDR='10.0.0.1').status_code, 429)
+        self.assertNotEqual(
+            self.client.post(login, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.2').status_code, 429
+        )
+
+    def test_spoofed_forwarded_for_does_not_escape_the_login_limit(self):
+        login = reverse('login')
+        codes = [
+            self.client.post(
+                login, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{n}'
+            ).status_code
+            for n in range(11)
+        ]
+        self.assertEqual(codes[-1], 429)
+
+    def test_client_ip_trusts_only_the_configured_proxies(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.9', 'HTTP_X_FORWARDED_FOR': '1.1.1.1, 203.0.113.5'})
+        self.assertEqual(ratelimit.client_ip(request), '10.0.0.9')
+        with override_settings(RATE_LIMIT_TRUSTED_PROXIES=1):
+            self.assertEqual(ratelimit.client_ip(request), '203.0.113.5')
+        with override_settings(RATE_LIMIT_TRUSTED_PROXIES=3):
+            self.assertEqual(ratelimit.client_ip(request), '1.1.1.1')
+
+    @override_settings(RATE_LIMIT_REQUESTS=3)
+    def test_staff_get_looser_dashboard_policy_than_the_default(self):
+        student = User.objects.create_user(username='rl_student', password='pass12345', role='student')
+        admin = User.objects.create_user(username='rl_admin', password='pass12345', role='admin')
+
+        self.client.force_login(student)
+        codes = [self.client.get(reverse('dashboard')).status_code for _ in range(4)]
+        self.assertEqual(codes[-1], 429)
+
+        self.client.force_login(admin)
+        codes = [self.client.get(reverse('dashboard')).status_code for _ in range(4)]
+        self.assertNotIn(429, codes)
+
+    def test_falls_back_to_local_counters_when_the_cache_fails(self):
+        policy = ratelimit.RatePolicy('fallback', requests=2, window=60)
+        broken = mock.Mock(**{'add.side_effect': ConnectionError('down')})
+        with mock.patch.object(ratelimit, 'cache', broken):
+            results = [ratelimit.hit(policy, 'ip:9', now=60.0)[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+
+        counters = ratelimit.LocalCounters(maxsize=2)
+        for key in ('a', 'b', 'a', 'c'):
+            counters.incr(key)
+        self.assertEqual((counters.get('a'), counters.get('b'), counters.get('c')), (2, 0, 1))
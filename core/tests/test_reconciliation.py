@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting import reconciliation
+from accounting.models import TuitionFee, Payment, JournalEntry
+from accounting.reconciliation import StatementReconciler, iter_statement_lines
+from students.models import StudentProfile
+
+User = get_user_model()
+
+
+def make_student(username, admission_number):
+    user = User.objects.create_user(username=username, password="pass12345", role="student")
+    return StudentProfile.objects.create(
+        user=user,
+        admission_number=admission_number,
+        date_of_birth=date(2010, 1, 1),
+    )
+
+
+def make_statement(rows):
+    header = "Date,Narration,Reference,Admission Number,Credit\n"
+    body = "".join(",".join(str(cell) for cell in row) + "\n" for row in rows)
+    return SimpleUploadedFile("statement.csv", (header + body).encode("utf-8"), content_type="text/csv")
+
+
+@pytest.mark.unit
+class StatementReconciliationTests(TestCase):
+    def setUp(self):
+        due = timezone.now().date() + timedelta(days=30)
+        self.student_a = make_student("recon_a", "GTS/2024/001")
+        self.student_b = make_student("recon_b", "GTS/2024/002")
+        self.fee_a = TuitionFee.objects.create(
+            student=self.student_a, session="2024/2025", term="First", amount_due=Decimal("50000"), due_date=due
+        )
+        self.fee_b = TuitionFee.objects.create(
+            student=self.student_b, session="2024/2025", term="First", amount_due=Decimal("40000"), due_date=due
+        )
+
+    def test_parses_only_credit_lines(self):
+        statement = make_statement([
+            ("2024-09-02", "School fees", "TRF001", "GTS/2024/001", "\"20,000.00\""),
+            ("2024-09-02", "Bank charge", "CHG", "", "0"),
+        ])
+        lines = list(iter_statement_lines(statement))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].amount, Decimal("20000.00"))
+        self.assertEqual(lines[0].date, date(2024, 9, 2))
+
+    def test_posts_matched_lines_and_updates_fees(self):
+        statement = make_statement([
+            ("2024-09-02", "Fees", "TRF001", "GTS/2024/001", "20000"),
+            ("2024-09-03", "Fees for GTS/2024/002", "TRF002", "", "40000"),
+            ("2024-09-04", "Unknown depositor", "TRF003", "", "1000"),
+        ])
+        result = StatementReconciler(batch_size=2).run(statement)
+
+        self.assertEqual(result.posted_count, 2)
+        self.assertEqual(len(result.unmatched), 1)
+        self.fee_a.refresh_from_db()
+        self.fee_b.refresh_from_db()
+        self.assertEqual(self.fee_a.amount_paid, Decimal("20000"))
+        self.assertEqual(self.fee_a.status, "partial")
+        self.assertEqual(self.fee_b.status, "paid")
+        self.assertIsNotNone(self.fee_b.paid_date)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_reimport_is_idempotent(self):
+        rows = [("2024-09-02", "Fees", "TRF001", "GTS/2024/001", "20000")]
+        StatementReconciler().run(make_statement(rows))
+        result = StatementReconciler().run(make_statement(rows))
+
+        self.assertEqual(result.posted_count, 0)
+        self.assertEqual(len(result.duplicates), 1)
+        self.fee_a.refresh_from_db()
+        self.assertEqual(self.fee_a.amount_paid, Decimal("20000"))
+
+    def test_repeated_line_in_one_statement_is_posted_once(self):
+        row = ("2024-09-02", "Fees", "TRF001", "GTS/2024/001", "20000")
+        result = StatementReconciler().run(make_statement([row, row]))
+
+        self.assertEqual(result.posted_count, 1)
+        self.assertEqual(len(result.duplicates), 1)
+        self.fee_a.refresh_from_db()
+        self.assertEqual(self.fee_a.amount_paid, Decimal("20000"))
+
+    def test_long_reference_is_matched_as_stored(self):
+        rows = [("2024-09-02", "Fees", "TRF" + "9" * 120, "GTS/2024/001", "20000")]
+        StatementReconciler().run(make_statement(rows))
+        result = StatementReconciler().run(make_statement(rows + rows))
+
+        self.assertEqual(result.posted_count, 0)
+        self.assertEqual(
+            [reason for _, reason in result.duplicates], ["Repeated in this statement", "Already recorded"]
+        )
+
+    def test_posting_invalidates_cached_pages_and_month_buckets(self):
+        statement = make_statement([
+            ("2024-09-02", "Fees", "TRF001", "GTS/2024/001", "20000"),
+            ("2024-09-02", "Fees", "TRF002", "GTS/2024/002", "10000"),
+            ("2024-10-01", "Fees", "TRF003", "GTS/2024/001", "5000"),
+        ])
+        with (
+            mock.patch.object(reconciliation.dashboard, "day_changed") as day_changed,
+            mock.patch.object(reconciliation, "bump_table_version") as bump,
+        ):
+            StatementReconciler().run(statement)
+
+        days = sorted(call.args[0] for call in day_changed.call_args_list)
+        self.assertEqual(days, [date(2024, 9, 2), date(2024, 10, 1)])
+        self.assertEqual({call.args[0] for call in bump.call_args_list}, {Payment, TuitionFee})
+
+    def test_posted_payments_are_journalled_without_ids_from_bulk_insert(self):
+        statement = make_statement([
+            ("2024-09-02", "Fees", "TRF001", "GTS/2024/001", "20000"),
+            ("2024-09-03", "Fees", "TRF002", "GTS/2024/002", "40000"),
+        ])
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            result = StatementReconciler().run(statement)
+
+        self.assertEqual(result.posted_count, 2)
+        self.assertEqual(
+            sorted(JournalEntry.objects.filter(source_type="payment").values_list("source_id", flat=True)),
+            sorted(Payment.objects.values_list("pk", flat=True)),
+        )
+        self.fee_b.refresh_from_db()
+        self.assertEqual(self.fee_b.status, "paid")
+
+    def test_overpayment_is_not_posted(self):
+        statement = make_statement([("2024-09-02", "Fees", "TRF009", "GTS/2024/002", "45000")])
+        result = StatementReconciler().run(statement)
+
+        self.assertEqual(result.posted_count, 0)
+        self.assertEqual(len(result.unmatched), 1)
+        self.fee_b.refresh_from_db()
+        self.assertEqual(self.fee_b.amount_paid, Decimal("0"))
+
+    def test_xlsx_statement(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["Value Date", "Reference", "Admission No", "Amount"])
+        sheet.append([date(2024, 9, 5), "TRF010", "GTS/2024/002", 15000])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+
+        result = StatementReconciler().run(buffer, filename="statement.xlsx")
+        self.assertEqual(result.posted_count, 1)
+        self.fee_b.refresh_from_db()
+        self.assertEqual(self.fee_b.amount_paid, Decimal("15000"))
@@ -0,0 +1,56 @@
+import json
+import logging
+import tempfile
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import request_log
+
+User = get_user_model()
+
+
+@pytest.mark.unit
+class RequestLogTests(TestCase):
+    def setUp(self):
+        logging.disable(logging.NOTSET)
+        self.addCleanup(logging.disable, logging.CRITICAL)
+
+    def test_queue_handler_writes_batched_ndjson(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'requests.ndjson'
+            handler = request_log.NDJSONQueueHandler(path, batch_size=50, flush_interval=0.05)
+            log = logging.getLogger('test.request_log')
+            log.addHandler(handler)
+            log.propagate = False
+            log.setLevel(logging.INFO)
+            try:
+                for number in range(120):
+                    log.info({'event': 'request', 'n': number})
+                log.warning('plain %s', 'text')
+                handler.flush()
+                lines = [json.loads(line) for line in path.read_text().splitlines()]
+            finally:
+                log.removeHandler(handler)
+                handler.close()
+
+        self.assertEqual([line.get('n') for line in lines[:120]], list(range(120)))
+        self.assertEqual((lines[-1]['level'], lines[-1]['message']), ('WARNING', 'plain text'))
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0.0, REQUEST_LOG_SAMPLE_RATES={'attendance': 1.0})
+    def test_middleware_emits_one_sampled_event_per_request(self):
+        user = User.objects.create_user(username='logged_admin', password='pass12345', role='admin')
+        self.client.force_login(user)
+        with self.assertLogs('glad_tidings.requests', level='INFO') as captured:
+            self.client.get(reverse('attendance'))
+            self.client.get(reverse('dashboard'))  # sampled out
+            self.client.get('/no-such-page/')  # errors are always logged
+
+        events = [record.msg for record in captured.records]
+        self.assertEqual([(e['route'], e['status']) for e in events], [('attendance', 200), ('<unresolved>', 404)])
+        self.assertEqual((events[0]['role'], events[0]['user_id']), ('admin', user.pk))
+        self.assertGreater(events[0]['db_queries'], 0)
+        self.assertEqual(captured.records[1].levelname, 'WARNING')
@@ -0,0 +1,97 @@
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import metrics, telemetry
+from core.performance import ResourceTelemetryMiddleware
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'telemetry-tests'}}
+
+
+@pytest.mark.unit
+class TelemetrySampleTests(TestCase):
+    def test_sample_reports_process_resources(self):
+        connections['default'].ensure_connection()
+        telemetry._connection_opened(None, connections['default'])
+        state = telemetry.sample()
+        self.assertGreater(state['rss'], 0)
+        self.assertGreater(state['open_fds'], 0)
+        self.assertGreaterEqual(state['db_connections'], 1)
+        self.assertGreaterEqual(state['db_connection_age'], 0)
+        self.assertEqual(len(state['gc_collections']), len(gc.get_stats()))
+
+        worker = metrics.worker_state()
+        self.assertEqual(worker['pid'], os.getpid())
+        self.assertIn('in_flight', worker)
+
+    def test_gc_pauses_are_timed(self):
+        metrics.registry.collect(grace=False)
+        telemetry._gc_callback('start', {'generation': 2})
+        telemetry._gc_callback('stop', {'generation': 2})
+        frame = metrics.registry.collect(grace=False)
+        self.assertEqual(frame.histograms[(metrics.GC_PAUSE, ('2',))].count, 1)
+
+
+@pytest.mark.unit
+@override_settings(TELEMETRY_ALLOCATION_SAMPLE_RATE=1.0)
+class AllocationSamplingTests(TestCase):
+    def test_sampled_requests_record_kept_blocks(self):
+        kept = []
+
+        def view(request):
+            kept.extend(object() for _ in range(5000))
+            return HttpResponse('ok')
+
+        metrics.registry.collect(grace=False)
+        request = RequestFactory().get('/somewhere/')
+        ResourceTelemetryMiddleware(view)(request)
+        counters = metrics.registry.collect(grace=False).counters
+        self.assertEqual(counters[(metrics.ALLOCATION_SAMPLES, ('<unresolved>',))], 1)
+        self.assertGreaterEqual(counters[(metrics.ALLOCATED_BLOCKS, ('<unresolved>',))], 5000)
+
+    @override_settings(TELEMETRY_ALLOCATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_record_nothing(self):
+        metrics.registry.collect(grace=False)
+        ResourceTelemetryMiddleware(lambda request: HttpResponse('ok'))(RequestFactory().get('/'))
+        self.assertFalse(metrics.registry.collect(grace=False).counters)
+
+
+@pytest.mark.unit
+@override_settings(CACHES=LOCMEM, TRACEMALLOC_SNAPSHOT_INTERVAL=0)
+class TracemallocTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.addCleanup(tracemalloc.stop)
+        self.addCleanup(telemetry._trace.update, {'started': None, 'snapshot_at': 0.0})
+
+    def test_workers_trace_on_request_and_report_growth(self):
+        with override_settings(TELEMETRY_DIR=self.directory):
+            call_command('tracemalloc', 'start', '--minutes', '1', stdout=StringIO())
+            telemetry.tick()
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertIn('traced_bytes', telemetry.latest())
+
+            leak = [bytearray(1024) for _ in range(200)]
+            telemetry.tick()
+            self.assertEqual(len(telemetry.snapshots(os.getpid())), 2)
+
+            call_command('tracemalloc', 'stop', stdout=StringIO())
+            telemetry.tick()
+            self.assertFalse(tracemalloc.is_tracing())
+
+            paths = telemetry.snapshots(os.getpid())
+            growth = telemetry.compare_snapshots(paths[0], paths[-1])
+            self.assertTrue(any(stat.size_diff >= 200 * 1024 for stat in growth))
+            del leak
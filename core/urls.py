@@ -11,12 +11,24 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('notifications/', views_notifications.notifications, name='notifications'),
     path('notifications/mark-read/<int:notification_id>/', views_notifications.mark_notification_read, name='mark_notification_read'),
+    path(
+        'notifications/announcements/<int:announcement_id>/read/',
+        views_notifications.mark_announcement_read,
+        name='mark_announcement_read',
+    ),
     path('notifications/unread-count/', views_notifications.get_unread_count, name='notification_unread_count'),
     path('performance/', views_performance.performance_analytics, name='performance_analytics'),
     path('elibrary/', views_elibrary.elibrary, name='elibrary'),
     path('attendance/', views_attendance.attendance, name='attendance'),
     path('attendance/admin/students/manage/', views_attendance.manage_student_attendance, name='manage_student_attendance'),
     path('attendance/admin/staff/manage/', views_attendance.manage_staff_attendance, name='manage_staff_attendance'),
+    path('attendance/register/', views_attendance.class_register, name='class_register'),
+    path('attendance/classes/', views_attendance.class_attendance_overview, name='class_attendance_overview'),
+    path(
+        'attendance/classes/<int:class_id>/heatmap/',
+        views_attendance.class_attendance_heatmap,
+        name='class_attendance_heatmap',
+    ),
     path('profile/', views_profile.profile, name='profile'),
     # Admin profile management
     path('admin/students/', views_profile.admin_students_list, name='admin_students_list'),
@@ -7,14 +7,22 @@ from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db.models import Q
 import logging
-import json
 from django.contrib import messages
+from . import activity
+from .caching import public_page, cached_fragment
 from .forms import AdmissionApplicationForm, ContactForm
 from .models import InboxMessage  # noqa: F401 (potential future use)
 
 logger = logging.getLogger(__name__)
 
+CMS_MODELS = ('core.newspost', 'core.upcomingevent')
+STUDENT_DASHBOARD_MODELS = ('students.studentprofile', 'students.attendancerecord', 'results.studentresult')
+# Pages that filter on the current time change without any table write,
+# so events that have ended drop off within this many seconds
+CLOCK_PAGE_TIMEOUT = 60
 
+
+@public_page(*CMS_MODELS, timeout=CLOCK_PAGE_TIMEOUT)
 def landing_page(request):
     """Landing page with latest news and upcoming events using core CMS models."""
     from .models import NewsPost, UpcomingEvent
@@ -37,6 +45,7 @@ def landing_page(request):
     )
 
 
+@public_page()
 def about_us(request):
     return render(request, 'core/about_us.html')
 
@@ -80,13 +89,17 @@ def dashboard(request):
     role = getattr(user, 'role', None)
     
     if role == 'student':
-        context = get_student_dashboard_context(user)
+        context = cached_fragment(
+            'dashboard:student', user.pk, STUDENT_DASHBOARD_MODELS,
+            lambda: get_student_dashboard_context(user),
+        )
         return render(request, 'core/dashboard_student.html', context)
     elif role == 'staff':
         return render(request, 'core/dashboard_staff.html')
     elif role == 'admin':
         # Get live data for admin dashboard
         context = get_admin_dashboard_context()
+        context['online_now'] = activity.online_now()
         return render(request, 'core/dashboard_admin.html', context)
     elif role == 'accountant':
         return redirect('accounting:home')  # Redirect accountants to the finance dashboard
@@ -157,192 +170,9 @@ def custom_403(request, exception):
 
 
 def get_admin_dashboard_context():
-    """Get live data for admin dashboard"""
-    from django.db.models import Sum
-    from students.models import StudentProfile
-    from staff.models import StaffProfile
-    from students.models import AttendanceRecord as StudentAttendance
-    from staff.models import StaffAttendance
-    from accounting.models import TuitionFee, Payment, Expense
-    from datetime import timedelta
-    from django.utils import timezone
-    
-    today = timezone.now().date()
-    current_month_start = today.replace(day=1)
-    # current_year_start = today.replace(month=1, day=1)
-    
-    # Student Statistics
-    total_students = StudentProfile.objects.filter(user__is_active=True).count()
-    
-    # Staff Statistics
-    total_staff = StaffProfile.objects.filter(user__is_active=True).count()
-    
-    # Fee Collection Statistics
-    total_fees_due = TuitionFee.objects.aggregate(total=Sum('amount_due'))['total'] or 0
-    total_fees_paid = TuitionFee.objects.aggregate(total=Sum('amount_paid'))['total'] or 0
-    collection_rate = (total_fees_paid / total_fees_due * 100) if total_fees_due > 0 else 0
-    
-    # Monthly Revenue
-    monthly_revenue = Payment.objects.filter(
-        payment_date__gte=current_month_start,
-        payment_date__lte=today
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Monthly Expenses
-    monthly_expenses = Expense.objects.filter(
-        date__gte=current_month_start,
-        date__lte=today
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Recent Activities (based on actual data)
-    recent_activities = []
-    
-    # Recent payments
-    recent_payments = Payment.objects.select_related('tuition_fee__student__user').order_by('-payment_date')[:2]
-    for payment in recent_payments:
-        days_ago = (today - payment.payment_date).days
-        time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-        pay_msg = (
-            f"Fee payment of ₦{payment.amount:,.0f} received from "
-            f"{payment.tuition_fee.student.user.get_full_name()}"
-        )
-        recent_activities.append({'time': time_ago, 'content': pay_msg, 'type': 'payment'})
-    
-    # Recent expenses
-    recent_expenses = Expense.objects.order_by('-date')[:2]
-    for expense in recent_expenses:
-        days_ago = (today - expense.date).days
-        time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-        recent_activities.append({
-            'time': time_ago,
-            'content': f'Expense recorded: {expense.description} - ₦{expense.amount:,.0f}',
-            'type': 'expense'
-        })
-    
-    # Recent registrations
-    recent_students = StudentProfile.objects.order_by('-created_at')[:2]
-    for student in recent_students:
-        created_at = getattr(student, 'created_at', None)
-        created_date = created_at.date() if created_at else today
-        days_ago = (today - created_date).days
-        time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-        recent_activities.append({
-            'time': time_ago,
-            'content': f'New student registration: {student.user.get_full_name()} - {student.admission_number}',
-            'type': 'registration'
-        })
-    
-    # Sort activities by most recent
-    recent_activities = sorted(recent_activities, key=lambda x: x['time'])[:4]
-    
-    # Outstanding fees count
-    students_with_outstanding = TuitionFee.objects.filter(
-        status__in=['unpaid', 'partial']
-    ).values('student').distinct().count()
-    
-    # Attendance rate (last 30 days, combined students + staff)
-    last_30 = today - timedelta(days=30)
-    stud_30 = StudentAttendance.objects.filter(date__gte=last_30, date__lte=today)
-    staff_30 = StaffAttendance.objects.filter(date__gte=last_30, date__lte=today)
-    total_30 = stud_30.count() + staff_30.count()
-    present_30 = stud_30.filter(present=True).count() + staff_30.filter(present=True).count()
-    attendance_rate = round((present_30 / total_30) * 100, 1) if total_30 else 0
-    
-    # Pending tasks (based on actual data)
-    pending_tasks = []
-    
-    # Unpaid payroll
-    from accounting.models import Payroll
-    unpaid_payroll_count = Payroll.objects.filter(paid=False).count()
-    if unpaid_payroll_count > 0:
-        pending_tasks.append({
-            'name': 'Unpaid Payroll',
-            'count': unpaid_payroll_count,
-            'badge_class': 'bg-danger',
-            'url': '/accounting/payroll/'
-        })
-    
-    # Students with outstanding fees
-    if students_with_outstanding > 0:
-        pending_tasks.append({
-            'name': 'Outstanding Fees',
-            'count': students_with_outstanding,
-            'badge_class': 'bg-warning',
-            'url': '/accounting/fees/'
-        })
-    
-    # Recent expenses to approve (expenses over certain amount)
-    high_value_expenses = Expense.objects.filter(
-        amount__gte=50000,
-        date__gte=today - timedelta(days=7)
-    ).count()
-    if high_value_expenses > 0:
-        pending_tasks.append({
-            'name': 'High-Value Expenses',
-            'count': high_value_expenses,
-            'badge_class': 'bg-info',
-            'url': '/accounting/expenses/'
-        })
-    
-    # Chart data for performance overview (6-month trend)
-    chart_data = {
-        'months': [],
-        'revenue': [],
-        'expenses': [],
-        'students': [],
-        'attendance_students': [],
-        'attendance_staff': [],
-    }
-    
-    for i in range(5, -1, -1):
-        month_date = (current_month_start - timedelta(days=32*i)).replace(day=1)
-        month_end = (month_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_revenue = Payment.objects.filter(
-            payment_date__gte=month_date,
-            payment_date__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        month_expenses = Expense.objects.filter(
-            date__gte=month_date,
-            date__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        # Student count (approximate - would need historical data)
-        month_students = total_students  # Simplified
-
-        # Attendance percentages by month
-        stud_month_qs = StudentAttendance.objects.filter(date__gte=month_date, date__lte=month_end)
-        staff_month_qs = StaffAttendance.objects.filter(date__gte=month_date, date__lte=month_end)
-        stud_total = stud_month_qs.count()
-        stud_present = stud_month_qs.filter(present=True).count()
-        staff_total = staff_month_qs.count()
-        staff_present = staff_month_qs.filter(present=True).count()
-        stud_pct = round((stud_present / stud_total) * 100, 1) if stud_total else 0
-        staff_pct = round((staff_present / staff_total) * 100, 1) if staff_total else 0
-
-        chart_data['months'].append(month_date.strftime('%b'))
-        chart_data['revenue'].append(float(month_revenue))
-        chart_data['expenses'].append(float(month_expenses))
-        chart_data['students'].append(month_students)
-        chart_data['attendance_students'].append(stud_pct)
-        chart_data['attendance_staff'].append(staff_pct)
-    
-    return {
-        'total_students': total_students,
-        'total_staff': total_staff,
-        'attendance_rate': attendance_rate,
-        'collection_rate': round(collection_rate, 1),
-        'total_fees_paid': total_fees_paid,
-        'total_fees_due': total_fees_due,
-        'monthly_revenue': monthly_revenue,
-        'monthly_expenses': monthly_expenses,
-        'recent_activities': recent_activities,
-        'pending_tasks': pending_tasks,
-        'students_with_outstanding': students_with_outstanding,
-        'chart_data': json.dumps(chart_data),
-        'last_updated': today.strftime('%B %d, %Y')
-    }
+    """Get live data for admin dashboard (cached snapshot, see core.dashboard)"""
+    from .dashboard import get_admin_dashboard_snapshot
+    return get_admin_dashboard_snapshot()
 
 
 def get_student_dashboard_context(user):
@@ -355,7 +185,7 @@ def get_student_dashboard_context(user):
         student_profile = StudentProfile.objects.get(user=user)
 
         # Recent results (last 5)
-        recent_results = (
+        recent_results = list(
             StudentResult.objects.filter(student=student_profile)
             .select_related('subject', 'assessment', 'session', 'term')
             .order_by('-entered_at')[:5]
@@ -381,6 +211,7 @@ def get_student_dashboard_context(user):
 
 
 # Public listing pages
+@public_page(*CMS_MODELS)
 def news_list(request):
     """List published news posts (core CMS)."""
     from .models import NewsPost
@@ -391,6 +222,7 @@ def news_list(request):
     return render(request, 'core/news_list.html', {'page_obj': page_obj})
 
 
+@public_page(*CMS_MODELS, timeout=CLOCK_PAGE_TIMEOUT)
 def events_list(request):
     """List upcoming events from core CMS."""
     from .models import UpcomingEvent
@@ -1,12 +1,16 @@
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib import messages
 from django.utils import timezone
 from datetime import datetime
 from staff.models import StaffAttendance, StaffProfile
+from students import attendance_bits, class_attendance
 from students.models import AttendanceRecord as StudentAttendance, StudentProfile
 from django.db.models import Q
+from results.models import AcademicTerm, StudentClass
 from .decorators import admin_required, role_required
+from . import attendance as attendance_utils
 
 
 @login_required
@@ -15,93 +19,51 @@ def attendance(request):
     # Admin overview first (takes precedence)
     is_admin = (getattr(user, 'role', None) == 'admin') or user.is_superuser
     if is_admin and not hasattr(user, 'student_profile') and not hasattr(user, 'staff_profile'):
-        start_date = request.GET.get('start_date') or ''
-        end_date = request.GET.get('end_date') or ''
+        start_date, end_date = attendance_utils.date_range(request)
         today = timezone.now().date()
 
-        student_qs = StudentAttendance.objects.all()
-        staff_qs = StaffAttendance.objects.all()
-
-        if start_date:
-            try:
-                student_qs = student_qs.filter(date__gte=start_date)
-                staff_qs = staff_qs.filter(date__gte=start_date)
-            except Exception:
-                messages.warning(request, 'Invalid start date filter ignored.')
-        if end_date:
-            try:
-                student_qs = student_qs.filter(date__lte=end_date)
-                staff_qs = staff_qs.filter(date__lte=end_date)
-            except Exception:
-                messages.warning(request, 'Invalid end date filter ignored.')
-
-        # Aggregates
-        student_total = student_qs.count()
-        student_present = student_qs.filter(present=True).count()
-        student_absent = student_qs.filter(present=False).count()
-        student_percent = round((student_present / student_total) * 100, 1) if student_total else 0.0
-
-        staff_total = staff_qs.count()
-        staff_present = staff_qs.filter(present=True).count()
-        staff_absent = staff_qs.filter(present=False).count()
-        staff_percent = round((staff_present / staff_total) * 100, 1) if staff_total else 0.0
-
-        # Today snapshot
-        students_today_present = StudentAttendance.objects.filter(date=today, present=True).count()
-        staff_today_present = StaffAttendance.objects.filter(date=today, present=True).count()
+        student_qs = attendance_utils.in_range(StudentAttendance.objects.all(), start_date, end_date)
+        staff_qs = attendance_utils.in_range(StaffAttendance.objects.all(), start_date, end_date)
+
+        # One conditional aggregate per table
+        students = attendance_utils.attendance_summary(student_qs)
+        staff = attendance_utils.attendance_summary(staff_qs)
+        today_counts = attendance_utils.today_snapshot(today)
 
         context = {
-            'start_date': start_date,
-            'end_date': end_date,
+            'start_date': start_date.isoformat() if start_date else '',
+            'end_date': end_date.isoformat() if end_date else '',
+            'filter_query': attendance_utils.filter_query(start_date, end_date),
             'today': today,
             # Students
-            'student_total': student_total,
-            'student_present': student_present,
-            'student_absent': student_absent,
-            'student_percent': student_percent,
-            'student_records': student_qs.select_related('student__user').order_by('-date')[:50],
+            'student_total': students['total'],
+            'student_present': students['present'],
+            'student_absent': students['absent'],
+            'student_percent': students['percent'],
+            'student_records': attendance_utils.records_page(
+                request, student_qs.select_related('student__user'), students['total'], prefix='s_'
+            ),
             # Staff
-            'staff_total': staff_total,
-            'staff_present': staff_present,
-            'staff_absent': staff_absent,
-            'staff_percent': staff_percent,
-            'staff_records': staff_qs.select_related('staff__user').order_by('-date')[:50],
+            'staff_total': staff['total'],
+            'staff_present': staff['present'],
+            'staff_absent': staff['absent'],
+            'staff_percent': staff['percent'],
+            'staff_records': attendance_utils.records_page(
+                request, staff_qs.select_related('staff__user'), staff['total'], prefix='t_'
+            ),
             # Today
-            'students_today_present': students_today_present,
-            'staff_today_present': staff_today_present,
+            'students_today_present': today_counts['students_present'],
+            'staff_today_present': today_counts['staff_present'],
         }
         return render(request, 'core/attendance_admin.html', context)
     # Student: filterable list + stats
     if hasattr(user, 'student_profile'):
         student = user.student_profile
-        start_date = request.GET.get('start_date') or ''
-        end_date = request.GET.get('end_date') or ''
-
-        records = student.attendance_records.all().order_by('-date')  # pyright: ignore[reportAttributeAccessIssue]
-        if start_date:
-            try:
-                records = records.filter(date__gte=start_date)
-            except Exception:
-                messages.warning(request, 'Invalid start date filter ignored.')
-        if end_date:
-            try:
-                records = records.filter(date__lte=end_date)
-            except Exception:
-                messages.warning(request, 'Invalid end date filter ignored.')
-
-        total = records.count()
-        present = records.filter(present=True).count()
-        absent = records.filter(present=False).count()
-        percent = round((present / total) * 100, 1) if total else 0.0
-
+        term = attendance_bits.term_for(timezone.now().date())
         context = {
-            'records': records,
-            'total_days': total,
-            'days_present': present,
-            'days_absent': absent,
-            'attendance_percent': percent,
-            'start_date': start_date,
-            'end_date': end_date,
+            'term': term,
+            'term_summary': attendance_bits.student_term_summary(student, term) if term else None,
+            **attendance_utils.student_statistics(request, student),
         }
         return render(request, 'core/attendance_student.html', context)
 
@@ -148,25 +110,9 @@ def manage_student_attendance(request):
         except Exception:
             mark_date = selected_date
 
-        count = 0
-        for sid in ids:
-            try:
-                sp = StudentProfile.objects.get(id=sid)
-                rec, _ = StudentAttendance.objects.get_or_create(
-                    student=sp,
-                    date=mark_date,
-                    defaults={'present': True},
-                )
-                if action == 'present':
-                    rec.present = True
-                elif action == 'absent':
-                    rec.present = False
-                rec.save()
-                count += 1
-            except StudentProfile.DoesNotExist:
-                continue
+        count = attendance_utils.mark_students(ids, mark_date, present=action != 'absent')
         if count:
-            status = 'present' if action == 'present' else 'absent'
+            status = 'absent' if action == 'absent' else 'present'
             messages.success(
                 request,
                 f"Marked {count} student(s) as {status} for {mark_date}.",
@@ -218,27 +164,9 @@ def manage_staff_attendance(request):
         except Exception:
             mark_date = selected_date
 
-        count = 0
-        for sid in ids:
-            try:
-                sp = StaffProfile.objects.get(id=sid)
-                rec, _ = StaffAttendance.objects.get_or_create(
-                    staff=sp,
-                    date=mark_date,
-                    defaults={'present': True, 'created_by': request.user},
-                )
-                if action == 'present':
-                    rec.present = True
-                elif action == 'absent':
-                    rec.present = False
-                if rec.created_by is None:
-                    rec.created_by = request.user
-                rec.save()
-                count += 1
-            except StaffProfile.DoesNotExist:
-                continue
+        count = attendance_utils.mark_staff(ids, mark_date, present=action != 'absent', marked_by=request.user)
         if count:
-            status = 'present' if action == 'present' else 'absent'
+            status = 'absent' if action == 'absent' else 'present'
             messages.success(
                 request,
                 f"Marked {count} staff as {status} for {mark_date}.",
@@ -254,3 +182,102 @@ def manage_staff_attendance(request):
         'selected_date': selected_date,
     }
     return render(request, 'core/attendance_manage_staff.html', context)
+
+
+@login_required
+@role_required(['admin', 'staff'])
+def class_register(request):
+    """Mark a whole class register for a date: ticked students present, the rest absent."""
+    classes = _visible_classes(request.user).order_by('name')
+    class_id = request.GET.get('class') or request.POST.get('class') or ''
+    date_str = request.POST.get('date') or request.GET.get('date') or ''
+    try:
+        selected_date = (
+            datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
+        )
+    except Exception:
+        selected_date = timezone.now().date()
+    student_class = classes.filter(pk=class_id).first() if class_id.isdigit() else None
+
+    if request.method == 'POST' and student_class:
+        present, absent = attendance_utils.mark_register(
+            student_class, selected_date, request.POST.getlist('present_ids')
+        )
+        messages.success(
+            request,
+            f"Register saved for {student_class.name} on {selected_date}: {present} present, {absent} absent.",
+        )
+        return redirect(f"{request.path}?class={student_class.pk}&date={selected_date.isoformat()}")
+
+    context = {
+        'classes': classes,
+        'student_class': student_class,
+        'selected_date': selected_date,
+        'register': attendance_utils.class_register(student_class, selected_date) if student_class else [],
+    }
+    return render(request, 'core/attendance_register.html', context)
+
+
+def _visible_classes(user):
+    """Every class for admins; a class teacher only sees the classes they teach"""
+    classes = StudentClass.objects.filter(is_active=True)
+    if user.is_superuser or user.role == 'admin':
+        return classes
+    return classes.filter(class_teacher__user=user)
+
+
+def _parse_date(value, default):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else default
+    except ValueError:
+        return default
+
+
+@login_required
+@role_required(['admin', 'staff'])
+def class_attendance_heatmap(request, class_id):
+    """JSON heatmap of a class's daily attendance: ``?view=week`` (default) or ``?view=month``, around ``?date=``"""
+    student_class = get_object_or_404(_visible_classes(request.user), pk=class_id)
+    day = _parse_date(request.GET.get('date'), timezone.now().date())
+    if request.GET.get('view') == 'month':
+        heatmap = class_attendance.monthly_heatmap(student_class, day)
+    else:
+        heatmap = class_attendance.weekly_heatmap(student_class, day)
+    return JsonResponse({'class_id': student_class.pk, 'class_name': student_class.name, **heatmap})
+
+
+@login_required
+@role_required(['admin', 'staff'])
+def class_attendance_overview(request):
+    """
+    JSON attendance rates per visible class for the current term (or
+    ``?term=``), with the chronically absent students of each.
+    """
+    today = timezone.now().date()
+    term_id = request.GET.get('term', '')
+    term = (
+        get_object_or_404(AcademicTerm, pk=term_id) if term_id.isdigit() else attendance_bits.term_for(today)
+    )
+    if term is None:
+        return JsonResponse({'term': None, 'classes': [], 'chronic_absentees': []})
+
+    visible = set(_visible_classes(request.user).values_list('pk', flat=True))
+    rates = [
+        row for row in class_attendance.class_rates(term.start_date, min(term.end_date, today))
+        if row['class_id'] in visible
+    ]
+    absentees = [
+        row for row in class_attendance.chronic_absentees(term)
+        if row['class_id'] in visible
+    ]
+    return JsonResponse({
+        'term': {
+            'id': term.pk,
+            'name': str(term),
+            'start': term.start_date.isoformat(),
+            'end': term.end_date.isoformat(),
+        },
+        'threshold': class_attendance.CHRONIC_ABSENCE_RATE * 100,
+        'classes': rates,
+        'chronic_absentees': absentees,
+    })
@@ -0,0 +1,24 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.cache import never_cache
+
+from . import openmetrics
+
+
+def _scrape_allowed(request):
+    """A bearer token when METRICS_TOKEN is set, otherwise a request from METRICS_ALLOWED_IPS"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        return hmac.compare_digest(supplied, token)
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+
+
+@never_cache
+def metrics(request):
+    """Prometheus/OpenMetrics scrape endpoint; looks like any unknown URL to everyone else."""
+    if not _scrape_allowed(request):
+        raise Http404
+    return HttpResponse(openmetrics.render(), content_type=openmetrics.CONTENT_TYPE)
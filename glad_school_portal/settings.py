@@ -94,21 +94,17 @@ MIDDLEWARE = [
     # Performance monitoring middleware
     'core.performance.PerformanceMonitoringMiddleware',
     'core.performance.DatabaseQueryMonitoringMiddleware',
-    'core.performance.MemoryMonitoringMiddleware',
-    'core.performance.RateLimitMiddleware',
-    # Add UpdateCacheMiddleware at the beginning and FetchFromCacheMiddleware after CommonMiddleware
-    'django.middleware.cache.UpdateCacheMiddleware' if not DEBUG else None,
+    'core.performance.ResourceTelemetryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware' if not DEBUG else None,
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',  # after authentication for per-user and per-role policies
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Content Security Policy
     'csp.middleware.CSPMiddleware',
     # Custom middleware
-    'core.middleware.RequestLoggingMiddleware',
     'core.middleware.SecurityHeadersMiddleware',
     'core.middleware.UserActivityMiddleware',
 ]
@@ -343,12 +339,14 @@ LOGGING = {
             'formatter': 'json',
         },
         'request_file': {
+            # One NDJSON event per request, written in batches by a background thread
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': BASE_DIR / 'logs' / 'requests.log',
+            'class': 'core.request_log.NDJSONQueueHandler',
+            'filename': BASE_DIR / 'logs' / 'requests.ndjson',
             'maxBytes': 1024*1024*10,  # 10 MB
             'backupCount': 7,
-            'formatter': 'verbose',
+            'batch_size': 200,
+            'flush_interval': 1.0,
         },
     },
     'loggers': {
@@ -427,8 +425,10 @@ else:
     }
 
 # Cache timeout settings
-CACHE_MIDDLEWARE_SECONDS = 60 * 15  # 15 minutes
-CACHE_MIDDLEWARE_KEY_PREFIX = 'glad_tidings'
+# Pages and fragments opt in with core.caching decorators; there is no sitewide page cache
+PAGE_CACHE_SECONDS = 60 * 15  # 15 minutes
+FRAGMENT_CACHE_SECONDS = 60 * 5
+DASHBOARD_CACHE_TTL = 60  # admin dashboard snapshot freshness, seconds
 
 # Content Security Policy (updated for django-csp 4.0+)
 # https://django-csp.readthedocs.io/en/latest/migration-guide.html
@@ -506,7 +506,43 @@ if DEBUG:
 # Performance monitoring settings
 SLOW_REQUEST_THRESHOLD = env.float('SLOW_REQUEST_THRESHOLD', default=2.0)  # seconds
 SLOW_QUERY_THRESHOLD = env.float('SLOW_QUERY_THRESHOLD', default=0.5)  # seconds
+PROFILE_SLOW_REQUESTS = env.bool('PROFILE_SLOW_REQUESTS', default=False)  # sample stacks of every request, keep slow ones
+PROFILE_INTERVAL = 0.01  # seconds between stack samples
+PROFILE_DIR = BASE_DIR / 'logs' / 'profiles'
+PROFILE_RING_SIZE = 50  # newest slow-request profiles kept on disk
+REQUEST_LOG_SAMPLE_RATE = env.float('REQUEST_LOG_SAMPLE_RATE', default=0.1)  # share of successful requests logged
+REQUEST_LOG_SAMPLE_RATES = {  # per URL name overrides for high-volume routes
+    'notification_unread_count': 0.01,
+}
+N_PLUS_ONE_THRESHOLD = env.int('N_PLUS_ONE_THRESHOLD', default=10)  # repeats of one statement per request
+METRICS_FLUSH_INTERVAL = env.int('METRICS_FLUSH_INTERVAL', default=5)  # seconds between per-worker metric flushes
+METRICS_RETENTION_HOURS = 25  # hourly metric keys kept in the cache
+METRICS_MINUTE_RETENTION = 2 * 3600  # seconds per-minute metric keys wait in the cache for core.history
+PERFORMANCE_HISTORY_MINUTE_DAYS = 2  # days per-minute rollups are kept; hourly and daily rollups outlive them
+PERFORMANCE_HISTORY_HOUR_DAYS = 90
+METRICS_TOKEN = env('METRICS_TOKEN', default='')  # bearer token for /metrics; empty allows METRICS_ALLOWED_IPS
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+# Worker resource telemetry (core.telemetry)
+TELEMETRY_INTERVAL = env.int('TELEMETRY_INTERVAL', default=10)  # seconds between samples; 0 disables the sampler
+TELEMETRY_ALLOCATION_SAMPLE_RATE = 0.01  # share of requests whose allocations are tracked
+TELEMETRY_ALLOCATION_WARNING_BLOCKS = 100_000  # memory blocks kept by one request before warning
+TELEMETRY_DIR = BASE_DIR / 'logs' / 'telemetry'  # tracemalloc snapshots
+TRACEMALLOC_SNAPSHOT_INTERVAL = 60  # seconds between snapshots while tracing
+TRACEMALLOC_KEEP = 20  # snapshots kept per worker, including the first
+
+# Last-seen tracking (core.activity)
+ACTIVITY_INTERVAL = 60  # seconds between recorded activity per user
+ACTIVITY_FLUSH_INTERVAL = 60  # seconds between last_seen bulk updates per worker
+
+# Targeted notifications (core.fanout)
+NOTIFICATION_FANOUT_BATCH_SIZE = 500  # notifications inserted per chunk
+NOTIFICATION_FANOUT_BACKGROUND = True  # write fan-outs in a thread instead of the request
+NOTIFICATION_FANOUT_STALE_SECONDS = 600  # a running fan-out silent this long is resumed as stopped
 
 # Rate limiting settings
 RATE_LIMIT_REQUESTS = env.int('RATE_LIMIT_REQUESTS', default=100)  # requests per window
 RATE_LIMIT_WINDOW = env.int('RATE_LIMIT_WINDOW', default=60)  # seconds
+RATE_LIMIT_LOCAL_KEYS = 10000  # per-process fallback counters while the cache is down
+RATE_LIMIT_TRUSTED_PROXIES = env.int('RATE_LIMIT_TRUSTED_PROXIES', default=0)  # proxies appending X-Forwarded-For
+# Per-route/per-role policies override the default above; see core.ratelimit.DEFAULT_POLICIES
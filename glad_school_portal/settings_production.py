@@ -39,6 +39,8 @@ SECURE_HSTS_PRELOAD = True
 # Additional security headers
 SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+# nginx appends the client address to X-Forwarded-For
+RATE_LIMIT_TRUSTED_PROXIES = env.int('RATE_LIMIT_TRUSTED_PROXIES', default=1)
 
 # Session security
 SESSION_COOKIE_AGE = 3600  # 1 hour
@@ -17,6 +17,12 @@ CACHES = {
     }
 }
 
+# Tests flush metrics and sample worker telemetry explicitly
+METRICS_FLUSH_INTERVAL = 0
+TELEMETRY_INTERVAL = 0
+# Notification fan-outs are written inline
+NOTIFICATION_FANOUT_BACKGROUND = False
+
 # Use in-memory database for faster tests
 DATABASES = {
     'default': {
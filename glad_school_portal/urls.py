@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from core.views_metrics import metrics
 
 # Simple health check for Docker
 @csrf_exempt
@@ -34,6 +35,7 @@ handler403 = 'core.views.custom_403'
 
 urlpatterns = [
     path('health/', health_check, name='health_check'),
+    path('metrics', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     # Include our custom user password URLs before the default auth URLs
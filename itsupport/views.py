@@ -1,18 +1,57 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse
+from django.utils.dateparse import parse_date
+
+from core import history, metrics, profiling, telemetry
+from core.decorators import role_required
+from core.performance import PerformanceAnalyzer
 
 @login_required
 def itsupport_home(request):
     return render(request, 'itsupport/itsupport_home.html')
 
 @login_required
+@role_required(['admin', 'it_support'])
 def system_health(request):
     # In a real application, you would fetch system health data
+    profiles = profiling.recent_profiles()
+    selected = request.GET.get('profile', '')
+    stacks = profiling.read_profile(selected) if selected else None
+    dates = {}
+    for name in ('since', 'until', 'compare_since', 'compare_until'):
+        try:
+            dates[name] = parse_date(request.GET.get(name, ''))
+        except ValueError:
+            dates[name] = None
+    current, previous = history.periods(**dates)
     context = {
-        'system_health': []
+        'system_health': [],
+        'profiling_enabled': profiling.enabled(),
+        'profiles': profiles,
+        'selected_profile': next((p for p in profiles if p['name'] == selected), None) if stacks else None,
+        'hottest_frames': profiling.hottest_frames(stacks) if stacks else [],
+        'workers': metrics.read_workers(),
+        'tracing_requested': bool(telemetry.tracing_requested()),
+        'history_dates': dates,
+        'history_periods': {'current': current, 'previous': previous},
+        'history_days': history.series(*current),
+        'comparison': PerformanceAnalyzer.compare_periods(current, previous),
     }
     return render(request, 'itsupport/system_health.html', context)
 
+
+@login_required
+@role_required(['admin', 'it_support'])
+def download_profile(request, name):
+    """A saved slow-request profile in collapsed-stack format, for flamegraph tools"""
+    stacks = profiling.read_profile(name)
+    if stacks is None:
+        raise Http404("Profile not found")
+    response = HttpResponse(stacks, content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}.folded"'
+    return response
+
 @login_required
 def troubleshooting(request):
     # In a real application, you would fetch troubleshooting logs
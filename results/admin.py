@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.urls import reverse
+from core import fanout
 from .models import (
     AcademicSession, AcademicTerm, Subject, StudentClass, Assessment,
     StudentResult, TermResult, ResultSheet
@@ -97,9 +99,22 @@ class ResultSheetAdmin(admin.ModelAdmin):
     actions = ['publish_results', 'unpublish_results']
     
     def publish_results(self, request, queryset):
-        for result_sheet in queryset:
+        # Notify the students whose sheets were published, once per session and term
+        owners = {}
+        for result_sheet in queryset.select_related('student', 'session', 'term'):
             result_sheet.publish(request.user)
-        self.message_user(request, f"Successfully published {queryset.count()} result sheets.")
+            owners.setdefault((result_sheet.session, result_sheet.term), set()).add(result_sheet.student.user_id)
+        for (session, term), user_ids in owners.items():
+            fanout.queue(
+                f"Results published: {session.name} {term.get_name_display()}",
+                f"Your {session.name} {term.get_name_display()} result sheet is now available.",
+                'users', link=reverse('students:result_sheets'), created_by=request.user, user_ids=user_ids,
+            )
+        self.message_user(
+            request,
+            f"Successfully published {queryset.count()} result sheets and notified "
+            f"{sum(len(user_ids) for user_ids in owners.values())} student(s).",
+        )
     publish_results.short_description = "Publish selected result sheets"
     
     def unpublish_results(self, request, queryset):
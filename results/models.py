@@ -299,6 +299,9 @@ class ResultSheet(models.Model):
         if self.total_possible > 0:
             self.overall_percentage = (self.total_score / self.total_possible) * 100
             self.overall_grade = self.calculate_overall_grade()
+
+        from students.attendance_bits import fill_result_sheet
+        fill_result_sheet(self)
         
         self.save()
 
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0002_staffprofile_created_at_staffprofile_created_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staffattendance',
+            index=models.Index(fields=['date', 'present'], name='staff_staff_date_617abc_idx'),
+        ),
+    ]
@@ -80,6 +80,10 @@ class StaffAttendance(models.Model):
 
     class Meta:
         unique_together = ('staff', 'date')
+        indexes = [
+            # Covers date-range attendance rates
+            models.Index(fields=['date', 'present']),
+        ]
 
     def __str__(self):
         return f"{self.staff} - {self.date} - {'Present' if self.present else 'Absent'}"
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StudentProfile, AcademicStatus, AttendanceRecord
+from .models import StudentProfile, AcademicStatus, AttendanceRecord, TermAttendance, ClassAttendanceSummary
 
 @admin.register(StudentProfile)
 class StudentProfileAdmin(admin.ModelAdmin):
@@ -15,3 +15,17 @@ class AcademicStatusAdmin(admin.ModelAdmin):
 class AttendanceRecordAdmin(admin.ModelAdmin):
     list_display = ('student', 'date', 'present')
     search_fields = ('student__admission_number', 'date')
+
+@admin.register(TermAttendance)
+class TermAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('student', 'term', 'days_present', 'days_marked')
+    list_filter = ('term',)
+    search_fields = ('student__admission_number',)
+    readonly_fields = ('marked', 'present', 'days_marked', 'days_present')
+
+@admin.register(ClassAttendanceSummary)
+class ClassAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student_class', 'date', 'present', 'absent')
+    list_filter = ('student_class',)
+    date_hierarchy = 'date'
+    readonly_fields = ('present', 'absent')
@@ -0,0 +1,188 @@
+"""
+Bitmap attendance per student per term.
+
+Each TermAttendance row holds two bitsets over the days of a term (bit n is
+term.start_date + n days): days with a record and days present. The
+SchoolDayCalendar of the term has a bit for every day attendance was
+taken. Totals, percentages and streaks are popcounts and shifts on these
+integers instead of counting AttendanceRecord rows, and a class report is
+one query for the class's bitsets.
+
+The bitsets mirror AttendanceRecord: single saves and deletes update them
+through the signals in students.signals, bulk writes call apply_marks()
+directly, and rebuild_term() recomputes a term from the records.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import AttendanceRecord, SchoolDayCalendar, TermAttendance
+
+logger = logging.getLogger(__name__)
+
+
+def term_for(day):
+    """The AcademicTerm containing ``day``, or None"""
+    from results.models import AcademicTerm
+
+    return AcademicTerm.objects.filter(start_date__lte=day, end_date__gte=day).order_by('start_date').first()
+
+
+def day_index(term, day):
+    return (day - term.start_date).days
+
+
+def apply_marks(day, statuses, term=None):
+    """
+    Apply ``{student_id: present}`` for ``day`` to the term bitsets, where
+    present is True, False, or None for a deleted record. Costs the same
+    handful of queries however many students are marked. Returns the
+    number of bitsets written; days outside any term are ignored.
+    """
+    term = term or term_for(day)
+    if term is None or not statuses:
+        return 0
+    index = day_index(term, day)
+
+    with transaction.atomic():
+        rows = {
+            row.student_id: row
+            for row in TermAttendance.objects.select_for_update().filter(term=term, student_id__in=list(statuses))
+        }
+        created, changed = [], []
+        for student_id, present in statuses.items():
+            row = rows.get(student_id)
+            if row is None:
+                if present is None:
+                    continue
+                row = TermAttendance(student_id=student_id, term=term)
+                created.append(row)
+            else:
+                changed.append(row)
+            row.set_day(index, present)
+        TermAttendance.objects.bulk_create(created)
+        TermAttendance.objects.bulk_update(changed, ['marked', 'present', 'days_marked', 'days_present'])
+
+        calendar, _ = SchoolDayCalendar.objects.select_for_update().get_or_create(term=term)
+        school_day = any(present is not None for present in statuses.values()) or (
+            AttendanceRecord.objects.filter(date=day).exists()
+        )
+        if bool(calendar.bits >> index & 1) != school_day:
+            calendar.set_day(index, school_day)
+            calendar.save(update_fields=['days', 'updated_at'])
+    return len(created) + len(changed)
+
+
+def rebuild_term(term):
+    """Recompute every bitset of ``term`` from AttendanceRecord. Returns the number of students."""
+    bits = {}
+    school_days = 0
+    records = AttendanceRecord.objects.filter(
+        date__gte=term.start_date, date__lte=term.end_date
+    ).values_list('student_id', 'date', 'present')
+    for student_id, day, present in records.iterator():
+        bit = 1 << day_index(term, day)
+        marked, present_bits = bits.get(student_id, (0, 0))
+        bits[student_id] = (marked | bit, present_bits | bit if present else present_bits)
+        school_days |= bit
+
+    rows = []
+    for student_id, (marked, present_bits) in bits.items():
+        row = TermAttendance(student_id=student_id, term=term)
+        row.set_bits(marked, present_bits)
+        rows.append(row)
+    calendar = SchoolDayCalendar(term=term)
+    calendar.set_bits(school_days)
+
+    with transaction.atomic():
+        TermAttendance.objects.filter(term=term).delete()
+        TermAttendance.objects.bulk_create(rows, batch_size=1000)
+        SchoolDayCalendar.objects.filter(term=term).delete()
+        calendar.save()
+    logger.info(f"Rebuilt attendance bitmaps for {term}: {len(rows)} students")
+    return len(rows)
+
+
+def streaks(marked, present_bits):
+    """(current, longest) runs of present days, counting only days with a record"""
+    current = longest = 0
+    index = 0
+    while marked >> index:
+        if marked >> index & 1:
+            if present_bits >> index & 1:
+                current += 1
+                longest = max(longest, current)
+            else:
+                current = 0
+        index += 1
+    return current, longest
+
+
+def summarize(row, school_days=None):
+    """Totals, percentage and streaks for a TermAttendance row"""
+    current, longest = streaks(row.marked_bits, row.present_bits)
+    return {
+        'days_present': row.days_present,
+        'days_absent': row.days_absent,
+        'days_marked': row.days_marked,
+        'school_days': row.days_marked if school_days is None else school_days,
+        'percent': round(row.days_present / row.days_marked * 100, 1) if row.days_marked else 0.0,
+        'current_streak': current,
+        'longest_streak': longest,
+    }
+
+
+def school_day_count(term):
+    calendar = SchoolDayCalendar.objects.filter(term=term).first()
+    return calendar.school_days if calendar else 0
+
+
+def student_term_summary(student, term):
+    """Attendance summary for one student in one term (None when nothing is recorded)"""
+    row = TermAttendance.objects.filter(student=student, term=term).first()
+    return summarize(row, school_day_count(term)) if row else None
+
+
+def class_term_report(student_class, term):
+    """
+    Per-student summaries for a class plus the number present on each
+    school day, from one query for the bitsets and one for the calendar.
+    """
+    rows = list(
+        TermAttendance.objects.filter(term=term, student__current_class=student_class)
+        .select_related('student__user').order_by('student__user__last_name', 'student__user__first_name')
+    )
+    calendar = SchoolDayCalendar.objects.filter(term=term).first()
+    calendar_bits = calendar.bits if calendar else 0
+    school_days = calendar_bits.bit_count()
+
+    present = [row.present_bits for row in rows]
+    daily = []
+    index = 0
+    while calendar_bits >> index:
+        if calendar_bits >> index & 1:
+            bit = 1 << index
+            daily.append((term.start_date + timedelta(days=index), sum(1 for bits in present if bits & bit)))
+        index += 1
+
+    return {
+        'school_days': school_days,
+        'students': [{'student': row.student, **summarize(row, school_days)} for row in rows],
+        'daily_present': daily,
+    }
+
+
+def fill_result_sheet(sheet):
+    """
+    Set a ResultSheet's attendance totals from the term bitsets (not saved).
+    Totals with nothing recorded behind them are left as entered by hand.
+    """
+    calendar = SchoolDayCalendar.objects.filter(term_id=sheet.term_id).first()
+    if calendar:
+        sheet.total_school_days = calendar.school_days
+    row = TermAttendance.objects.filter(student_id=sheet.student_id, term_id=sheet.term_id).first()
+    if row:
+        sheet.total_days_present = row.days_present
+        sheet.total_days_absent = row.days_absent
+    return sheet
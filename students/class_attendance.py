@@ -0,0 +1,206 @@
+"""
+Per-class daily attendance summaries and the analytics built on them.
+
+ClassAttendanceSummary holds the present/absent counts of each class on
+each day. Whenever records for a day change, the affected classes' rows
+for that day are recounted with one grouped query over that day's records
+and upserted, so heatmaps and class rates read a few hundred summary rows
+instead of scanning AttendanceRecord. Students are counted under their
+current class at the time the day is recounted.
+
+Chronic absence per student comes from the term bitmaps in
+students.attendance_bits (TermAttendance), also without touching the
+raw records.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from core.bulk import upsert
+from core.periods import month_start, next_month
+from .models import AttendanceRecord, ClassAttendanceSummary, StudentProfile, TermAttendance
+
+logger = logging.getLogger(__name__)
+
+# A student missing more than 10% of marked days is chronically absent
+CHRONIC_ABSENCE_RATE = 0.9
+CHRONIC_MIN_DAYS = 10
+HEATMAP_WEEKS = 12
+
+
+def _counts():
+    return {
+        'present_count': Count('pk', filter=Q(present=True)),
+        'absent_count': Count('pk', filter=Q(present=False)),
+    }
+
+
+def refresh_days(day, class_ids):
+    """Recount the summaries of ``class_ids`` on ``day``: one grouped query and one upsert"""
+    class_ids = {class_id for class_id in class_ids if class_id}
+    if not class_ids:
+        return 0
+    counts = {
+        row['student__current_class']: row
+        for row in AttendanceRecord.objects.filter(date=day, student__current_class__in=class_ids)
+        .values('student__current_class').annotate(**_counts()).order_by()
+    }
+    rows = [
+        ClassAttendanceSummary(
+            student_class_id=class_id, date=day, present=row['present_count'], absent=row['absent_count']
+        )
+        for class_id, row in counts.items()
+    ]
+    with transaction.atomic():
+        if rows:
+            upsert(ClassAttendanceSummary, rows, ['student_class', 'date'], ['present', 'absent', 'updated_at'])
+        ClassAttendanceSummary.objects.filter(
+            date=day, student_class_id__in=class_ids - set(counts)
+        ).delete()
+    return len(rows)
+
+
+def students_changed(day, student_ids):
+    """Refresh the summaries of the classes of ``student_ids`` on ``day``"""
+    class_ids = StudentProfile.objects.filter(pk__in=list(student_ids)).values_list('current_class_id', flat=True)
+    return refresh_days(day, set(class_ids))
+
+
+def rebuild(start_date=None, end_date=None):
+    """Recount every summary between the dates (inclusive; default: all records)"""
+    records = AttendanceRecord.objects.filter(student__current_class__isnull=False)
+    summaries = ClassAttendanceSummary.objects.all()
+    if start_date:
+        records, summaries = records.filter(date__gte=start_date), summaries.filter(date__gte=start_date)
+    if end_date:
+        records, summaries = records.filter(date__lte=end_date), summaries.filter(date__lte=end_date)
+    rows = [
+        ClassAttendanceSummary(
+            student_class_id=row['student__current_class'], date=row['date'],
+            present=row['present_count'], absent=row['absent_count'],
+        )
+        for row in records.values('student__current_class', 'date').annotate(**_counts()).order_by().iterator()
+    ]
+    with transaction.atomic():
+        summaries.delete()
+        ClassAttendanceSummary.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} class attendance summaries")
+    return len(rows)
+
+
+def _cell(summary):
+    return {
+        'date': summary.date.isoformat(),
+        'present': summary.present,
+        'absent': summary.absent,
+        'rate': summary.rate,
+    }
+
+
+def weekly_heatmap(student_class, end_date, weeks=HEATMAP_WEEKS):
+    """
+    Rows of Monday-to-Friday cells for the ``weeks`` weeks ending with the
+    week of ``end_date``; days without a summary are None.
+    """
+    last_monday = end_date - timedelta(days=end_date.weekday())
+    first_monday = last_monday - timedelta(weeks=weeks - 1)
+    summaries = {
+        summary.date: summary
+        for summary in ClassAttendanceSummary.objects.filter(
+            student_class=student_class, date__gte=first_monday, date__lt=last_monday + timedelta(days=7)
+        )
+    }
+    rows = []
+    for week in range(weeks):
+        monday = first_monday + timedelta(weeks=week)
+        days = [monday + timedelta(days=offset) for offset in range(5)]
+        rows.append({
+            'week_of': monday.isoformat(),
+            'days': [_cell(summaries[day]) if day in summaries else None for day in days],
+        })
+    return {'start': first_monday.isoformat(), 'end': (last_monday + timedelta(days=4)).isoformat(), 'weeks': rows}
+
+
+def monthly_heatmap(student_class, day):
+    """Calendar weeks (Monday first) of the month of ``day``; cells outside the month are None"""
+    first = month_start(day)
+    end = next_month(first)
+    summaries = {
+        summary.date: summary
+        for summary in ClassAttendanceSummary.objects.filter(student_class=student_class, date__gte=first, date__lt=end)
+    }
+    weeks = []
+    monday = first - timedelta(days=first.weekday())
+    while monday < end:
+        cells = []
+        for offset in range(7):
+            current = monday + timedelta(days=offset)
+            if current.month != first.month:
+                cells.append(None)
+            elif current in summaries:
+                cells.append(_cell(summaries[current]))
+            else:
+                cells.append({'date': current.isoformat(), 'present': 0, 'absent': 0, 'rate': None})
+        weeks.append(cells)
+        monday += timedelta(days=7)
+    totals = _totals(summaries.values())
+    return {'month': first.strftime('%B %Y'), 'weeks': weeks, **totals}
+
+
+def _totals(summaries):
+    present = sum(summary.present for summary in summaries)
+    absent = sum(summary.absent for summary in summaries)
+    marked = present + absent
+    return {'present': present, 'absent': absent, 'rate': round(present / marked * 100, 1) if marked else None}
+
+
+def class_rates(start_date, end_date):
+    """Attendance rate per class between the dates, from the summaries in one query"""
+    rows = (
+        ClassAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date)
+        .values('student_class', 'student_class__name')
+        .annotate(present_total=Sum('present'), absent_total=Sum('absent'), days=Count('pk'))
+        .order_by('student_class__name')
+    )
+    rates = []
+    for row in rows:
+        marked = row['present_total'] + row['absent_total']
+        rates.append({
+            'class_id': row['student_class'],
+            'class_name': row['student_class__name'],
+            'days': row['days'],
+            'present': row['present_total'],
+            'absent': row['absent_total'],
+            'rate': round(row['present_total'] / marked * 100, 1) if marked else None,
+        })
+    return rates
+
+
+def chronic_absentees(term, student_class=None, threshold=CHRONIC_ABSENCE_RATE, min_days=CHRONIC_MIN_DAYS):
+    """
+    Students present on fewer than ``threshold`` of their marked days in
+    ``term`` (with at least ``min_days`` marked), worst first. One query
+    on the term bitmaps.
+    """
+    rows = TermAttendance.objects.filter(term=term, days_marked__gte=min_days).filter(
+        days_present__lt=F('days_marked') * threshold
+    ).select_related('student__user', 'student__current_class')
+    if student_class is not None:
+        rows = rows.filter(student__current_class=student_class)
+
+    absentees = [
+        {
+            'student_id': row.student_id,
+            'name': row.student.user.get_full_name() or row.student.user.username,
+            'admission_number': row.student.admission_number,
+            'class_id': row.student.current_class_id,
+            'class_name': row.student.current_class.name if row.student.current_class_id else '',
+            'days_present': row.days_present,
+            'days_absent': row.days_absent,
+            'rate': round(row.days_present / row.days_marked * 100, 1),
+        }
+        for row in rows
+    ]
+    return sorted(absentees, key=lambda item: (item['rate'], item['name']))
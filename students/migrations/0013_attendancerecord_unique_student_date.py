@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """Keep the most recent record of each (student, date) before adding the constraint"""
+    AttendanceRecord = apps.get_model('students', 'AttendanceRecord')
+    duplicates = (
+        AttendanceRecord.objects.values('student', 'date')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        AttendanceRecord.objects.filter(student=group['student'], date=group['date']).exclude(
+            id=group['keep']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0012_attendancerecord_date_present_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('student', 'date'), name='unique_student_attendance_per_day'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _pack(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def build_term_bitmaps(apps, schema_editor):
+    """Bitmaps for existing attendance in every defined term"""
+    AcademicTerm = apps.get_model('results', 'AcademicTerm')
+    AttendanceRecord = apps.get_model('students', 'AttendanceRecord')
+    SchoolDayCalendar = apps.get_model('students', 'SchoolDayCalendar')
+    TermAttendance = apps.get_model('students', 'TermAttendance')
+
+    for term in AcademicTerm.objects.all():
+        bits = {}
+        school_days = 0
+        records = AttendanceRecord.objects.filter(
+            date__gte=term.start_date, date__lte=term.end_date
+        ).values_list('student_id', 'date', 'present')
+        for student_id, day, present in records.iterator():
+            bit = 1 << (day - term.start_date).days
+            marked, present_bits = bits.get(student_id, (0, 0))
+            bits[student_id] = (marked | bit, present_bits | bit if present else present_bits)
+            school_days |= bit
+        TermAttendance.objects.bulk_create([
+            TermAttendance(
+                student_id=student_id, term=term, marked=_pack(marked), present=_pack(present_bits),
+                days_marked=marked.bit_count(), days_present=present_bits.bit_count(),
+            )
+            for student_id, (marked, present_bits) in bits.items()
+        ], batch_size=1000)
+        SchoolDayCalendar.objects.create(term=term, days=_pack(school_days))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0001_initial'),
+        ('students', '0013_attendancerecord_unique_student_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolDayCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('term', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='school_day_calendar', to='results.academicterm')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marked', models.BinaryField(default=bytes)),
+                ('present', models.BinaryField(default=bytes)),
+                ('days_marked', models.PositiveSmallIntegerField(default=0)),
+                ('days_present', models.PositiveSmallIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_attendance', to='students.studentprofile')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_attendance', to='results.academicterm')),
+            ],
+            options={
+                'unique_together': {('student', 'term')},
+            },
+        ),
+        migrations.RunPython(build_term_bitmaps, migrations.RunPython.noop),
+    ]
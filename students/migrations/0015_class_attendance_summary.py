@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_class_summaries(apps, schema_editor):
+    """Daily class summaries for existing attendance, grouped by current class"""
+    AttendanceRecord = apps.get_model('students', 'AttendanceRecord')
+    ClassAttendanceSummary = apps.get_model('students', 'ClassAttendanceSummary')
+
+    rows = (
+        AttendanceRecord.objects.filter(student__current_class__isnull=False)
+        .values('student__current_class', 'date')
+        .annotate(present_count=Count('pk', filter=Q(present=True)), absent_count=Count('pk', filter=Q(present=False)))
+        .order_by()
+    )
+    ClassAttendanceSummary.objects.bulk_create([
+        ClassAttendanceSummary(
+            student_class_id=row['student__current_class'], date=row['date'],
+            present=row['present_count'], absent=row['absent_count'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0001_initial'),
+        ('students', '0014_term_attendance_bitmaps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='results.studentclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='students_cl_date_50aa44_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student_class', 'date'), name='unique_class_attendance_summary')],
+            },
+        ),
+        migrations.RunPython(build_class_summaries, migrations.RunPython.noop),
+    ]
@@ -78,5 +78,125 @@ class AttendanceRecord(models.Model):
     present = models.BooleanField(default=True)
     # Add more fields as needed
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'date'], name='unique_student_attendance_per_day'),
+        ]
+        indexes = [
+            # Covers date-range attendance rates
+            models.Index(fields=['date', 'present']),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.date} - {'Present' if self.present else 'Absent'}"
+
+
+def _bits(value):
+    return int.from_bytes(bytes(value or b''), 'little')
+
+
+def _pack(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+class SchoolDayCalendar(models.Model):
+    """School days of a term as a bitmap: bit n is set if attendance was taken on start_date + n days"""
+    term = models.OneToOneField('results.AcademicTerm', on_delete=models.CASCADE, related_name='school_day_calendar')
+    days = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def bits(self):
+        return _bits(self.days)
+
+    def set_day(self, index, school_day=True):
+        self.set_bits(self.bits | (1 << index) if school_day else self.bits & ~(1 << index))
+
+    def set_bits(self, bits):
+        self.days = _pack(bits)
+
+    @property
+    def school_days(self):
+        return self.bits.bit_count()
+
+    def __str__(self):
+        return f"{self.term} - {self.school_days} school days"
+
+
+class TermAttendance(models.Model):
+    """
+    A student's attendance for one term as bitsets (bit n = term start_date
+    + n days), kept in step with AttendanceRecord. ``marked`` has a bit for
+    every day with a record and ``present`` for the days present; the
+    popcounts are stored so class totals can be summed in SQL.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='term_attendance')
+    term = models.ForeignKey('results.AcademicTerm', on_delete=models.CASCADE, related_name='student_attendance')
+    marked = models.BinaryField(default=bytes)
+    present = models.BinaryField(default=bytes)
+    days_marked = models.PositiveSmallIntegerField(default=0)
+    days_present = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'term')
+
+    @property
+    def marked_bits(self):
+        return _bits(self.marked)
+
+    @property
+    def present_bits(self):
+        return _bits(self.present)
+
+    def set_day(self, index, present):
+        """Record a day as present (True), absent (False) or unmarked (None)"""
+        bit = 1 << index
+        marked, present_bits = self.marked_bits, self.present_bits
+        if present is None:
+            marked &= ~bit
+            present_bits &= ~bit
+        else:
+            marked |= bit
+            present_bits = present_bits | bit if present else present_bits & ~bit
+        self.set_bits(marked, present_bits)
+
+    def set_bits(self, marked, present_bits):
+        self.marked, self.present = _pack(marked), _pack(present_bits)
+        self.days_marked, self.days_present = marked.bit_count(), present_bits.bit_count()
+
+    @property
+    def days_absent(self):
+        return self.days_marked - self.days_present
+
+    def __str__(self):
+        return f"{self.student} - {self.term}: {self.days_present}/{self.days_marked}"
+
+
+class ClassAttendanceSummary(models.Model):
+    """Present/absent counts for one class on one day, kept up to date as attendance is marked"""
+    student_class = models.ForeignKey(
+        'results.StudentClass', on_delete=models.CASCADE, related_name='attendance_summaries'
+    )
+    date = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student_class', 'date'], name='unique_class_attendance_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    @property
+    def marked(self):
+        return self.present + self.absent
+
+    @property
+    def rate(self):
+        return round(self.present / self.marked * 100, 1) if self.marked else 0.0
+
+    def __str__(self):
+        return f"{self.student_class} - {self.date}: {self.present}/{self.marked}"
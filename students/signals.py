@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import attendance_bits, class_attendance
+from .models import AttendanceRecord
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_saved(sender, instance, **kwargs):
+    """Keep the term bitmaps and class summaries in step with single-record saves"""
+    attendance_bits.apply_marks(instance.date, {instance.student_id: instance.present})
+    class_attendance.students_changed(instance.date, [instance.student_id])
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_deleted(sender, instance, **kwargs):
+    attendance_bits.apply_marks(instance.date, {instance.student_id: None})
+    class_attendance.students_changed(instance.date, [instance.student_id])
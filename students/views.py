@@ -6,6 +6,8 @@ from django.contrib import messages
  
 from django.utils import timezone
 from core.decorators import role_required
+from core.caching import per_user_page
+from core.attendance import student_statistics
 from students.models import StudentProfile
 from results.models import StudentResult, TermResult, AcademicSession, AcademicTerm, Subject
 from reportlab.lib.pagesizes import A4
@@ -15,6 +17,12 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 from io import BytesIO
 
+RESULT_MODELS = (
+    'students.studentprofile', 'results.studentresult', 'results.termresult', 'results.assessment',
+    'results.academicsession', 'results.academicterm', 'results.subject', 'results.studentclass',
+)
+ATTENDANCE_MODELS = ('students.studentprofile', 'students.attendancerecord')
+
 
 @login_required
 @role_required(['student'])
@@ -31,6 +39,7 @@ def assignments(request):
 
 @login_required
 @role_required(['student'])
+@per_user_page(*RESULT_MODELS)
 def results(request):
     """Display student's results with filters"""
     try:
@@ -115,6 +124,7 @@ def results(request):
 
 
 @login_required
+@per_user_page(*ATTENDANCE_MODELS)
 def attendance(request):
     # Canonical attendance is handled in core. If user isn't a student, redirect there.
     user = request.user
@@ -124,39 +134,9 @@ def attendance(request):
     # Show logged-in student's attendance with optional date filters
     try:
         student_profile = StudentProfile.objects.get(user=user)
-
-        # Optional filters: start_date and end_date in YYYY-MM-DD
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-
-        records = (
-            student_profile.attendance_records.all().order_by('-date')  # pyright: ignore[reportAttributeAccessIssue]
-        )
-        if start_date:
-            try:
-                records = records.filter(date__gte=start_date)
-            except Exception:
-                messages.warning(request, 'Invalid start date filter ignored.')
-        if end_date:
-            try:
-                records = records.filter(date__lte=end_date)
-            except Exception:
-                messages.warning(request, 'Invalid end date filter ignored.')
-
-        total = records.count()
-        present = records.filter(present=True).count()
-        absent = records.filter(present=False).count()
-        percent = round((present / total) * 100, 1) if total else 0.0
-
         context = {
             'student_profile': student_profile,
-            'records': records,
-            'total_days': total,
-            'days_present': present,
-            'days_absent': absent,
-            'attendance_percent': percent,
-            'start_date': start_date or '',
-            'end_date': end_date or '',
+            **student_statistics(request, student_profile),
         }
     except StudentProfile.DoesNotExist:
         # If no profile, use core attendance (admin/staff)
@@ -167,6 +147,7 @@ def attendance(request):
 
 @login_required
 @role_required(['student'])
+@per_user_page(*RESULT_MODELS)
 def result_sheets(request):
     """Display student's result sheets for printing"""
     try:
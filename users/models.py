@@ -28,6 +28,8 @@ class CustomUser(AbstractUser):
         ('it_support', 'IT Support'),
     )
     role = models.CharField(max_length=20, choices=ROLES, default='student')
+    # Written at most once a minute per user by core.activity, not on every request
+    last_seen = models.DateTimeField(null=True, blank=True, db_index=True)
     # Add more custom fields as needed (e.g., phone, address, etc.)
     
     # Use the custom manager